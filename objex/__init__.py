@@ -1,3 +1,5 @@
-from .exporter import dump_graph, spawn_dump, wait_dump
+from .exporter import dump_graph, spawn_dump, wait_dump, estimate_dump, DumpRefused, install_signal_handler, autodump
+from .exporter import dump_async, type_histogram
 from .explorer import make_analysis_db, Reader, Console
+from .archive import compress_dump
 from .web import make_server
@@ -1,11 +1,21 @@
 import argparse
 import os
+import re
+import runpy
+import subprocess
+import sys
+import threading
+import time
+from socket import getfqdn
 
+from . import archive
+from . import collector
 from . import explorer
+from . import exporter
 from . import web
 
 
-_COMMANDS = {'explore', 'make-analysis-db', 'web'}
+_COMMANDS = {'explore', 'make-analysis-db', 'web', 'capture', 'collect', 'compress', 'watch'}
 
 
 def build_parser():
@@ -20,13 +30,111 @@ def build_parser():
         help='Open an analysis database in the interactive explorer.',
     )
     explore_parser.add_argument('analysis_db', help='Path to an objex analysis database.')
+    explore_parser.add_argument(
+        '--include-weak',
+        action='store_true',
+        help='Follow weak references when finding paths to roots and orphans.',
+    )
 
     make_analysis_parser = subparsers.add_parser(
         'make-analysis-db',
         help='Create an analysis database from a collected objex dump.',
     )
-    make_analysis_parser.add_argument('collection_db', help='Path to the collected objex dump database.')
+    make_analysis_parser.add_argument(
+        'collection_db', nargs='+',
+        help='Path to the collected objex dump database; several dumps (e.g. one per prefork worker) '
+             'are merged into one analysis database with a process dimension.')
     make_analysis_parser.add_argument('analysis_db', help='Path to write the analysis database.')
+    make_analysis_parser.add_argument(
+        '--no-fast', dest='fast', action='store_false',
+        help="Build with sqlite's default (durable) settings and page size instead of the bulk-load pragmas.")
+    make_analysis_parser.add_argument(
+        '--cache-mb', type=int, default=1024, help='SQLite page cache for the build in MiB (default: 1024).')
+    make_analysis_parser.add_argument(
+        '--in-place', '--move', dest='in_place', action='store_true',
+        help='Move the collection database to analysis_db and convert it there instead of copying it '
+             '(halves the disk needed; analysis_db may be the collection database itself). '
+             'Rerunning after an interruption resumes the build.')
+    make_analysis_parser.add_argument(
+        '--quiet', action='store_true', help="Don't print per-stage progress.")
+
+    capture_parser = subparsers.add_parser(
+        'capture',
+        help='Run a python script and dump its object graph while it runs.',
+        description='Run script in this process (via runpy) and spawn_dump() it once the '
+                    'triggers are met, forking on the script\'s main thread.',
+    )
+    capture_parser.add_argument(
+        '--path',
+        help='Dump path; numbered when --count > 1. Default: objex-<script>-<hostname>-<isodt>.db',
+    )
+    capture_parser.add_argument(
+        '--delay', type=float, default=0, help='Seconds to wait before the first dump. Default: 0')
+    capture_parser.add_argument(
+        '--count', type=int, default=1, help='Number of dumps to take. Default: 1')
+    capture_parser.add_argument(
+        '--interval', type=float, default=0, help='Seconds between dumps when --count > 1. Default: 0')
+    capture_parser.add_argument(
+        '--min-size', type=float, default=0, metavar='MB',
+        help="Don't dump until RSS reaches this many MiB.")
+    capture_parser.add_argument(
+        '--use-gc', action='store_true', help='Also record gc.get_referrers()/get_referents() edges.')
+    capture_parser.add_argument(
+        '--memory-budget-mb', type=float, metavar='MB',
+        help='Build each dump in memory, spilling to --path only past this many MiB.')
+    capture_parser.add_argument(
+        '--analyze', action='store_true',
+        help='Run make-analysis-db in the background on each dump (writes <path>-analysis.db).')
+    capture_parser.add_argument(
+        '--analyze-cache-mb', type=int, default=64,
+        help='SQLite page cache for each background build in MiB, kept small as it runs next to '
+             'the script. Default: 64')
+    capture_parser.add_argument('script', help='Python script to run.')
+    capture_parser.add_argument('script_args', nargs=argparse.REMAINDER, help='Arguments for the script.')
+
+    watch_parser = subparsers.add_parser(
+        'watch',
+        help='Record type histograms of a running python script over time.',
+        description='Run script in this process (via runpy) and append objex.type_histogram() '
+                    'to histogram_db every --interval seconds, then report the types that grew; '
+                    'without a script only the report is printed. '
+                    '`python -m objex web histogram_db` charts it.',
+    )
+    watch_parser.add_argument('histogram_db', help='Time series file to append to (created if missing).')
+    watch_parser.add_argument(
+        '--interval', type=float, default=60, help='Seconds between snapshots. Default: 60')
+    watch_parser.add_argument(
+        '--top', type=int, default=10, help='Number of growing types to report. Default: 10')
+    watch_parser.add_argument('script', nargs='?', help='Python script to run.')
+    watch_parser.add_argument('script_args', nargs=argparse.REMAINDER, help='Arguments for the script.')
+
+    collect_parser = subparsers.add_parser(
+        'collect',
+        help='Receive dumps streamed from other processes and write them to disk.',
+        description='Listen for dumps sent with a unix:///path or tcp://host:port dump path '
+                    '(e.g. objex.spawn_dump("tcp://collector:7411")). Streams are not authenticated: '
+                    'listen on a unix socket, loopback, or a network whose every peer you trust.',
+    )
+    collect_parser.add_argument('address', help='unix:///path/to.sock or tcp://host:port to listen on.')
+    collect_parser.add_argument(
+        '--directory', default='.', help='Where to write objex-<hostname>-<pid>-<stream>.db files. Default: .')
+    collect_parser.add_argument(
+        '--analyze', action='store_true', help='Also build <dump>-analysis.db once each stream finishes.')
+    collect_parser.add_argument('--once', action='store_true', help='Exit after the first finished dump.')
+
+    compress_parser = subparsers.add_parser(
+        'compress',
+        help='Compress a collection database for shipping off the host.',
+        description='Write a seekable compressed archive of a collection database; '
+                    'make-analysis-db reads it directly.',
+    )
+    compress_parser.add_argument('collection_db', help='Path to the collected objex dump database.')
+    compress_parser.add_argument('--output', help='Archive path. Default: <collection_db>.objexz')
+    compress_parser.add_argument(
+        '--codec', choices=archive.CODECS, default='zlib', help='Default: zlib (zstd needs zstandard installed)')
+    compress_parser.add_argument('--level', type=int, help='Compression level. Default: the codec default')
+    compress_parser.add_argument(
+        '--remove', action='store_true', help='Delete the collection database once it is compressed.')
 
     web_parser = subparsers.add_parser(
         'web',
@@ -38,6 +146,115 @@ def build_parser():
     return parser
 
 
+def _capture_paths(path, script, count):
+    if path is None:
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', os.path.splitext(os.path.basename(script))[0]).strip('_')
+        path = 'objex-{}-{}-{}.db'.format(slug or 'script', getfqdn(), time.strftime('%Y%m%dT%H%M%S'))
+    if count == 1:
+        return [path]
+    base, ext = os.path.splitext(path)
+    return ['{}-{}{}'.format(base, i, ext) for i in range(1, count + 1)]
+
+
+def _analysis_path(path):
+    base, ext = os.path.splitext(path)
+    return '{}-analysis{}'.format(base, ext or '.db')
+
+
+def _run_script(script, script_args, watch, thread_name):
+    '''
+    run script as __main__ on this thread, with its directory first on sys.path as
+    python would, while watch(stop_event) runs on a daemon thread; returns the
+    script's exit code
+    '''
+    stop_event = threading.Event()
+    watcher = threading.Thread(target=watch, args=(stop_event,), name=thread_name, daemon=True)
+    saved_argv, saved_path = sys.argv, sys.path[:]
+    sys.argv = [script] + script_args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    watcher.start()
+    exit_code = 0
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        exit_code = e.code
+    finally:
+        sys.argv = saved_argv
+        sys.path[:] = saved_path
+        stop_event.set()
+        watcher.join()  # lets a dump that already started finish
+    return exit_code
+
+
+def _capture(args):
+    '''
+    run the script on the main thread while a watcher thread decides when to dump
+    and signals the main thread to fork each dump, then wait for the
+    make-analysis-db processes that were started; returns the script's exit code
+    '''
+    analyzers = []
+
+    def watch(stop_event):
+        if stop_event.wait(args.delay):
+            return
+        while args.min_size and exporter._get_rss_mb() < args.min_size:
+            if stop_event.wait(0.5):
+                return
+        for i, path in enumerate(paths):
+            if i and stop_event.wait(args.interval):
+                return
+            trigger = 'objex capture {} ({} of {})'.format(os.path.basename(args.script), i + 1, len(paths))
+            try:
+                exporter.wait_dump(main_thread.request(
+                    path, use_gc=args.use_gc, trigger=trigger, memory_budget_mb=args.memory_budget_mb))
+            except RuntimeError as e:
+                print('objex capture: dump to {} failed: {}'.format(path, e), file=sys.stderr)
+                continue
+            print('objex capture: wrote {}'.format(path), file=sys.stderr)
+            if args.analyze:
+                analyzers.append(subprocess.Popen(
+                    [sys.executable, '-m', 'objex', 'make-analysis-db', '--quiet',
+                     '--cache-mb', str(args.analyze_cache_mb), path, _analysis_path(path)],
+                    env=env))
+
+    paths = _capture_paths(args.path, args.script, args.count)
+    env = dict(os.environ)  # objex may only be importable through this process's sys.path
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_parent, env.get('PYTHONPATH')]))
+    main_thread = exporter._install_request_handler()
+    try:
+        return _run_script(args.script, args.script_args, watch, 'objex-capture')
+    finally:
+        main_thread.uninstall()
+        for analyzer in analyzers:  # however the script ended
+            analyzer.wait()
+
+
+def _watch(args):
+    '''
+    append a type histogram at the start and then every interval while the script
+    runs (not after: the script's globals are gone by then); returns the exit code
+    '''
+    def watch(stop_event):
+        while not stop_event.wait(args.interval):
+            exporter.type_histogram(args.histogram_db)
+
+    exporter.type_histogram(args.histogram_db)
+    return _run_script(args.script, args.script_args, watch, 'objex-watch')
+
+
+def _print_type_growth(path, top):
+    growth = explorer.type_growth_data(path, limit=top)
+    snapshots = growth['snapshots']
+    if not snapshots:
+        print('no snapshots in {}'.format(path))
+        return
+    print('{} snapshots over {:0.0f}s, RSS {:0.1f} -> {:0.1f} MiB'.format(
+        len(snapshots), snapshots[-1]['ts'] - snapshots[0]['ts'], snapshots[0]['rss_mb'], snapshots[-1]['rss_mb']))
+    for item in growth['types']:
+        print('{:>+14,} bytes {:>+10,} objects  {}'.format(item['size_delta'], item['count_delta'], item['type_name']))
+
+
 def main(argv=None):
     if argv is None:
         import sys
@@ -50,8 +267,49 @@ def main(argv=None):
     parser = build_parser()
     args = parser.parse_args(argv)
 
+    if args.command == 'capture':
+        if args.script_args[:1] == ['--']:
+            args.script_args = args.script_args[1:]
+        return _capture(args)
+
+    if args.command == 'watch':
+        if args.script is None and args.script_args:
+            # argparse hands anything after histogram_db to the script, even options
+            parser.error('watch options go before histogram_db (or put the script after --)')
+        exit_code = 0
+        if args.script:
+            if args.script_args[:1] == ['--']:
+                args.script_args = args.script_args[1:]
+            exit_code = _watch(args)
+        _print_type_growth(args.histogram_db, args.top)
+        return exit_code
+
+    if args.command == 'collect':
+        def on_done(path):
+            print('objex collect: wrote {}'.format(path))
+            if args.once:
+                threading.Thread(target=server.shutdown).start()
+
+        server = collector.make_server(args.address, directory=args.directory, analyze=args.analyze, on_done=on_done)
+        print('objex collect: listening on {}'.format(args.address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
+    if args.command == 'compress':
+        path = archive.compress_dump(
+            args.collection_db, args.output, codec=args.codec, level=args.level, remove=args.remove)
+        print('objex compress: wrote {} ({:0.1f}MiB)'.format(path, os.stat(path).st_size / 1024.0 / 1024))
+        return 0
+
     if args.command == 'make-analysis-db':
-        explorer.make_analysis_db(args.collection_db, args.analysis_db)
+        explorer.make_analysis_db(
+            args.collection_db if len(args.collection_db) > 1 else args.collection_db[0], args.analysis_db,
+            print_info=not args.quiet, fast=args.fast, cache_mb=args.cache_mb, in_place=args.in_place)
         return 0
 
     if args.command == 'web':
@@ -76,7 +334,7 @@ def main(argv=None):
     analysis_db = args.analysis_db
 
     try:
-        with explorer.Reader(analysis_db) as reader:
+        with explorer.Reader(analysis_db, include_weak=args.include_weak) as reader:
             explorer.Console(reader).run()
     except Exception:
         if os.getenv('OBJEX_DEBUG', ''):
@@ -0,0 +1,169 @@
+"""
+Compressed, seekable archives of finished collection DBs (for shipping dumps off hosts).
+
+The DB file is cut into fixed-size frames which are compressed independently,
+so any byte range can be read back by decompressing only the frames it covers:
+
+  header: magic, codec name, frame size
+  frames: compressed frame data, back to back
+  index:  (offset, length) of each compressed frame
+  footer: index offset, uncompressed size, frame count, magic
+
+make_analysis_db() reads an archive frame by frame straight into the analysis DB,
+so no uncompressed copy of the collection DB is ever written.
+"""
+import os
+import sqlite3
+import struct
+import zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+_MAGIC = b'OBJEXZ\x00\x01'
+_HEADER = struct.Struct('>8s8sI')  # magic, codec, frame size
+_INDEX_ENTRY = struct.Struct('>QI')  # compressed offset, compressed length
+_FOOTER = struct.Struct('>QQI8s')  # index offset, uncompressed size, frame count, magic
+_SQLITE_MAGIC = b'SQLite format 3\x00'
+_DEFAULT_FRAME_SIZE = 1 << 20  # a multiple of every sqlite page size
+_ARCHIVE_SUFFIX = '.objexz'  # whatever the codec, which the header records
+
+CODECS = ('zlib', 'zstd')
+
+
+def _compressor(codec, level):
+    if codec == 'zlib':
+        level = 6 if level is None else level
+        return lambda data: zlib.compress(data, level)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError('zstd compression requires the zstandard package (pip install objex[zstd])')
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress
+    raise ValueError('unknown codec {!r}, expected one of {}'.format(codec, ', '.join(CODECS)))
+
+
+def _decompressor(codec):
+    if codec == 'zlib':
+        return zlib.decompress
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError('this archive is zstd compressed; reading it requires the zstandard package')
+        return zstandard.ZstdDecompressor().decompress
+    raise ValueError('unknown codec {!r} in objex archive'.format(codec))
+
+
+def is_compressed_dump(path):
+    '''whether path is an archive written by compress_dump()'''
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+    except (IOError, OSError):
+        return False
+
+
+def compress_dump(path, archive_path=None, codec='zlib', level=None, remove=False,
+                  frame_size=_DEFAULT_FRAME_SIZE):
+    '''
+    compress the finished collection DB at path into a seekable archive,
+    by default path + '.objexz'; returns the archive path
+
+    remove deletes the uncompressed DB once the archive is complete
+    '''
+    compress = _compressor(codec, level)
+    if archive_path is None:
+        archive_path = path + _ARCHIVE_SUFFIX
+    if os.path.exists(archive_path):
+        raise EnvironmentError('archive already exists at {}'.format(archive_path))
+    with open(path, 'rb') as src:
+        if src.read(len(_SQLITE_MAGIC)) != _SQLITE_MAGIC:
+            raise ValueError('{} is not a sqlite database'.format(path))
+    # fold any WAL back in, the archive must be a complete single-file db
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+    index = []
+    size = 0
+    with open(path, 'rb') as src, open(archive_path, 'wb') as dst:
+        dst.write(_HEADER.pack(_MAGIC, codec.encode('ascii'), frame_size))
+        offset = _HEADER.size
+        while True:
+            frame = src.read(frame_size)
+            if not frame:
+                break
+            size += len(frame)
+            data = compress(frame)
+            dst.write(data)
+            index.append((offset, len(data)))
+            offset += len(data)
+        for entry in index:
+            dst.write(_INDEX_ENTRY.pack(*entry))
+        dst.write(_FOOTER.pack(offset, size, len(index), _MAGIC))
+    if remove:
+        os.remove(path)
+    return archive_path
+
+
+class ArchiveReader:
+    '''
+    random access to the uncompressed bytes of an archive;
+    only the frames covering a read are decompressed
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            magic, codec, self.frame_size = _HEADER.unpack(self.file.read(_HEADER.size))
+            self.file.seek(-_FOOTER.size, os.SEEK_END)
+            index_offset, self.size, frame_count, end_magic = _FOOTER.unpack(self.file.read(_FOOTER.size))
+            if magic != _MAGIC or end_magic != _MAGIC:
+                raise ValueError('{} is not a complete objex archive'.format(path))
+            self.codec = codec.rstrip(b'\x00').decode('ascii')
+            self._decompress = _decompressor(self.codec)
+            self.file.seek(index_offset)
+            index_data = self.file.read(frame_count * _INDEX_ENTRY.size)
+            self.index = [
+                _INDEX_ENTRY.unpack_from(index_data, i * _INDEX_ENTRY.size) for i in range(frame_count)]
+        except Exception:
+            self.file.close()
+            raise
+        self._cached = (None, b'')  # (frame number, data) of the last frame read
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def frame(self, i):
+        '''uncompressed data of frame i'''
+        if self._cached[0] != i:
+            offset, length = self.index[i]
+            self.file.seek(offset)
+            self._cached = (i, self._decompress(self.file.read(length)))
+        return self._cached[1]
+
+    def read(self, offset, size):
+        chunks = []
+        end = min(offset + size, self.size)
+        while offset < end:
+            i, start = divmod(offset, self.frame_size)
+            chunk = self.frame(i)[start:start + end - offset] if i < len(self.index) else b''
+            if not chunk:  # the footer promised more than the frames hold
+                raise ValueError('{} is truncated or corrupt: no data at offset {}'.format(self.path, offset))
+            chunks.append(chunk)
+            offset += len(chunk)
+        return b''.join(chunks)
+
+    def extract_to(self, fileobj):
+        '''write the uncompressed db to fileobj one frame at a time'''
+        for i in range(len(self.index)):
+            fileobj.write(self.frame(i))
+        self._cached = (None, b'')
@@ -0,0 +1,398 @@
+"""
+Stream a dump to an `objex collect` receiver instead of writing it locally.
+
+The dumping process sends the rows it would insert into a local collection DB,
+in batches over a unix or tcp socket, as [op, table, columns, rows] statements;
+op is "insert", or "update" for the single meta row. The receiver checks the
+table and columns against the collection schema and builds the SQL itself.
+Every frame is a 4 byte big-endian length followed by a JSON object:
+
+  sender -> receiver: {"type": "hello", "stream": token, "hostname": ..., "pid": ...}
+  receiver -> sender: {"type": "welcome", "acked": last committed seq or -1}
+  sender -> receiver: {"type": "batch", "seq": n, "statements": [[op, table, [column, ...], [row, ...]], ...]}
+  receiver -> sender: {"type": "ack", "seq": n}
+  sender -> receiver: {"type": "end", "seq": last seq}
+  receiver -> sender: {"type": "done", "path": collection db path}
+
+The sender keeps at most `window` unacknowledged batches (flow control) and on
+a dropped connection reconnects with the same stream token and resends
+whatever the receiver had not committed (resumption); the receiver commits
+each batch in the same transaction as its progress marker, so nothing is
+applied twice.
+
+There is no authentication: anyone who can connect can write dumps into the
+receiver's directory (and with --analyze start analysis builds), so listen on
+a unix socket or a loopback / trusted network address only.
+"""
+import json
+import os
+import re
+import socket
+import socketserver
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+
+from .schema import _SCHEMA
+from .dbutils import _run_ddl
+
+
+_FRAME_HEADER = struct.Struct('>I')
+_MAX_FRAME_BYTES = 1 << 30
+_INSERT_RE = re.compile(r'\s*INSERT INTO (\w+)\s*\(([^)]*)\)\s*VALUES\s*\([?,\s]*\)\s*$', re.IGNORECASE)
+_UPDATE_META_RE = re.compile(r'\s*UPDATE meta SET ((?:\s*\w+\s*=\s*\?\s*,?)+)$', re.IGNORECASE)
+
+
+def _parse_collector_address(address):
+    '''
+    ('unix', path) for unix:///path/to.sock, ('tcp', (host, port)) for tcp://host:port,
+    None for anything else (i.e. a filesystem path)
+    '''
+    if not isinstance(address, str):
+        return None
+    if address.startswith('unix://'):
+        return 'unix', address[len('unix://'):]
+    if address.startswith('tcp://'):
+        host, _, port = address[len('tcp://'):].rpartition(':')
+        return 'tcp', (host or '127.0.0.1', int(port))
+    return None
+
+
+def _statement_shape(sql):
+    '''(op, table, columns) of an INSERT, or UPDATE of meta, with one ? per column'''
+    match = _INSERT_RE.match(sql)
+    if match:
+        return 'insert', match.group(1), [column.strip() for column in match.group(2).split(',')]
+    match = _UPDATE_META_RE.match(sql)
+    if match:
+        return 'update', 'meta', [
+            assignment.split('=')[0].strip() for assignment in match.group(1).split(',') if assignment.strip()]
+    raise ValueError('cannot stream statement: {!r}'.format(sql[:60]))
+
+
+def _schema_columns():
+    '''map of each collection schema table to the set of its columns'''
+    conn = sqlite3.connect(':memory:')
+    try:
+        _run_ddl(conn, _SCHEMA)
+        return {
+            table: {row[1] for row in conn.execute("PRAGMA table_info({})".format(table))}
+            for table, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        }
+    finally:
+        conn.close()
+
+
+def _statement_sql(schema_columns, op, table, columns):
+    '''the SQL for a streamed statement, or ValueError if it is not one the sender may make'''
+    if table not in schema_columns or op not in ('insert', 'update') or (op == 'update' and table != 'meta'):
+        raise ValueError('statement not allowed: {} {!r}'.format(op, table))
+    if not columns or len(set(columns)) != len(columns) or not set(columns) <= schema_columns[table]:
+        raise ValueError('bad columns for {}: {!r}'.format(table, columns))
+    if op == 'insert':
+        return 'INSERT INTO {} ({}) VALUES ({})'.format(table, ', '.join(columns), ', '.join('?' * len(columns)))
+    return 'UPDATE meta SET {}'.format(', '.join('{} = ?'.format(column) for column in columns))
+
+
+def _check_message(message, expected_types):
+    '''ValueError unless message is a well formed frame of one of expected_types'''
+    if not isinstance(message, dict) or message.get('type') not in expected_types:
+        raise ValueError('expected a {} frame'.format(' or '.join(expected_types)))
+    if message['type'] in ('batch', 'end') and (
+            not isinstance(message.get('seq'), int) or isinstance(message['seq'], bool)):
+        raise ValueError('{} frame without an integer seq'.format(message['type']))
+    if message['type'] == 'batch':
+        statements = message.get('statements')
+        if not isinstance(statements, list) or not all(
+                isinstance(statement, list) and len(statement) == 4
+                and all(isinstance(part, str) for part in statement[:2])
+                and isinstance(statement[2], list) and all(isinstance(column, str) for column in statement[2])
+                and isinstance(statement[3], list) and all(
+                    isinstance(row, list) and len(row) == len(statement[2]) for row in statement[3])
+                for statement in statements):
+            raise ValueError('batch frame with malformed statements')
+
+
+def _send_frame(sock, message):
+    payload = json.dumps(message, separators=(',', ':')).encode('utf8')
+    sock.sendall(_FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError('objex collector connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_frame(sock):
+    size, = _FRAME_HEADER.unpack(_recv_exactly(sock, _FRAME_HEADER.size))
+    if size > _MAX_FRAME_BYTES:
+        raise ConnectionError('objex collector frame too large: {}'.format(size))
+    return json.loads(_recv_exactly(sock, size).decode('utf8'))
+
+
+class _StreamConnection:
+    '''
+    stands in for the sqlite3 connection _Writer writes to; execute() and
+    executemany() are buffered into batches which are sent on commit() or
+    once batch_rows rows have piled up
+    '''
+    def __init__(self, address, hostname, pid, window=8, batch_rows=20000,
+                 reconnect_timeout_s=30, connect_timeout_s=10):
+        self.address = _parse_collector_address(address)
+        if self.address is None:
+            raise ValueError('not a collector address: {!r}'.format(address))
+        self.stream = uuid.uuid4().hex
+        self.hostname = hostname
+        self.pid = pid
+        self.window = window
+        self.batch_rows = batch_rows
+        self.reconnect_timeout_s = reconnect_timeout_s
+        self.connect_timeout_s = connect_timeout_s
+        self.sock = None
+        self.seq = 0  # seq of the next batch
+        self.unacked = []  # [(seq, frame)] sent but not yet committed by the receiver, oldest first
+        self.shapes = {}  # map of sql text to (op, table, columns)
+        self.statements = []
+        self.row_count = 0
+        self._connect()
+
+    def _connect(self):
+        family, address = self.address
+        deadline = time.time() + self.reconnect_timeout_s
+        while True:
+            sock = None
+            try:
+                if family == 'unix':
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                else:
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.settimeout(self.connect_timeout_s)
+                sock.connect(address)
+                sock.settimeout(None)
+                _send_frame(sock, {
+                    'type': 'hello', 'stream': self.stream, 'hostname': self.hostname, 'pid': self.pid})
+                welcome = _recv_frame(sock)
+            except OSError:
+                if sock is not None:
+                    sock.close()
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+                continue
+            except Exception:
+                sock.close()
+                raise
+            if welcome['type'] == 'error':
+                sock.close()
+                raise RuntimeError('objex collector rejected the stream: {}'.format(welcome['error']))
+            break
+        self.sock = sock
+        self.unacked = [(seq, frame) for seq, frame in self.unacked if seq > welcome['acked']]
+        for _, frame in self.unacked:
+            _send_frame(sock, frame)
+
+    def _reconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self._connect()
+
+    def _wait_for_ack(self):
+        while True:
+            try:
+                message = _recv_frame(self.sock)
+                break
+            except OSError:
+                self._reconnect()
+        if message['type'] == 'error':
+            raise RuntimeError('objex collector rejected the stream: {}'.format(message['error']))
+        self.unacked = [(seq, frame) for seq, frame in self.unacked if seq > message['seq']]
+        return message
+
+    def execute(self, sql, params=()):
+        self.executemany(sql, [params])
+
+    def executemany(self, sql, seq_of_params):
+        rows = [list(params) for params in seq_of_params]
+        if not rows:
+            return
+        shape = self.shapes.get(sql)
+        if shape is None:
+            shape = self.shapes[sql] = _statement_shape(sql)
+        if self.statements and tuple(self.statements[-1][:3]) == (shape[0], shape[1], shape[2]):
+            self.statements[-1][3].extend(rows)
+        else:
+            self.statements.append([shape[0], shape[1], shape[2], rows])
+        self.row_count += len(rows)
+        if self.row_count >= self.batch_rows:
+            self.commit()
+
+    def commit(self):
+        if not self.statements:
+            return
+        frame = {
+            'type': 'batch',
+            'seq': self.seq,
+            'statements': self.statements,
+        }
+        self.seq += 1
+        self.statements, self.row_count = [], 0
+        self.unacked.append((frame['seq'], frame))
+        try:
+            _send_frame(self.sock, frame)
+        except OSError:
+            self._reconnect()  # resends everything unacked, this frame included
+        while len(self.unacked) >= self.window:
+            self._wait_for_ack()
+
+    def close(self):
+        self.commit()
+        while self.unacked:
+            self._wait_for_ack()
+        while True:
+            try:
+                _send_frame(self.sock, {'type': 'end', 'seq': self.seq - 1})
+                done = _recv_frame(self.sock)
+                break
+            except OSError:
+                self._reconnect()
+        self.sock.close()
+        return done
+
+
+def make_handler(directory, analyze=False, on_done=None):
+    schema_columns = _schema_columns()
+
+    class CollectorHandler(socketserver.BaseRequestHandler):
+        stream_locks = {}  # streams being received, dropped once done
+        stream_locks_lock = threading.Lock()
+
+        def handle(self):
+            sock = self.request
+            try:
+                hello = _recv_frame(sock)
+            except (OSError, ValueError):
+                return
+            stream = hello.get('stream') if isinstance(hello, dict) else None
+            if not isinstance(stream, str) or not stream.isalnum() or hello.get('type') != 'hello':
+                _send_frame(sock, {'type': 'error', 'error': 'expected hello'})
+                return
+            with self.stream_locks_lock:
+                lock = self.stream_locks.setdefault(stream, threading.Lock())
+            with lock:  # a reconnect waits for the dead connection's handler to finish
+                path = os.path.join(directory, 'objex-{}-{}-{}.db'.format(
+                    ''.join(c if c.isalnum() or c in '.-' else '_' for c in str(hello.get('hostname'))),
+                    hello['pid'] if isinstance(hello.get('pid'), int) else 0, stream))
+                try:
+                    conn = _open_stream_db(path, stream)
+                except ValueError as e:
+                    _send_frame(sock, {'type': 'error', 'error': str(e)})
+                    return
+                try:
+                    self._receive(sock, conn, stream, path)
+                except OSError:
+                    return  # the sender reconnects and resumes
+                except ValueError as e:
+                    try:
+                        _send_frame(sock, {'type': 'error', 'error': str(e)})
+                    except OSError:
+                        pass
+                    return
+                finally:
+                    conn.close()
+            with self.stream_locks_lock:
+                self.stream_locks.pop(stream, None)
+            self._finished(path)
+
+        def _receive(self, sock, conn, stream, path):
+            acked = conn.execute("SELECT acked FROM stream_state WHERE stream = ?", (stream,)).fetchone()[0]
+            _send_frame(sock, {'type': 'welcome', 'acked': acked})
+            while True:
+                message = _recv_frame(sock)
+                _check_message(message, ('batch', 'end'))
+                if message['type'] == 'end':
+                    break
+                if message['seq'] <= acked:
+                    _send_frame(sock, {'type': 'ack', 'seq': message['seq']})  # already applied
+                    continue
+                try:
+                    for op, table, columns, rows in message['statements']:
+                        conn.executemany(_statement_sql(schema_columns, op, table, columns), rows)
+                    acked = message['seq']
+                    conn.execute("UPDATE stream_state SET acked = ? WHERE stream = ?", (acked, stream))
+                    conn.commit()
+                except (sqlite3.Error, ValueError) as e:
+                    conn.rollback()
+                    raise ValueError(str(e))
+                _send_frame(sock, {'type': 'ack', 'seq': acked})
+            conn.execute("DROP TABLE stream_state")
+            conn.commit()
+            conn.execute("VACUUM")
+            _send_frame(sock, {'type': 'done', 'path': path})
+
+        def _finished(self, path):
+            if analyze:
+                from .explorer import make_analysis_db
+                base, ext = os.path.splitext(path)
+                make_analysis_db(path, '{}-analysis{}'.format(base, ext))
+            if on_done is not None:
+                on_done(path)
+
+    return CollectorHandler
+
+
+def _open_stream_db(path, stream):
+    conn = sqlite3.connect(path)
+    conn.text_factory = str
+    if not conn.execute("SELECT name FROM sqlite_master WHERE name = 'stream_state'").fetchone():
+        if conn.execute("SELECT name FROM sqlite_master WHERE name = 'meta'").fetchone():
+            conn.close()
+            raise ValueError('{} already holds a finished dump'.format(path))
+        _run_ddl(conn, _SCHEMA)
+        conn.execute("CREATE TABLE stream_state (stream TEXT PRIMARY KEY, acked INTEGER NOT NULL)")
+        conn.execute("INSERT INTO stream_state (stream, acked) VALUES (?, -1)", (stream,))
+        conn.commit()
+    return conn
+
+
+class _ThreadingUnixStreamServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(address, directory='.', analyze=False, on_done=None):
+    '''
+    a socketserver receiving dumps streamed to address (unix:///path or tcp://host:port)
+    and writing each to <directory>/objex-<hostname>-<pid>-<stream>.db;
+    with analyze the analysis db is built next to it once the stream ends
+
+    streams are not authenticated, so a tcp address should be loopback or on a
+    network where every peer is trusted to write into directory
+    '''
+    parsed = _parse_collector_address(address)
+    if parsed is None:
+        raise ValueError('expected unix:///path or tcp://host:port, got {!r}'.format(address))
+    family, bind_address = parsed
+    handler = make_handler(directory, analyze=analyze, on_done=on_done)
+    if family == 'unix':
+        if os.path.exists(bind_address):
+            os.remove(bind_address)
+        return _ThreadingUnixStreamServer(bind_address, handler)
+    return _ThreadingTCPServer(bind_address, handler)
@@ -1,11 +1,15 @@
 import ast
 from collections import Counter
+from contextlib import contextmanager
+import json
 import os
 from cmd import Cmd
 import pprint
 import random
 import re
 import sqlite3
+import statistics
+import time
 try:
     import colorama
 except ImportError:
@@ -19,6 +23,7 @@ except ImportError:
 
 from .schema import _INDICES
 from .dbutils import _run_ddl
+from .archive import ArchiveReader, is_compressed_dump, _SQLITE_MAGIC
 
 
 class InvalidDatabaseError(ValueError):
@@ -59,20 +64,34 @@ def _validate_objex_db(conn, path, require_indices=False):
             )
 
 
+def _table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
 def _add_class_references(conn):
     '''
     ensure there is a __class__ pointing from instance to class
+
+    make_analysis_db runs this before the reference indices exist, so a row per
+    object is appended without index upkeep; the few __class__ references the
+    dump already has are gathered into a small temp table to check against
     '''
+    conn.execute("DROP TABLE IF EXISTS temp.class_ref")
+    conn.execute("CREATE TABLE temp.class_ref (src INTEGER NOT NULL, dst INTEGER NOT NULL)")
+    conn.execute("INSERT INTO temp.class_ref (src, dst) SELECT src, dst FROM reference WHERE ref = '__class__'")
+    conn.execute("CREATE INDEX temp.class_ref_all ON class_ref(src, dst)")
     conn.execute("""
         INSERT INTO reference (src, dst, ref)
         SELECT id, pytype, '__class__' FROM object
         WHERE NOT EXISTS (
-            SELECT 1 FROM REFERENCE WHERE
-            src = object.id AND
-            dst = object.pytype AND
-            ref = '__class__'
+            SELECT 1 FROM temp.class_ref WHERE
+            class_ref.src = object.id AND
+            class_ref.dst = object.pytype
         )
     """)
+    conn.execute("DROP TABLE temp.class_ref")
 
 
 def _reconcile_source_wal(conn):
@@ -89,9 +108,88 @@ def _ensure_analysis_meta_columns(conn):
         conn.execute("ALTER TABLE meta ADD COLUMN immortal_refcount INTEGER")
     if 'immortal_object_count' not in meta_columns:
         conn.execute("ALTER TABLE meta ADD COLUMN immortal_object_count INTEGER")
+    if 'pymalloc_arena_size' not in meta_columns:
+        conn.execute("ALTER TABLE meta ADD COLUMN pymalloc_arena_size INTEGER")
+    if 'trigger' not in meta_columns:
+        conn.execute("ALTER TABLE meta ADD COLUMN trigger TEXT")
+    if 'analysis_timings' not in meta_columns:
+        conn.execute("ALTER TABLE meta ADD COLUMN analysis_timings TEXT")  # JSON {stage: seconds}
+    if 'analysis_stage' not in meta_columns:
+        conn.execute("ALTER TABLE meta ADD COLUMN analysis_stage TEXT")  # see make_analysis_db
+
+
+def _ensure_analysis_schema(conn):
+    # dumps from older exporters predate these columns and tables
+    object_columns = {
+        row[1] for row in conn.execute("PRAGMA table_info(object)")
+    }
+    if 'gc_generation' not in object_columns:
+        conn.execute("ALTER TABLE object ADD COLUMN gc_generation INTEGER")
+    if 'address' not in object_columns:
+        conn.execute("ALTER TABLE object ADD COLUMN address INTEGER")
+    if 'alloc_traceback' not in object_columns:
+        conn.execute("ALTER TABLE object ADD COLUMN alloc_traceback INTEGER")
+    if 'in_gc_garbage' not in object_columns:
+        conn.execute("ALTER TABLE object ADD COLUMN in_gc_garbage INTEGER")
+    if 'has_finalizer' not in object_columns:
+        conn.execute("ALTER TABLE object ADD COLUMN has_finalizer INTEGER")
+    if not _table_exists(conn, 'alloc_traceback'):
+        conn.execute(
+            """
+            CREATE TABLE alloc_traceback (
+                id INTEGER PRIMARY KEY,
+                filename TEXT NOT NULL,
+                lineno INTEGER NOT NULL,
+                trace TEXT NOT NULL
+            )
+            """
+        )
+    if not _table_exists(conn, 'lru_cache'):
+        conn.execute(
+            """
+            CREATE TABLE lru_cache (
+                id INTEGER PRIMARY KEY,
+                object INTEGER NOT NULL,
+                hits INTEGER NOT NULL,
+                misses INTEGER NOT NULL,
+                maxsize INTEGER,
+                currsize INTEGER NOT NULL
+            )
+            """
+        )
+    if not _table_exists(conn, 'asyncio_task'):
+        conn.execute(
+            """
+            CREATE TABLE asyncio_task (
+                id INTEGER PRIMARY KEY,
+                object INTEGER NOT NULL,
+                coro_obj_id INTEGER,
+                coro_name TEXT NOT NULL,
+                state TEXT NOT NULL
+            )
+            """
+        )
+    if not _table_exists(conn, 'buffer'):
+        conn.execute(
+            """
+            CREATE TABLE buffer (
+                id INTEGER PRIMARY KEY,
+                object INTEGER NOT NULL,
+                owner INTEGER NOT NULL,
+                nbytes INTEGER NOT NULL,
+                owns_buffer INTEGER NOT NULL,
+                in_size INTEGER NOT NULL
+            )
+            """
+        )
 
 
 def _build_attributed_size_table(conn):
+    '''
+    attributed size is sys.getsizeof() with instance __dict__ sizes moved onto
+    the instance, and each shared data buffer (see the buffer table) charged
+    exactly once, to the object that owns it, unless getsizeof() already counted it
+    '''
     conn.execute("DROP TABLE IF EXISTS object_attributed_size")
     conn.execute(
         """
@@ -101,30 +199,636 @@ def _build_attributed_size_table(conn):
         )
         """
     )
+    if _table_exists(conn, 'buffer'):
+        buffer_size, buffer_join = (
+            'COALESCE(buffer_charge.nbytes, 0)',
+            """
+            LEFT JOIN (
+                SELECT owner, max(nbytes) AS nbytes FROM buffer
+                GROUP BY owner HAVING max(in_size) = 0
+            ) AS buffer_charge ON buffer_charge.owner = object.id
+            """,
+        )
+    else:
+        buffer_size, buffer_join = '0', ''
+    # the '.__dict__' edges are gathered once into two rowid-keyed temp tables
+    # (dict sizes by owner, and the dicts themselves) instead of being looked up per object
+    conn.execute("DROP TABLE IF EXISTS temp.dict_owner_size")
+    conn.execute("DROP TABLE IF EXISTS temp.owned_dict")
+    conn.execute("CREATE TABLE temp.dict_owner_size (object INTEGER PRIMARY KEY, size INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE temp.owned_dict (object INTEGER PRIMARY KEY)")
+    conn.execute(
+        """
+        INSERT INTO temp.dict_owner_size (object, size)
+        SELECT reference.src, SUM(dict_object.size)
+        FROM reference
+        JOIN object AS dict_object ON dict_object.id = reference.dst
+        WHERE reference.ref = '.__dict__'
+        GROUP BY reference.src
+        """
+    )
+    conn.execute("INSERT OR IGNORE INTO temp.owned_dict (object) SELECT dst FROM reference WHERE ref = '.__dict__'")
     conn.execute(
         """
         INSERT INTO object_attributed_size (object, attributed_size)
         SELECT
             object.id,
-            object.size
-            + COALESCE((
-                SELECT SUM(dict_object.size)
-                FROM reference
-                JOIN object AS dict_object ON dict_object.id = reference.dst
-                WHERE reference.src = object.id AND reference.ref = '.__dict__'
-            ), 0)
-            - CASE WHEN EXISTS (
-                SELECT 1 FROM reference
-                WHERE reference.dst = object.id AND reference.ref = '.__dict__'
-            ) THEN object.size ELSE 0 END
+            CASE WHEN owned_dict.object IS NULL THEN object.size ELSE 0 END
+            + COALESCE(dict_owner_size.size, 0)
+            + {buffer_size}
         FROM object
-        """
+        LEFT JOIN temp.dict_owner_size ON dict_owner_size.object = object.id
+        LEFT JOIN temp.owned_dict ON owned_dict.object = object.id
+        {buffer_join}
+        """.format(buffer_size=buffer_size, buffer_join=buffer_join)
     )
+    conn.execute("DROP TABLE temp.dict_owner_size")
+    conn.execute("DROP TABLE temp.owned_dict")
     conn.execute(
         "CREATE INDEX object_attributed_size_size ON object_attributed_size(attributed_size)"
     )
 
 
+def _fill_pymalloc_object_counts(conn):
+    '''
+    bucket exported objects into the pymalloc size classes recorded at dump time;
+    sys.getsizeof() includes the GC header so this lines up with the
+    block pymalloc handed out (modulo objects that allocate separate buffers)
+    '''
+    row = conn.execute(
+        "SELECT block_size / (size_class + 1), max(block_size) FROM pymalloc_size_class"
+    ).fetchone()
+    if not row or not row[0]:
+        return
+    alignment, threshold = row
+    conn.execute(
+        """
+        UPDATE pymalloc_size_class SET object_count = COALESCE((
+            SELECT object_count FROM (
+                SELECT (size - 1) / ? AS size_class, count(*) AS object_count
+                FROM object WHERE size > 0 AND size <= ?
+                GROUP BY (size - 1) / ?
+            ) AS counts WHERE counts.size_class = pymalloc_size_class.size_class
+        ), 0)
+        """,
+        (alignment, threshold, alignment),
+    )
+
+
+_DEFAULT_ARENA_SIZE = 1 << 20  # 1MiB on 3.10+, older dumps record 256KiB in pymalloc_stat
+_SMALL_REQUEST_THRESHOLD = 512
+
+
+def _build_object_degree_table(conn):
+    '''
+    object_degree: reference counts for every object, so that the counts shown
+    for an object are a lookup and the most referenced objects an index scan
+    '''
+    conn.execute("DROP TABLE IF EXISTS object_degree")
+    conn.execute(
+        """
+        CREATE TABLE object_degree (
+            object INTEGER PRIMARY KEY,
+            in_degree INTEGER NOT NULL, -- references to the object
+            out_degree INTEGER NOT NULL, -- references from the object
+            in_from_dict_keys INTEGER NOT NULL -- dicts holding it as a key (ref '@<object>')
+        )
+        """
+    )
+    for name, select in (
+        ('in_degree', "SELECT dst, count(*) FROM reference GROUP BY dst"),
+        ('out_degree', "SELECT src, count(*) FROM reference GROUP BY src"),
+        # a range on ref rather than LIKE '@%', so the reference_ref index applies
+        ('dict_key_degree',
+         "SELECT CAST(substr(ref, 2) AS INTEGER), count(*) FROM reference"
+         " WHERE ref >= '@' AND ref < 'A' GROUP BY ref"),
+    ):
+        conn.execute("DROP TABLE IF EXISTS temp.{}".format(name))
+        conn.execute("CREATE TABLE temp.{} (object INTEGER PRIMARY KEY, count INTEGER NOT NULL)".format(name))
+        conn.execute("INSERT INTO temp.{} (object, count) {}".format(name, select))
+    conn.execute(
+        """
+        INSERT INTO object_degree (object, in_degree, out_degree, in_from_dict_keys)
+        SELECT
+            object.id,
+            COALESCE(in_degree.count, 0),
+            COALESCE(out_degree.count, 0),
+            COALESCE(dict_key_degree.count, 0)
+        FROM object
+        LEFT JOIN temp.in_degree ON in_degree.object = object.id
+        LEFT JOIN temp.out_degree ON out_degree.object = object.id
+        LEFT JOIN temp.dict_key_degree ON dict_key_degree.object = object.id
+        """
+    )
+    for name in ('in_degree', 'out_degree', 'dict_key_degree'):
+        conn.execute("DROP TABLE temp.{}".format(name))
+    conn.execute("CREATE INDEX object_degree_in_degree ON object_degree(in_degree)")
+
+
+# root kinds of root_distance, with the query for their root objects
+_ROOT_KINDS = [
+    ('module', "SELECT object FROM module"),
+    ('frame', "SELECT object FROM pyframe"),
+    ('thread', "SELECT stack_obj_id AS object FROM thread"),  # the innermost frame of each thread's stack
+]
+
+
+def _build_root_distance_table(conn):
+    '''
+    root_distance: for each root kind, every object reachable from a root of that
+    kind, with its distance from the nearest such root and the referrer one step
+    closer to it. One multi-source breadth first search per kind, a level at a time,
+    over the edges the Reader's path finding follows: strong references except
+    f_globals, plus the dict -> key edges of '@<object>' refs
+    '''
+    conn.execute("DROP TABLE IF EXISTS root_distance")
+    conn.execute(
+        """
+        CREATE TABLE root_distance (
+            kind TEXT NOT NULL, -- 'module', 'frame' or 'thread'
+            object INTEGER NOT NULL,
+            distance INTEGER NOT NULL, -- references from the nearest root of the kind, 0 for the roots
+            parent INTEGER, -- referrer one step closer to that root, NULL for the roots
+            ref TEXT -- the reference from parent to object
+        )
+        """
+    )
+    for name in ('bfs_seen', 'bfs_fringe'):
+        conn.execute("DROP TABLE IF EXISTS temp.{}".format(name))
+        conn.execute("CREATE TABLE temp.{} (object INTEGER PRIMARY KEY)".format(name))
+    conn.execute("DROP TABLE IF EXISTS temp.bfs_next")
+    conn.execute("CREATE TABLE temp.bfs_next (object INTEGER PRIMARY KEY, parent INTEGER NOT NULL, ref TEXT)")
+    for kind, roots in _ROOT_KINDS:
+        conn.execute("DELETE FROM temp.bfs_seen")
+        conn.execute("DELETE FROM temp.bfs_fringe")
+        conn.execute(
+            "INSERT OR IGNORE INTO temp.bfs_fringe (object) SELECT root.object FROM ({}) AS root"
+            " JOIN object ON object.id = root.object".format(roots))
+        conn.execute(
+            "INSERT INTO root_distance (kind, object, distance) SELECT ?, object, 0 FROM temp.bfs_fringe", (kind,))
+        conn.execute("INSERT INTO temp.bfs_seen (object) SELECT object FROM temp.bfs_fringe")
+        distance = 0
+        while True:
+            distance += 1
+            conn.execute("DELETE FROM temp.bfs_next")
+            # the first edge found to an object is its parent edge
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO temp.bfs_next (object, parent, ref)
+                SELECT edge.dst, edge.src, edge.ref FROM (
+                    SELECT reference.dst AS dst, reference.src AS src, reference.ref AS ref
+                    FROM temp.bfs_fringe JOIN reference ON reference.src = bfs_fringe.object
+                    WHERE reference.ref NOT LIKE '~%' AND reference.ref NOT LIKE '%.f_globals%'
+                    UNION ALL
+                    SELECT CAST(substr(reference.ref, 2) AS INTEGER), reference.src, reference.ref
+                    FROM temp.bfs_fringe JOIN reference ON reference.src = bfs_fringe.object
+                    WHERE reference.ref >= '@' AND reference.ref < 'A'
+                ) AS edge
+                WHERE edge.dst NOT IN (SELECT object FROM temp.bfs_seen)
+                """
+            )
+            if not conn.execute("SELECT EXISTS(SELECT 1 FROM temp.bfs_next)").fetchone()[0]:
+                break
+            conn.execute(
+                "INSERT INTO root_distance (kind, object, distance, parent, ref)"
+                " SELECT ?, object, ?, parent, ref FROM temp.bfs_next", (kind, distance))
+            conn.execute("INSERT INTO temp.bfs_seen (object) SELECT object FROM temp.bfs_next")
+            conn.execute("DELETE FROM temp.bfs_fringe")
+            conn.execute("INSERT INTO temp.bfs_fringe (object) SELECT object FROM temp.bfs_next")
+    for name in ('bfs_seen', 'bfs_fringe', 'bfs_next'):
+        conn.execute("DROP TABLE temp.{}".format(name))
+    conn.execute("CREATE UNIQUE INDEX root_distance_object ON root_distance(object, kind)")
+
+
+def _build_arena_table(conn):
+    '''
+    group small objects by address into pymalloc arenas;
+    an arena can only be returned to the OS once every block in it is free,
+    so a nearly empty arena is "pinned" by the few objects left in it
+
+    arenas are only pool-aligned, so bucketing by address // arena size
+    is approximate, and objects the exporter never reached are not counted;
+    statically allocated objects (None, small ints, builtin types...) live in
+    the interpreter's own data rather than in an arena, so objects inside a
+    library or file mapping are left out where the dump recorded their addresses
+    '''
+    arena_size = _DEFAULT_ARENA_SIZE
+    if _table_exists(conn, 'pymalloc_stat'):
+        row = conn.execute(
+            "SELECT value FROM pymalloc_stat WHERE name = 'arena size' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row:
+            arena_size = row[0]
+    conn.execute("UPDATE meta SET pymalloc_arena_size = ?", (arena_size,))
+    conn.execute("DROP TABLE IF EXISTS pymalloc_arena")
+    conn.execute(
+        """
+        CREATE TABLE pymalloc_arena (
+            arena INTEGER PRIMARY KEY, -- address // arena size
+            object_count INTEGER NOT NULL,
+            used_bytes INTEGER NOT NULL
+        )
+        """
+    )
+    static_filter = ''
+    if 'start_address' in {row[1] for row in conn.execute("PRAGMA table_info(memory_map)")}:
+        conn.execute("DROP TABLE IF EXISTS temp.static_range")
+        conn.execute("CREATE TEMP TABLE static_range (start_address INTEGER PRIMARY KEY, end_address INTEGER)")
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO temp.static_range (start_address, end_address)
+            SELECT start_address, end_address FROM memory_map
+            WHERE kind IN ('library', 'file') AND start_address IS NOT NULL
+            """
+        )
+        # the mapping starting closest below each address is the only one that can hold it
+        static_filter = """
+            AND NOT EXISTS (
+                SELECT 1 FROM (
+                    SELECT end_address FROM temp.static_range WHERE start_address <= object.address
+                    ORDER BY start_address DESC LIMIT 1
+                ) WHERE end_address > object.address
+            )
+        """
+    conn.execute(
+        """
+        INSERT INTO pymalloc_arena (arena, object_count, used_bytes)
+        SELECT address / ?, count(*), sum(size) FROM object
+        WHERE address IS NOT NULL AND size <= ? {}
+        GROUP BY address / ?
+        """.format(static_filter),
+        (arena_size, _SMALL_REQUEST_THRESHOLD, arena_size),
+    )
+    conn.execute("DROP TABLE IF EXISTS temp.static_range")
+    conn.execute(
+        "CREATE INDEX pymalloc_arena_used_bytes ON pymalloc_arena(used_bytes)"
+    )
+
+
+def _strongly_connected_components(start_ids, neighbors):
+    '''
+    iterative Tarjan's algorithm over the part of the graph reachable from start_ids;
+    yields each strongly connected component as a list of node ids
+
+    https://en.wikipedia.org/wiki/Tarjan%27s_strongly_connected_components_algorithm
+    '''
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    for start in start_ids:
+        if start in index:
+            continue
+        index[start] = lowlink[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(neighbors(start)))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(neighbors(child))))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    yield component
+
+
+# edges that tie nearly everything together through module globals and classes;
+# cycle and transitive size searches skip these, along with edges into modules and types
+_GRAPH_SKIP_REFS = ('__class__', '.__globals__', '.f_globals', '.f_builtins')
+
+
+def _module_and_type_ids(conn):
+    return {
+        row[0] for row in conn.execute("SELECT object FROM module UNION SELECT object FROM pytype")
+    }
+
+
+def _build_gc_cycle_table(conn):
+    '''
+    group objects the collector could not free (gc.garbage), and objects with
+    finalizers, into the reference cycles they sit in
+
+    cycles are strongly connected components of the strong reference graph,
+    not counting edges into modules and types or through globals;
+    a gc.garbage object outside of any cycle is its own group,
+    a finalizer object outside of any cycle is not reported
+    '''
+    conn.execute("DROP TABLE IF EXISTS gc_cycle")
+    conn.execute(
+        """
+        CREATE TABLE gc_cycle (
+            cycle INTEGER NOT NULL,
+            object INTEGER NOT NULL
+        )
+        """
+    )
+    flagged = {
+        obj_id: bool(in_gc_garbage) for obj_id, in_gc_garbage in conn.execute(
+            "SELECT id, in_gc_garbage FROM object WHERE in_gc_garbage OR has_finalizer ORDER BY id")
+    }
+    conn.execute("CREATE TABLE temp.gc_skip (id INTEGER PRIMARY KEY)")
+    conn.execute("INSERT OR IGNORE INTO temp.gc_skip (id) SELECT object FROM module UNION SELECT object FROM pytype")
+    edge_filter = """
+        reference.ref NOT IN ({}) AND reference.ref NOT LIKE '~%'
+        AND reference.dst NOT IN (SELECT id FROM temp.gc_skip)
+    """.format(', '.join('?' * len(_GRAPH_SKIP_REFS)))
+    # only objects both reachable from a flagged object and reaching one can share a
+    # cycle with it; load the edges between those at once rather than node by node
+    conn.execute("CREATE TABLE temp.gc_candidate (id INTEGER PRIMARY KEY)")
+    conn.execute(
+        """
+        INSERT INTO temp.gc_candidate (id)
+        WITH RECURSIVE
+            forward (id) AS (
+                SELECT id FROM object WHERE in_gc_garbage OR has_finalizer
+                UNION
+                SELECT reference.dst FROM forward JOIN reference ON reference.src = forward.id
+                WHERE {0}
+            ),
+            backward (id) AS (
+                SELECT id FROM object WHERE in_gc_garbage OR has_finalizer
+                UNION
+                SELECT reference.src FROM backward JOIN reference ON reference.dst = backward.id
+                WHERE {0}
+            )
+        SELECT id FROM forward INTERSECT SELECT id FROM backward
+        """.format(edge_filter),
+        _GRAPH_SKIP_REFS * 2)
+    adjacency = {}
+    for src, dst in conn.execute(
+            """
+            SELECT reference.src, reference.dst FROM temp.gc_candidate AS candidate
+            JOIN reference ON reference.src = candidate.id
+            WHERE reference.dst IN (SELECT id FROM temp.gc_candidate) AND {}
+            """.format(edge_filter),
+            _GRAPH_SKIP_REFS):
+        adjacency.setdefault(src, []).append(dst)
+    conn.execute("DROP TABLE temp.gc_candidate")
+    conn.execute("DROP TABLE temp.gc_skip")
+
+    def neighbors(obj_id):
+        return adjacency.get(obj_id, [])
+
+    cycle = 0
+    for component in _strongly_connected_components(flagged, neighbors):
+        if not any(obj_id in flagged for obj_id in component):
+            continue
+        if len(component) == 1:
+            obj_id = component[0]
+            if not flagged[obj_id] and obj_id not in neighbors(obj_id):
+                continue  # a finalizer that is not part of a cycle
+        conn.executemany(
+            "INSERT INTO gc_cycle (cycle, object) VALUES (?, ?)",
+            [(cycle, obj_id) for obj_id in component])
+        cycle += 1
+    conn.execute("CREATE INDEX gc_cycle_cycle ON gc_cycle(cycle)")
+    conn.execute("CREATE INDEX gc_cycle_object ON gc_cycle(object)")
+
+
+def _reachable_object_ids(conn, obj_ids, skip_dsts, skip_refs, max_objects):
+    '''
+    breadth first walk of strong references (dict keys included) out of obj_ids;
+    stops expanding once max_objects have been found
+    '''
+    seen = set(obj_ids)
+    fringe = list(seen)
+    skip_clause = ', '.join('?' * len(skip_refs))
+    while fringe and len(seen) < max_objects:
+        next_fringe = []
+        for start in range(0, len(fringe), 800):
+            chunk = fringe[start:start + 800]
+            src_clause = ', '.join('?' * len(chunk))
+            rows = conn.execute(
+                """
+                SELECT dst FROM reference
+                WHERE src IN ({src}) AND ref NOT IN ({skip}) AND ref NOT LIKE '~%'
+                UNION ALL
+                SELECT CAST(substr(ref, 2) AS INTEGER) FROM reference
+                WHERE src IN ({src}) AND ref LIKE '@%'
+                """.format(src=src_clause, skip=skip_clause),
+                tuple(chunk) + tuple(skip_refs) + tuple(chunk),
+            ).fetchall()
+            for dst, in rows:
+                if dst not in seen and dst not in skip_dsts:
+                    seen.add(dst)
+                    next_fringe.append(dst)
+        fringe = next_fringe
+    return seen
+
+
+def _attributed_size_sum(conn, obj_ids):
+    obj_ids = tuple(obj_ids)
+    total = 0
+    for start in range(0, len(obj_ids), 800):
+        chunk = obj_ids[start:start + 800]
+        total += conn.execute(
+            "SELECT COALESCE(sum(attributed_size), 0) FROM object_attributed_size WHERE object IN ({})".format(
+                ', '.join('?' * len(chunk))),
+            chunk,
+        ).fetchone()[0]
+    return total
+
+
+def _object_display_name(conn, obj_id):
+    '''
+    module.global or Class.attribute naming obj_id, falling back to the
+    function a decorator wraps and then <typename#id>
+    '''
+    row = conn.execute(
+        """
+        SELECT COALESCE(module.name, pytype.name) || reference.ref FROM reference
+        LEFT JOIN module ON module.object = reference.src
+        LEFT JOIN pytype ON pytype.object = reference.src
+        WHERE reference.dst = ? AND reference.ref LIKE '.%'
+        AND (module.object IS NOT NULL OR pytype.object IS NOT NULL)
+        ORDER BY module.object IS NULL LIMIT 1
+        """,
+        (obj_id,),
+    ).fetchone()
+    if row:
+        return row[0]
+    row = conn.execute(
+        """
+        SELECT COALESCE(module.name || '.', '') || function.func_name FROM reference
+        JOIN function ON function.object = reference.dst
+        LEFT JOIN module ON module.object = function.module_obj_id
+        WHERE reference.src = ? AND reference.ref = '.__wrapped__'
+        """,
+        (obj_id,),
+    ).fetchone()
+    if row:
+        return row[0]
+    typename = conn.execute(
+        "SELECT name FROM pytype WHERE object = (SELECT pytype FROM object WHERE id = ?)", (obj_id,)
+    ).fetchone()
+    return '<{}#{}>'.format(typename[0] if typename else '?', obj_id)
+
+
+def _build_cache_table(conn, max_objects=100000):
+    '''
+    inventory cache-like containers: functools.lru_cache wrappers,
+    sized module globals named like a cache or memo table,
+    and instances of sized types named *Cache (e.g. cachetools) that a module
+    can reach, not the short-lived ones only held by a running frame
+
+    transitive size is the attributed size of everything reachable from the
+    container, not counting modules, types and globals (see _GRAPH_SKIP_REFS);
+    the walk stops after max_objects so the numbers are a lower bound for huge caches
+    '''
+    conn.execute("DROP TABLE IF EXISTS cache")
+    conn.execute(
+        """
+        CREATE TABLE cache (
+            object INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL, -- lru_cache, module global, cache type
+            name TEXT NOT NULL,
+            entry_count INTEGER,
+            transitive_count INTEGER NOT NULL,
+            transitive_size INTEGER NOT NULL
+        )
+        """
+    )
+    candidates = {}
+    for obj_id, kind, entry_count in conn.execute(
+        """
+        SELECT object, 'lru_cache', currsize FROM lru_cache
+        UNION ALL
+        SELECT reference.dst, 'module global', object.len FROM reference
+        JOIN module ON module.object = reference.src
+        JOIN object ON object.id = reference.dst
+        WHERE object.len IS NOT NULL AND reference.ref LIKE '.%'
+        AND (reference.ref LIKE '%cache%' OR reference.ref LIKE '%memo%')
+        """
+    ).fetchall():
+        candidates.setdefault(obj_id, (kind, entry_count))
+    conn.execute("CREATE TABLE temp.cache_type_instance (id INTEGER PRIMARY KEY, len INTEGER)")
+    conn.execute(
+        """
+        INSERT INTO temp.cache_type_instance (id, len)
+        SELECT object.id, object.len FROM object
+        JOIN pytype ON pytype.object = object.pytype
+        WHERE object.len IS NOT NULL AND pytype.name LIKE '%cache'
+        """
+    )
+    for obj_id, entry_count in _module_reachable_cache_type_instances(conn):
+        candidates.setdefault(obj_id, ('cache type', entry_count))
+    conn.execute("DROP TABLE temp.cache_type_instance")
+    skip_dsts = _module_and_type_ids(conn)
+    skip_refs = _GRAPH_SKIP_REFS + ('.__wrapped__',)
+    rows = []
+    for obj_id, (kind, entry_count) in candidates.items():
+        reachable = _reachable_object_ids(conn, (obj_id,), skip_dsts, skip_refs, max_objects)
+        rows.append((
+            obj_id, kind, _object_display_name(conn, obj_id), entry_count,
+            len(reachable), _attributed_size_sum(conn, reachable)))
+    conn.executemany(
+        """
+        INSERT INTO cache (object, kind, name, entry_count, transitive_count, transitive_size)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    conn.execute("CREATE INDEX cache_transitive_size ON cache(transitive_size)")
+
+
+def _module_reachable_cache_type_instances(conn):
+    '''
+    [(id, len)] of the rows of temp.cache_type_instance that a module reaches
+    through strong references (not counting globals, see _GRAPH_SKIP_REFS)
+    '''
+    edge_filter = "reference.ref NOT IN ({}) AND reference.ref NOT LIKE '~%'".format(
+        ', '.join('?' * len(_GRAPH_SKIP_REFS)))
+    # whatever lies on a path from a module to an instance also reaches the instance,
+    # so walk back from the instances (no further than a module) and only then forward
+    conn.execute("CREATE TABLE temp.cache_referrer (id INTEGER PRIMARY KEY)")
+    conn.execute(
+        """
+        INSERT INTO temp.cache_referrer (id)
+        WITH RECURSIVE backward (id) AS (
+            SELECT id FROM temp.cache_type_instance
+            UNION
+            SELECT reference.src FROM backward JOIN reference ON reference.dst = backward.id
+            WHERE backward.id NOT IN (SELECT object FROM module) AND {}
+        )
+        SELECT id FROM backward
+        """.format(edge_filter),
+        _GRAPH_SKIP_REFS)
+    rows = conn.execute(
+        """
+        WITH RECURSIVE forward (id) AS (
+            SELECT object FROM module WHERE object IN (SELECT id FROM temp.cache_referrer)
+            UNION
+            SELECT reference.dst FROM forward JOIN reference ON reference.src = forward.id
+            WHERE reference.dst IN (SELECT id FROM temp.cache_referrer) AND {}
+        )
+        SELECT instance.id, instance.len FROM temp.cache_type_instance AS instance
+        WHERE instance.id IN (SELECT id FROM forward)
+        ORDER BY instance.id
+        """.format(edge_filter),
+        _GRAPH_SKIP_REFS).fetchall()
+    conn.execute("DROP TABLE temp.cache_referrer")
+    return rows
+
+
+def _build_asyncio_task_group_table(conn, max_objects=100000):
+    '''
+    group asyncio Tasks by the __qualname__ of their coroutine; transitive size is
+    the attributed size of everything the group's pending tasks reach (their
+    suspended frames, awaited futures, callbacks), each object counted once per group
+
+    the event loop and globals are not walked (see _GRAPH_SKIP_REFS) or every
+    task would appear to retain every other task scheduled on the same loop
+    '''
+    conn.execute("DROP TABLE IF EXISTS asyncio_task_group")
+    conn.execute(
+        """
+        CREATE TABLE asyncio_task_group (
+            coro_name TEXT PRIMARY KEY,
+            task_count INTEGER NOT NULL,
+            pending_count INTEGER NOT NULL,
+            transitive_count INTEGER NOT NULL,
+            transitive_size INTEGER NOT NULL
+        )
+        """
+    )
+    groups = {}
+    for obj_id, coro_name, state in conn.execute("SELECT object, coro_name, state FROM asyncio_task"):
+        groups.setdefault(coro_name, []).append((obj_id, state))
+    skip_dsts = _module_and_type_ids(conn)
+    skip_refs = _GRAPH_SKIP_REFS + ('._loop',)
+    rows = []
+    for coro_name, tasks in groups.items():
+        pending = [obj_id for obj_id, state in tasks if state == 'PENDING']
+        reachable = _reachable_object_ids(conn, pending, skip_dsts, skip_refs, max_objects)
+        rows.append((
+            coro_name, len(tasks), len(pending), len(reachable), _attributed_size_sum(conn, reachable)))
+    conn.executemany(
+        """
+        INSERT INTO asyncio_task_group (coro_name, task_count, pending_count, transitive_count, transitive_size)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+
+
 def _detect_immortal_refcount(conn, min_refcount=1_000_000_000, min_count=5):
     row = conn.execute(
         """
@@ -145,153 +849,1343 @@ def _detect_immortal_refcount(conn, min_refcount=1_000_000_000, min_count=5):
     return refcount, object_count
 
 
-def make_analysis_db(collection_db_path, analysis_db_path):
+# tables merged from the dumps of further processes, with their object-id columns;
+# the first of those owns the row, which is skipped when that object was deduplicated
+_MERGE_OBJECT_TABLES = [
+    ('object', ('id', 'pytype')),
+    ('pytype', ('object', 'module')),
+    ('pytype_bases', ('obj_id', 'base_obj_id')),
+    ('module', ('object',)),
+    ('pyframe', ('object', 'f_back_obj_id', 'f_code_obj_id')),
+    ('pycode', ('object',)),
+    ('function', ('object', 'func_code_obj_id', 'module_obj_id')),
+    ('buffer', ('object', 'owner')),
+    ('lru_cache', ('object',)),
+    ('asyncio_task', ('object', 'coro_obj_id')),
+    ('gc_referrer', ('src', 'dst')),
+    ('gc_referent', ('src', 'dst')),
+]
+
+
+def _merge_rows(conn, table, object_columns, skip_shared=True, offsets=None):
+    '''copy table from the attached src db, mapping object ids through temp.merge_map'''
+    src_columns = {row[1] for row in conn.execute("PRAGMA src.table_info({})".format(table))}
+    if not src_columns:
+        return  # older dump without this table
+    offsets = offsets or {}
+    columns, selects, joins = [], [], []
+    for row in conn.execute("PRAGMA main.table_info({})".format(table)).fetchall():
+        column = row[1]
+        if column not in src_columns or (column == 'id' and column not in object_columns):
+            continue
+        columns.append(column)
+        if column in object_columns:
+            alias = 'map_{}'.format(column)
+            joins.append("LEFT JOIN temp.merge_map {0} ON {0}.old = src_row.{1}".format(alias, column))
+            selects.append('{}.new'.format(alias))
+        elif column in offsets:
+            selects.append('src_row.{} + {:d}'.format(column, offsets[column]))
+        else:
+            selects.append('src_row.{}'.format(column))
+    conn.execute(
+        "INSERT INTO main.{} ({}) SELECT {} FROM src.{} AS src_row {} {}".format(
+            table, ', '.join(columns), ', '.join(selects), table, ' '.join(joins),
+            "WHERE NOT map_{}.shared".format(object_columns[0]) if skip_shared else ''))
+
+
+def _merge_collection_db(conn, path, process_id):
     '''
-    make an analysis SQLite DB from a collection SQLite DB
-    by making a copy and adding indices to make analysis
-    queries faster
+    add the objects of another process's dump at path to conn;
+    an object at the same address with the same size and type (address) as one
+    already merged, and with the same references, is taken to be inherited from
+    before the fork and shared. Workers lay out their heaps alike, so the address
+    alone also matches objects allocated after the fork
+    '''
+    source_conn = sqlite3.connect(path)
+    try:
+        _reconcile_source_wal(source_conn)
+        _validate_objex_db(source_conn, path)
+    finally:
+        source_conn.close()
+    conn.execute("ATTACH DATABASE ? AS src", (path,))
+    try:
+        src_tables = {row[0] for row in conn.execute("SELECT name FROM src.sqlite_master WHERE type = 'table'")}
+        offset = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM main.object").fetchone()[0]
+        traceback_offset = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM main.alloc_traceback").fetchone()[0]
+        conn.execute("CREATE TABLE temp.merge_candidate (old INTEGER PRIMARY KEY, dup INTEGER NOT NULL)")
+        conn.execute(
+            '''
+            INSERT INTO temp.merge_candidate (old, dup)
+            SELECT old, dup FROM (
+                SELECT src_object.id AS old, (
+                    SELECT object.id FROM main.object
+                    JOIN main.object AS type_object ON type_object.id = object.pytype
+                    WHERE object.address = src_object.address AND object.size = src_object.size
+                    AND object.len IS src_object.len AND type_object.address = src_type.address
+                    LIMIT 1
+                ) AS dup
+                FROM src.object AS src_object
+                JOIN src.object AS src_type ON src_type.id = src_object.pytype
+            ) WHERE dup IS NOT NULL
+            '''
+        )
+        # attributes the dumper materializes in each worker (instance and function __dict__s,
+        # builtin __doc__s) land at different addresses, and one may reuse an address the
+        # other worker used for something else; pair them through their owner instead
+        conn.execute(
+            '''
+            INSERT OR REPLACE INTO temp.merge_candidate (old, dup)
+            SELECT src_reference.dst, MIN(reference.dst) FROM src.reference AS src_reference
+            JOIN temp.merge_candidate AS owner ON owner.old = src_reference.src
+            JOIN main.reference ON reference.src = owner.dup AND reference.ref = src_reference.ref
+            JOIN src.object AS src_target ON src_target.id = src_reference.dst
+            JOIN src.object AS src_type ON src_type.id = src_target.pytype
+            JOIN main.object AS target ON target.id = reference.dst
+            JOIN main.object AS type_object ON type_object.id = target.pytype
+            WHERE src_reference.ref LIKE '.%' AND target.size = src_target.size
+            AND target.len IS src_target.len AND type_object.address = src_type.address
+            GROUP BY src_reference.dst
+            '''
+        )
+        # a candidate is shared only if its references lead to the same objects, i.e. to those
+        # their targets were paired with; __class__ is left out (the type already matched), as
+        # is the mappingproxy the dumper makes for a type's __dict__.
+        # This is not repeated for the candidates' referrers, or a single changed module dict
+        # would unshare every function whose globals it is, every class holding those, etc.
+        conn.execute(
+            '''
+            CREATE TABLE temp.merge_src_ref AS
+            SELECT src_reference.src AS old, src_reference.dst, src_reference.ref,
+                CASE WHEN src_reference.ref >= '@' AND src_reference.ref < 'A'
+                    THEN CAST(substr(src_reference.ref, 2) AS INTEGER) END AS key_old
+            FROM src.reference AS src_reference
+            JOIN temp.merge_candidate AS candidate ON candidate.old = src_reference.src
+            WHERE src_reference.ref NOT IN ('__class__', '.__dict__<proxy>')
+            '''
+        )
+        conn.execute(
+            '''
+            CREATE TABLE temp.merge_main_ref AS
+            SELECT candidate.old, reference.dst, reference.ref FROM temp.merge_candidate AS candidate
+            JOIN main.reference ON reference.src = candidate.dup
+            WHERE reference.ref NOT IN ('__class__', '.__dict__<proxy>')
+            '''
+        )
+        src_refs = '''
+            SELECT src_ref.old, target.dup,
+                CASE WHEN src_ref.key_old IS NULL THEN src_ref.ref
+                    ELSE '@' || (SELECT dup FROM temp.merge_candidate WHERE old = src_ref.key_old) END
+            FROM temp.merge_src_ref AS src_ref
+            LEFT JOIN temp.merge_candidate AS target ON target.old = src_ref.dst
+        '''
+        main_refs = "SELECT old, dst, ref FROM temp.merge_main_ref"
+        conn.execute(
+            '''
+            DELETE FROM temp.merge_candidate WHERE old IN (
+                SELECT old FROM ({0} EXCEPT {1}) UNION SELECT old FROM ({1} EXCEPT {0})
+            )
+            '''.format(src_refs, main_refs)
+        )
+        conn.execute("DROP TABLE temp.merge_src_ref")
+        conn.execute("DROP TABLE temp.merge_main_ref")
+        conn.execute(
+            "CREATE TABLE temp.merge_map (old INTEGER PRIMARY KEY, new INTEGER NOT NULL, shared INTEGER NOT NULL)")
+        conn.execute(
+            '''
+            INSERT INTO temp.merge_map (old, new, shared)
+            SELECT src_object.id, COALESCE(candidate.dup, src_object.id + ?), candidate.dup IS NOT NULL
+            FROM src.object AS src_object
+            LEFT JOIN temp.merge_candidate AS candidate ON candidate.old = src_object.id
+            ''',
+            (offset,),
+        )
+        conn.execute("DROP TABLE temp.merge_candidate")
+        if 'alloc_traceback' in src_tables:
+            conn.execute(
+                "INSERT INTO main.alloc_traceback (id, filename, lineno, trace)"
+                " SELECT id + ?, filename, lineno, trace FROM src.alloc_traceback", (traceback_offset,))
+        for table, object_columns in _MERGE_OBJECT_TABLES:
+            _merge_rows(conn, table, object_columns, offsets={'alloc_traceback': traceback_offset})
+        _merge_rows(conn, 'thread', ('stack_obj_id',), skip_shared=False)
+        # a shared object has the same references in both dumps, so they are already there;
+        # dict-key refs ('@' followed by the key's object id) are mapped like the ids
+        conn.execute(
+            '''
+            INSERT INTO main.reference (src, dst, ref)
+            SELECT map_src.new, map_dst.new, COALESCE('@' || map_key.new, src_reference.ref)
+            FROM src.reference AS src_reference
+            JOIN temp.merge_map AS map_src ON map_src.old = src_reference.src
+            JOIN temp.merge_map AS map_dst ON map_dst.old = src_reference.dst
+            LEFT JOIN temp.merge_map AS map_key
+                ON src_reference.ref >= '@' AND src_reference.ref < 'A'
+                AND map_key.old = CAST(substr(src_reference.ref, 2) AS INTEGER)
+            WHERE NOT map_src.shared
+            '''
+        )
+        conn.execute("INSERT INTO process_object (process, object) SELECT ?, new FROM temp.merge_map", (process_id,))
+        _insert_process_row(conn, 'src', process_id, path)
+        conn.execute("DROP TABLE temp.merge_map")
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE src")
+
+
+def _insert_process_row(conn, schema, process_id, path):
+    conn.execute(
+        '''
+        INSERT INTO process (id, pid, hostname, ts, memory_mb, path, object_count)
+        SELECT ?, pid, hostname, ts, memory_mb, ?, (SELECT COUNT(*) FROM {0}.object) FROM {0}.meta LIMIT 1
+        '''.format(schema),
+        (process_id, os.path.abspath(path)),
+    )
+
+
+def _merge_processes(conn, paths):
     '''
+    merge the dumps at paths[1:] into conn, which holds the dump of paths[0],
+    recording which processes each object was found in
+    '''
+    conn.execute(
+        """
+        CREATE TABLE process (
+            id INTEGER PRIMARY KEY, -- 1 for the first dump given to make_analysis_db, and so on
+            pid INTEGER NOT NULL,
+            hostname TEXT NOT NULL,
+            ts TIMESTAMP,
+            memory_mb INTEGER,
+            path TEXT NOT NULL, -- collection db the process was merged from
+            object_count INTEGER NOT NULL -- objects in that dump, shared ones included
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE process_object (  -- an object shared by several processes has a row for each
+            process INTEGER NOT NULL,
+            object INTEGER NOT NULL
+        )
+        """
+    )
+    _insert_process_row(conn, 'main', 1, paths[0])
+    conn.execute("INSERT INTO process_object (process, object) SELECT 1, id FROM object")
+    conn.execute("CREATE INDEX merge_object_address ON object(address)")
+    conn.commit()
+    for process_id, path in enumerate(paths[1:], 2):
+        _merge_collection_db(conn, path, process_id)
+    conn.execute("DROP INDEX merge_object_address")
+    conn.execute("CREATE INDEX process_object_object ON process_object(object, process)")
+    conn.execute("CREATE INDEX process_object_process ON process_object(process, object)")
+    conn.commit()
+
+
+# relative cost of each make_analysis_db() stage, as measured on fast builds
+# of a dump of a typical process; only used to extrapolate the ETA
+_ANALYSIS_STAGE_WEIGHTS = [
+    ('copy', 3),
+    ('schema', 0),
+    ('class references', 1),
+    ('indices', 20),
+    ('merge', 10),
+    ('attributed sizes', 8),
+    ('degrees', 4),
+    ('root distances', 8),
+    ('pymalloc', 5),
+    ('arenas', 1),
+    ('gc cycles', 1),
+    ('caches', 1),
+    ('asyncio tasks', 0),
+    ('immortals', 0),
+]
+
+_FAST_BUILD_PAGE_SIZE = 65536
+
+
+class _BuildProgress:
+    '''
+    times the stages of an analysis build; with print_info each stage is
+    announced with the elapsed time and an ETA extrapolated from the weights
+    (see _ANALYSIS_STAGE_WEIGHTS) of the stages finished so far
+    '''
+    def __init__(self, stage_names, print_info=False):
+        weights = dict(_ANALYSIS_STAGE_WEIGHTS)
+        self.stages = [(name, weights.get(name, 1)) for name in stage_names]
+        self.total_weight = sum(weight for _, weight in self.stages)
+        self.done_weight = 0
+        self.print_info = print_info
+        self.timings = {}
+        self.started = time.time()
+
+    def _eta(self):
+        if not self.done_weight:
+            return ''
+        elapsed = time.time() - self.started
+        remaining = elapsed / self.done_weight * (self.total_weight - self.done_weight)
+        return ', ETA {:0.1f}s'.format(remaining)
+
+    @contextmanager
+    def stage(self, name):
+        number = [stage for stage, _ in self.stages].index(name) + 1
+        if self.print_info:
+            print('[{}/{}] {} (elapsed {:0.1f}s{})'.format(
+                number, len(self.stages), name, time.time() - self.started, self._eta()))
+        self.stage_started = time.time()
+        yield self
+        self.timings[name] = self.stage_elapsed()
+        self.done_weight += dict(self.stages)[name]
+
+    def stage_elapsed(self):
+        return round(time.time() - self.stage_started, 3)
+
+    def step(self, label, done, total):
+        '''progress within the current stage'''
+        if self.print_info:
+            print('    {} ({}/{})'.format(label, done, total))
+
+
+def _tune_for_build(conn, cache_mb, durable=False):
+    '''
+    pragmas for bulk index builds; unless durable, synchronous = OFF risks
+    the output (never the input) on power loss, a rebuild fixes that
+    '''
+    if not durable:
+        conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -{:d}".format(int(cache_mb * 1024)))
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA threads = {:d}".format(min(os.cpu_count() or 1, 8)))  # sorter helper threads
+
+
+def _copy_collection_db(source_conn, analysis_db_path, fast):
+    '''copy the collection db; the fast build rewrites it with larger pages on the way'''
+    if fast and sqlite3.sqlite_version_info >= (3, 27):
+        source_conn.execute("PRAGMA page_size = {:d}".format(_FAST_BUILD_PAGE_SIZE))  # only applies to the copy
+        source_conn.execute("VACUUM INTO ?", (analysis_db_path,))
+        return
+    conn = sqlite3.connect(analysis_db_path)
+    try:
+        source_conn.backup(conn)
+    finally:
+        conn.close()
+
+
+def _run_indices(conn, progress):
+    statements = [stmt.strip() for stmt in _INDICES.split(';') if stmt.strip()]
+    for i, stmt in enumerate(statements):
+        progress.step(stmt.split()[2], i + 1, len(statements))
+        conn.execute(stmt)
+
+
+_ANALYSIS_BUILD_DONE = 'done'
+
+
+def _analysis_stage(conn):
+    '''last stage make_analysis_db() committed, None for a collection db'''
+    if 'analysis_stage' not in {row[1] for row in conn.execute("PRAGMA table_info(meta)")}:
+        return None
+    return conn.execute("SELECT analysis_stage FROM meta").fetchone()[0]
+
+
+def _prepare_in_place(collection_db_path, analysis_db_path):
+    '''
+    move the collection db to analysis_db_path for an in-place build;
+    returns the stage an interrupted build got to (None to start over)
+    '''
+    same_file = os.path.abspath(collection_db_path) == os.path.abspath(analysis_db_path)
+    if os.path.exists(analysis_db_path):
+        conn = sqlite3.connect(analysis_db_path)
+        try:
+            _validate_objex_db(conn, analysis_db_path)
+            stage = _analysis_stage(conn)
+        finally:
+            conn.close()
+        if stage == _ANALYSIS_BUILD_DONE:
+            raise EnvironmentError(
+                "analysis DB already exists at {}".format(analysis_db_path))
+        if stage:
+            return stage
+        if not same_file:
+            if os.path.exists(collection_db_path):
+                raise EnvironmentError(
+                    "analysis DB already exists at {}".format(analysis_db_path))
+            # the dump was moved here by a build that stopped before its first
+            # stage finished: start that build over on the moved dump
+            collection_db_path, same_file = analysis_db_path, True
     if not os.path.exists(collection_db_path):
         raise EnvironmentError(
             "collection DB doesn't exist at {}".format(collection_db_path))
-    if os.path.exists(analysis_db_path):
-        raise EnvironmentError(
-            "analysis DB already exists at {}".format(analysis_db_path))
-    source_conn = sqlite3.connect(collection_db_path)
-    source_conn.text_factory = str
-    conn = sqlite3.connect(analysis_db_path)
-    conn.text_factory = str
+    if is_compressed_dump(collection_db_path):
+        raise InvalidDatabaseError(
+            '{} is compressed; in-place builds need an uncompressed dump'.format(collection_db_path))
+    conn = sqlite3.connect(collection_db_path)
     try:
-        _reconcile_source_wal(source_conn)
-        _validate_objex_db(source_conn, collection_db_path)
-        source_conn.backup(conn)
-        _ensure_analysis_meta_columns(conn)
-        _run_ddl(conn, _INDICES)
-        _add_class_references(conn)
-        _build_attributed_size_table(conn)
+        _validate_objex_db(conn, collection_db_path)
+        # a single file to move, and a rollback journal rather than a WAL
+        # so index pages are only written once
+        _reconcile_source_wal(conn)
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+    if not same_file:
+        os.rename(collection_db_path, analysis_db_path)  # same filesystem only, that is the point
+    return None
+
+
+def make_analysis_db(collection_db_path, analysis_db_path, print_info=False, fast=True, cache_mb=1024,
+                     in_place=False):
+    '''
+    make an analysis SQLite DB from a collection SQLite DB
+    by making a copy and adding indices to make analysis
+    queries faster
+
+    collection_db_path may also be a list of dumps from several processes,
+    e.g. the workers of a prefork server; they are merged into one graph with
+    a process dimension (see Reader.fleet_data()), objects inherited from
+    the master before the fork being deduplicated
+
+    fast builds with bulk-load pragmas (see _tune_for_build) and 64KiB pages;
+    the tables and rows come out the same either way. print_info prints each stage
+    with an ETA; per-stage timings are stored as JSON in meta.analysis_timings
+
+    in_place skips the copy: the collection db is moved to analysis_db_path (or
+    converted where it is if the paths are the same) and the analysis tables are
+    added to it. Each stage commits together with meta.analysis_stage, so calling
+    make_analysis_db again after a crash carries on from the last finished stage.
+    In-place builds keep sqlite's journaling (the dump itself is at stake) and the
+    collection db's page size
+    '''
+    if isinstance(collection_db_path, (list, tuple)):
+        collection_db_paths = list(collection_db_path)
+        collection_db_path = collection_db_paths[0]
+    else:
+        collection_db_paths = [collection_db_path]
+    if in_place:
+        if len(collection_db_paths) > 1:
+            raise ValueError('in-place builds take a single collection db')
+        resume_stage = _prepare_in_place(collection_db_path, analysis_db_path)
+    else:
+        resume_stage = None
+        for path in collection_db_paths:
+            if not os.path.exists(path):
+                raise EnvironmentError(
+                    "collection DB doesn't exist at {}".format(path))
+        for path in collection_db_paths[1:]:
+            if is_compressed_dump(path):
+                raise InvalidDatabaseError(
+                    '{} is compressed; only the first of several merged dumps may be'.format(path))
+        if os.path.exists(analysis_db_path):
+            raise EnvironmentError(
+                "analysis DB already exists at {}".format(analysis_db_path))
+    stage_names = [
+        name for name, _ in _ANALYSIS_STAGE_WEIGHTS
+        if (name != 'merge' or len(collection_db_paths) > 1) and (name != 'copy' or not in_place)]
+    done_stages = stage_names[:stage_names.index(resume_stage) + 1] if resume_stage else []
+    progress = _BuildProgress([name for name in stage_names if name not in done_stages], print_info=print_info)
+    if not in_place:
+        with progress.stage('copy'):
+            if is_compressed_dump(collection_db_path):
+                # the analysis DB starts out as a copy of the collection DB, so
+                # decompress frame by frame straight into it rather than to a temp file
+                with ArchiveReader(collection_db_path) as archive:
+                    if archive.read(0, len(_SQLITE_MAGIC)) != _SQLITE_MAGIC:
+                        raise InvalidDatabaseError(
+                            '{} is not a compressed objex database'.format(collection_db_path))
+                    with open(analysis_db_path, 'wb') as f:
+                        archive.extract_to(f)
+                conn = sqlite3.connect(analysis_db_path)
+                try:
+                    _validate_objex_db(conn, collection_db_path)
+                finally:
+                    conn.close()
+            else:
+                source_conn = sqlite3.connect(collection_db_path)
+                source_conn.text_factory = str
+                try:
+                    _reconcile_source_wal(source_conn)
+                    _validate_objex_db(source_conn, collection_db_path)
+                    _copy_collection_db(source_conn, analysis_db_path, fast)
+                finally:
+                    source_conn.close()
+    elif resume_stage and print_info:
+        print('resuming interrupted build after {}'.format(resume_stage))
+
+    def pymalloc():
+        if _table_exists(conn, 'pymalloc_size_class'):
+            _fill_pymalloc_object_counts(conn)
+
+    def immortals():
         immortal_refcount, immortal_object_count = _detect_immortal_refcount(conn)
         conn.execute(
             "UPDATE meta SET immortal_refcount = ?, immortal_object_count = ?",
             (immortal_refcount, immortal_object_count),
         )
+
+    def merge():
+        _merge_processes(conn, collection_db_paths)
+        _add_class_references(conn)  # for the objects merged in
+
+    stages = [
+        ('schema', lambda: _ensure_analysis_schema(conn)),
+        ('class references', lambda: _add_class_references(conn)),  # before indices, see there
+        ('indices', lambda: _run_indices(conn, progress)),
+        ('merge', merge),
+        ('attributed sizes', lambda: _build_attributed_size_table(conn)),
+        ('degrees', lambda: _build_object_degree_table(conn)),
+        ('root distances', lambda: _build_root_distance_table(conn)),
+        ('pymalloc', pymalloc),
+        ('arenas', lambda: _build_arena_table(conn)),
+        ('gc cycles', lambda: _build_gc_cycle_table(conn)),
+        ('caches', lambda: _build_cache_table(conn)),
+        ('asyncio tasks', lambda: _build_asyncio_task_group_table(conn)),
+        ('immortals', immortals),
+    ]
+    conn = sqlite3.connect(analysis_db_path)
+    conn.text_factory = str
+    try:
+        if fast:
+            _tune_for_build(conn, cache_mb, durable=in_place)
+        conn.execute("BEGIN")
+        _ensure_analysis_meta_columns(conn)
+        conn.commit()
+        if resume_stage:
+            progress.timings.update(json.loads(
+                conn.execute("SELECT analysis_timings FROM meta").fetchone()[0] or '{}'))
+        for name, build in stages:
+            if name not in stage_names or name in done_stages:
+                continue
+            with progress.stage(name):
+                # the stage and its marker commit together, an interrupted stage leaves no trace
+                conn.execute("BEGIN")
+                build()
+                progress.timings[name] = progress.stage_elapsed()
+                conn.execute(
+                    "UPDATE meta SET analysis_stage = ?, analysis_timings = ?", (name, json.dumps(progress.timings)))
+                conn.commit()
+        conn.execute(
+            "UPDATE meta SET analysis_stage = ?, analysis_timings = ?",
+            (_ANALYSIS_BUILD_DONE, json.dumps(progress.timings)))
         conn.commit()
     finally:
         conn.close()
-        source_conn.close()
+    if print_info:
+        print('analysis db built in {:0.1f}s'.format(time.time() - progress.started))
+
+
+def is_type_histogram_db(path):
+    '''whether path is a type_histogram() time series file (as opposed to a dump)'''
+    if not os.path.isfile(path) or is_compressed_dump(path):
+        return False
+    conn = sqlite3.connect(path)
+    try:
+        return _table_exists(conn, 'histogram_snapshot')
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def type_growth_data(path, limit=10, last=None):
+    '''
+    the types whose total size grew most between the first and the last
+    snapshot of a type_histogram() time series (only the last `last` snapshots
+    when given), with their count and size at every snapshot for charting
+    '''
+    if not is_type_histogram_db(path):
+        raise InvalidDatabaseError('{} is not an objex type histogram file'.format(path))
+    conn = sqlite3.connect(path)
+    conn.text_factory = str
+    try:
+        snapshots = conn.execute(
+            "SELECT id, ts, pid, rss_mb, object_count, total_size FROM histogram_snapshot ORDER BY id"
+        ).fetchall()
+        if last:
+            snapshots = snapshots[-last:]
+        snapshot_items = [
+            {'id': row[0], 'ts': row[1], 'pid': row[2], 'rss_mb': row[3], 'object_count': row[4], 'total_size': row[5]}
+            for row in snapshots]
+        if not snapshots:
+            return {'snapshots': [], 'types': []}
+        first, final = snapshots[0][0], snapshots[-1][0]
+        growth = conn.execute(
+            '''
+            SELECT
+                type_name,
+                SUM(CASE WHEN snapshot = :final THEN count ELSE 0 END)
+                    - SUM(CASE WHEN snapshot = :first THEN count ELSE 0 END) AS count_delta,
+                SUM(CASE WHEN snapshot = :final THEN size ELSE 0 END)
+                    - SUM(CASE WHEN snapshot = :first THEN size ELSE 0 END) AS size_delta,
+                SUM(CASE WHEN snapshot = :final THEN size ELSE 0 END) AS final_size
+            FROM type_histogram
+            WHERE snapshot IN (:first, :final)
+            GROUP BY type_name
+            ORDER BY size_delta DESC, final_size DESC, type_name
+            LIMIT :limit
+            ''',
+            {'first': first, 'final': final, 'limit': limit},
+        ).fetchall()
+        positions = {row[0]: i for i, row in enumerate(snapshots)}
+        types = []
+        for type_name, count_delta, size_delta, _ in growth:
+            counts = [0] * len(snapshots)
+            sizes = [0] * len(snapshots)
+            for snapshot, count, size in conn.execute(
+                    "SELECT snapshot, count, size FROM type_histogram"
+                    " WHERE type_name = ? AND snapshot BETWEEN ? AND ?", (type_name, first, final)):
+                if snapshot in positions:
+                    counts[positions[snapshot]] = count
+                    sizes[positions[snapshot]] = size
+            types.append({
+                'type_name': type_name, 'count_delta': count_delta, 'size_delta': size_delta,
+                'counts': counts, 'sizes': sizes})
+        return {'snapshots': snapshot_items, 'types': types}
+    finally:
+        conn.close()
+
+
+_MISSING = object()
+
+_GC_GENERATION_LABELS = {0: 'gen0', 1: 'gen1', 2: 'gen2', 3: 'permanent', None: 'untracked'}
+
+
+class Reader:
+    '''
+    read a graph dumped previously
+
+    include_weak -- whether weak reference edges ('~()' refs, from a weakref.ref
+    to its referent) count when looking for paths to roots and orphans;
+    they don't keep anything alive, so by default they are skipped
+    '''
+    def __init__(self, path, include_weak=False):
+        self.path = path
+        self.include_weak = include_weak
+        if is_compressed_dump(path):
+            raise InvalidDatabaseError(
+                '{} is a compressed objex dump and cannot be opened directly. '
+                'Run `python -m objex make-analysis-db {} <analysis.db>` first; '
+                'it decompresses as it goes.'.format(path, path))
+        conn = sqlite3.connect(path)
+        conn.text_factory = str
+        try:
+            _validate_objex_db(conn, path)
+            stage = _analysis_stage(conn)
+            if stage not in (None, _ANALYSIS_BUILD_DONE):
+                raise InvalidDatabaseError(
+                    '{} is an interrupted analysis build (last finished stage: {}). '
+                    'Run `python -m objex make-analysis-db --in-place {} {}` to finish it where it stopped '
+                    '(whether or not it was started with --in-place), or delete it and build it again.'.format(
+                        path, stage, path, path))
+        except Exception:
+            conn.close()
+            raise
+        self.conn = conn
+        self._meta_columns = {
+            row[1] for row in self.conn.execute("PRAGMA table_info(meta)")
+        }
+        self._object_columns = {
+            row[1] for row in self.conn.execute("PRAGMA table_info(object)")
+        }
+        self._table_names = {
+            row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+        if 'object_attributed_size' not in self._table_names:
+            _build_attributed_size_table(self.conn)
+            self.conn.commit()
+            self._table_names.add('object_attributed_size')
+        self._root_object_path_cache = {'module': {}, 'frame': {}, 'thread': {}}
+        self._root_cache_hits = {'module': 0, 'frame': 0, 'thread': 0}
+        self._immortal_refcount = _MISSING
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def sql(self, sql, args=None):
+        '''run SELECT sql against underling DB'''
+        if args is None:
+            return self.conn.execute(sql).fetchall()
+        return self.conn.execute(sql, args).fetchall()
+
+    def sql_val(self, sql, args=None, default=_MISSING):
+        '''run SELECT sql that returns single value'''
+        result = self.sql(sql, args)
+        if not result:
+            if default is not _MISSING:
+                return default
+            # TODO: better exception type
+            raise ValueError("sql returned no rows", sql)
+        return result[0][0]
+
+    def sql_list(self, sql, args=None):
+        '''run SELECT and return [a, b, c] instead of [(a,), (b,), (c,)]'''
+        return list(sum(self.sql(sql, args), ()))
+
+    def summary_stats(self):
+        summary = {
+            'path': self.path,
+            'hostname': self.sql_val('SELECT hostname FROM meta'),
+            'timestamp': self.sql_val('SELECT ts FROM meta'),
+            'memory_mb': self.sql_val('SELECT memory_mb FROM meta'),
+            'visible_memory_fraction': self.visible_memory_fraction(),
+            'object_count': self.object_count(),
+            'reference_count': self.reference_count(),
+        }
+        if 'tracemalloc_frames' in self._meta_columns:
+            summary['tracemalloc_frames'] = self.sql_val('SELECT tracemalloc_frames FROM meta')
+        if 'thread_count' in self._meta_columns:
+            summary['thread_count'] = self.sql_val('SELECT thread_count FROM meta')
+        summary['trigger'] = self.dump_trigger()
+        rss_breakdown = self.rss_breakdown()
+        if rss_breakdown:
+            rss_mb = sum(mb for _, mb in rss_breakdown)
+            summary['rss_breakdown'] = [
+                {'label': label, 'mb': mb, 'percent': 100.0 * mb / rss_mb if rss_mb else 0.0}
+                for label, mb in rss_breakdown
+            ]
+        pymalloc_overhead = self.pymalloc_overhead()
+        if pymalloc_overhead is not None:
+            summary['pymalloc_arena_mb'] = pymalloc_overhead['arena_mb']
+            summary['pymalloc_overhead_mb'] = pymalloc_overhead['overhead_mb']
+            summary['pymalloc_overhead_fraction'] = pymalloc_overhead['overhead_fraction']
+        if 'gc_cycle' in self._table_names:
+            uncollectable = self.uncollectable_summary()
+            summary['gc_garbage_count'] = uncollectable['garbage_count']
+            summary['gc_garbage_mb'] = uncollectable['garbage_size'] / 1024.0 / 1024
+        immortal_refcount = self.immortal_refcount()
+        if immortal_refcount is not None:
+            summary['immortal_refcount'] = immortal_refcount
+            summary['immortal_object_count'] = self.sql_val(
+                'SELECT immortal_object_count FROM meta',
+                default=0,
+            )
+        return summary
+
+    def dump_trigger(self):
+        '''why the dump was taken (e.g. an autodump RSS threshold), or None'''
+        if 'trigger' not in self._meta_columns:
+            return None
+        return self.sql_val('SELECT trigger FROM meta')
+
+    def object_count(self):
+        return self.sql_val('SELECT count(*) FROM object')
+
+    def reference_count(self):
+        return self.sql_val('SELECT count(*) FROM reference')
+
+    def visible_memory_fraction(self):
+        '''get the fraction of peak RSS that is accounted for'''
+        return self.sql_val(
+            'SELECT 1.0 * sum({size}) / 1024 / 1024 / (SELECT memory_mb from meta) FROM object {join}'.format(
+                size=self._size_expr(), join=self._size_join()))
+
+    def _size_expr(self):
+        if 'object_attributed_size' in self._table_names:
+            return 'object_attributed_size.attributed_size'
+        return 'object.size'
+
+    def _size_join(self):
+        if 'object_attributed_size' in self._table_names:
+            return 'JOIN object_attributed_size ON object.id = object_attributed_size.object'
+        return ''
+
+    def pymalloc_stats(self):
+        '''return {name: value} parsed from sys._debugmallocstats() at dump time'''
+        if 'pymalloc_stat' not in self._table_names:
+            return {}
+        stats = {}
+        for name, value in self.sql('SELECT name, value FROM pymalloc_stat ORDER BY id'):
+            stats.setdefault(name, value)  # "Total" repeats per section; keep the arena one
+        return stats
+
+    def pymalloc_size_classes(self):
+        '''
+        return [(size_class, block_size, num_pools, blocks_in_use, avail_blocks, object_count), ...]
+        '''
+        if 'pymalloc_size_class' not in self._table_names:
+            return []
+        return self.sql(
+            """
+            SELECT size_class, block_size, num_pools, blocks_in_use, avail_blocks, object_count
+            FROM pymalloc_size_class ORDER BY size_class
+            """)
+
+    def pymalloc_overhead(self):
+        '''
+        memory pymalloc holds in arenas beyond the blocks actually in use
+        (free blocks, empty pools, pool headers, quantization, alignment);
+        returns None if the dump has no pymalloc stats
+        '''
+        stats = self.pymalloc_stats()
+        if 'bytes in arenas' not in stats or 'bytes in allocated blocks' not in stats:
+            return None
+        arena_mb = stats['bytes in arenas'] / 1024.0 / 1024
+        overhead_mb = (stats['bytes in arenas'] - stats['bytes in allocated blocks']) / 1024.0 / 1024
+        return {
+            'arena_mb': arena_mb,
+            'overhead_mb': overhead_mb,
+            'overhead_fraction': overhead_mb / self.sql_val('SELECT memory_mb FROM meta'),
+        }
+
+    def cost_by_alloc_site(self, limit=20):
+        '''
+        get (filename, lineno, number of objects, total size) for the tracemalloc
+        allocation sites of exported objects, ordered by total size;
+        empty unless the dumped process was running tracemalloc
+        '''
+        if 'alloc_traceback' not in self._object_columns:
+            return []
+        return self.sql(
+            """
+            SELECT filename, lineno, count(*), sum(object.size)
+            FROM object JOIN alloc_traceback ON object.alloc_traceback = alloc_traceback.id
+            GROUP BY filename, lineno ORDER BY sum(object.size) DESC LIMIT ?
+            """,
+            (limit,))
+
+    def cost_by_alloc_site_and_type(self, limit=20):
+        '''get (filename, lineno, typename, number of objects, total size) ordered by total size'''
+        if 'alloc_traceback' not in self._object_columns:
+            return []
+        return self.sql(
+            """
+            SELECT filename, lineno, pytype.name, count(*), sum(object.size)
+            FROM object
+            JOIN alloc_traceback ON object.alloc_traceback = alloc_traceback.id
+            JOIN pytype ON object.pytype = pytype.object
+            GROUP BY filename, lineno, pytype.name ORDER BY sum(object.size) DESC LIMIT ?
+            """,
+            (limit,))
+
+    def obj_alloc_traceback(self, obj_id):
+        '''formatted tracemalloc traceback where obj_id was allocated, or None'''
+        if 'alloc_traceback' not in self._object_columns:
+            return None
+        return self.sql_val(
+            """
+            SELECT trace FROM alloc_traceback
+            WHERE id = (SELECT alloc_traceback FROM object WHERE id = ?)
+            """,
+            (obj_id,), default=None)
+
+    def obj_buffer(self, obj_id):
+        '''
+        {owner, nbytes, owns_buffer} for the data buffer obj_id exposes,
+        or None if it was not recorded as a buffer
+        '''
+        if 'buffer' not in self._table_names:
+            return None
+        row = self.sql(
+            'SELECT owner, nbytes, owns_buffer FROM buffer WHERE object = ?', (obj_id,))
+        if not row:
+            return None
+        owner, nbytes, owns_buffer = row[0]
+        return {'owner': owner, 'nbytes': nbytes, 'owns_buffer': bool(owns_buffer)}
+
+    def shared_buffers(self, limit=20):
+        '''
+        return [(owner_id, nbytes, view_count)] for the largest data buffers;
+        view_count is the number of other objects exposing the same buffer
+        '''
+        if 'buffer' not in self._table_names:
+            return []
+        return self.sql(
+            """
+            SELECT owner, max(nbytes), sum(object != owner)
+            FROM buffer GROUP BY owner ORDER BY max(nbytes) DESC LIMIT ?
+            """,
+            (limit,))
+
+    def alloc_sites_data(self, limit=20):
+        return {
+            'items': [
+                {
+                    'site': '{}:{}'.format(filename, lineno),
+                    'object_count': object_count,
+                    'size': size,
+                }
+                for filename, lineno, object_count, size in self.cost_by_alloc_site(limit=limit)
+            ],
+            'by_type': [
+                {
+                    'site': '{}:{}'.format(filename, lineno),
+                    'name': name,
+                    'object_count': object_count,
+                    'size': size,
+                }
+                for filename, lineno, name, object_count, size in self.cost_by_alloc_site_and_type(limit=limit)
+            ],
+        }
+
+    def arena_size(self):
+        if 'pymalloc_arena_size' not in self._meta_columns:
+            return None
+        return self.sql_val('SELECT pymalloc_arena_size FROM meta', default=None)
+
+    def arena_occupancy_summary(self, max_occupancy=0.25):
+        '''
+        summarize how full the pymalloc arenas holding exported objects are;
+        arenas at or under max_occupancy count as pinned, and pinned_mb
+        is the free space in them that cannot be returned to the OS
+        '''
+        arena_size = self.arena_size()
+        if 'pymalloc_arena' not in self._table_names or not arena_size:
+            return None
+        max_used = arena_size * max_occupancy
+        arena_count, pinned_count, pinned_used = self.sql(
+            """
+            SELECT
+                count(*),
+                COALESCE(sum(used_bytes <= ?), 0),
+                COALESCE(sum(CASE WHEN used_bytes <= ? THEN used_bytes ELSE 0 END), 0)
+            FROM pymalloc_arena
+            """,
+            (max_used, max_used),
+        )[0]
+        return {
+            'arena_size': arena_size,
+            'arena_count': arena_count,
+            'pinned_arena_count': pinned_count,
+            'pinned_mb': (pinned_count * arena_size - pinned_used) / 1024.0 / 1024,
+        }
 
+    def pinned_arena_types(self, max_occupancy=0.25, limit=20):
+        '''
+        which types keep nearly empty arenas alive; returns
+        [(type-obj-id, objects in pinned arenas, pinned arenas touched), ...]
+        ordered by the number of pinned arenas the type appears in
+        '''
+        arena_size = self.arena_size()
+        if 'pymalloc_arena' not in self._table_names or not arena_size:
+            return []
+        return self.sql(
+            """
+            SELECT object.pytype, count(*), count(DISTINCT pymalloc_arena.arena)
+            FROM pymalloc_arena
+            JOIN object ON object.address / ? = pymalloc_arena.arena
+            WHERE pymalloc_arena.used_bytes <= ? AND object.size <= ?
+            GROUP BY object.pytype
+            ORDER BY count(DISTINCT pymalloc_arena.arena) DESC, count(*) DESC
+            LIMIT ?
+            """,
+            (arena_size, arena_size * max_occupancy, _SMALL_REQUEST_THRESHOLD, limit))
 
-_MISSING = object()
+    def pinned_arenas_data(self, max_occupancy=0.25, limit=20):
+        return {
+            'summary': self.arena_occupancy_summary(max_occupancy=max_occupancy),
+            'items': [
+                {
+                    'type_id': type_id,
+                    'name': self.typename(type_id),
+                    'object_count': object_count,
+                    'arena_count': arena_count,
+                }
+                for type_id, object_count, arena_count in self.pinned_arena_types(
+                    max_occupancy=max_occupancy, limit=limit)
+            ],
+        }
 
+    def uncollectable_cycles(self, limit=20, garbage=None):
+        '''
+        return [(cycle, object_count, size, garbage_count, finalizer_count)] for
+        groups of objects in gc.garbage and finalizer reference cycles, largest first
 
-class Reader:
-    '''read a graph dumped previously'''
-    def __init__(self, path):
-        self.path = path
-        conn = sqlite3.connect(path)
-        conn.text_factory = str
-        try:
-            _validate_objex_db(conn, path)
-        except Exception:
-            conn.close()
-            raise
-        self.conn = conn
-        self._meta_columns = {
-            row[1] for row in self.conn.execute("PRAGMA table_info(meta)")
-        }
-        self._table_names = {
-            row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        garbage=True keeps the groups holding something from gc.garbage, i.e. what the
+        collector could not free; garbage=False keeps the other cycles with finalizers,
+        which are as a rule still reachable (generators, coroutines, Futures and io
+        objects all have finalizers) and only need the finalizer to run once they are not
+        '''
+        if 'gc_cycle' not in self._table_names:
+            return []
+        having = {
+            None: '',
+            True: 'HAVING sum(COALESCE(object.in_gc_garbage, 0)) > 0',
+            False: 'HAVING sum(COALESCE(object.in_gc_garbage, 0)) = 0',
+        }[garbage]
+        return self.sql(
+            """
+            SELECT
+                gc_cycle.cycle, count(*), sum({size}),
+                sum(COALESCE(object.in_gc_garbage, 0)), sum(COALESCE(object.has_finalizer, 0))
+            FROM gc_cycle JOIN object ON gc_cycle.object = object.id
+            {join}
+            GROUP BY gc_cycle.cycle {having} ORDER BY sum({size}) DESC LIMIT ?
+            """.format(size=self._size_expr(), join=self._size_join(), having=having),
+            (limit,))
+
+    def uncollectable_summary(self):
+        '''
+        totals for garbage the collector could not free (groups holding something
+        from gc.garbage), and for the other reference cycles with finalizers
+        '''
+        summary = {
+            'garbage_count': 0, 'garbage_size': 0,
+            'finalizer_cycle_count': 0, 'finalizer_cycle_size': 0,
         }
-        if 'object_attributed_size' not in self._table_names:
-            _build_attributed_size_table(self.conn)
-            self.conn.commit()
-            self._table_names.add('object_attributed_size')
-        self._root_object_path_cache = {'module': {}, 'frame': {}}
-        self._root_cache_hits = {'module': 0, 'frame': 0}
-        self._immortal_refcount = _MISSING
+        if 'gc_cycle' not in self._table_names:
+            return summary
+        for _, object_count, size, garbage_count, _ in self.uncollectable_cycles(limit=-1):
+            if garbage_count:
+                summary['garbage_count'] += object_count
+                summary['garbage_size'] += size
+            else:
+                summary['finalizer_cycle_count'] += 1
+                summary['finalizer_cycle_size'] += size
+        return summary
 
-    def close(self):
-        self.conn.close()
+    def cycle_members(self, cycle, limit=20):
+        if 'gc_cycle' not in self._table_names:
+            return []
+        return self.sql_list(
+            'SELECT object FROM gc_cycle WHERE cycle = ? ORDER BY object LIMIT ?', (cycle, limit))
+
+    def uncollectable_data(self, limit=20, member_limit=5):
+        def items(garbage):
+            return [
+                {
+                    'cycle': cycle,
+                    'object_count': object_count,
+                    'size': size,
+                    'garbage_count': garbage_count,
+                    'finalizer_count': finalizer_count,
+                    'members': [
+                        self.object_summary(obj_id)
+                        for obj_id in self.cycle_members(cycle, limit=member_limit)
+                    ],
+                }
+                for cycle, object_count, size, garbage_count, finalizer_count
+                in self.uncollectable_cycles(limit, garbage=garbage)
+            ]
 
-    def __enter__(self):
-        return self
+        return {
+            'summary': self.uncollectable_summary(),
+            'items': items(True),
+            'finalizer_cycles': items(False),
+        }
 
-    def __exit__(self, exc_type, exc, tb):
-        self.close()
+    def cache_inventory(self, limit=20):
+        '''
+        return [(obj_id, kind, name, entry_count, transitive_count, transitive_size)]
+        for cache-like containers, largest transitive size first
+        '''
+        if 'cache' not in self._table_names:
+            return []
+        return self.sql(
+            """
+            SELECT object, kind, name, entry_count, transitive_count, transitive_size
+            FROM cache ORDER BY transitive_size DESC, entry_count DESC LIMIT ?
+            """,
+            (limit,))
 
-    def sql(self, sql, args=None):
-        '''run SELECT sql against underling DB'''
-        if args is None:
-            return self.conn.execute(sql).fetchall()
-        return self.conn.execute(sql, args).fetchall()
+    def lru_cache_info(self, obj_id):
+        '''{hits, misses, maxsize, currsize} recorded for a functools.lru_cache wrapper, or None'''
+        if 'lru_cache' not in self._table_names:
+            return None
+        row = self.sql(
+            'SELECT hits, misses, maxsize, currsize FROM lru_cache WHERE object = ?', (obj_id,))
+        if not row:
+            return None
+        return dict(zip(('hits', 'misses', 'maxsize', 'currsize'), row[0]))
 
-    def sql_val(self, sql, args=None, default=_MISSING):
-        '''run SELECT sql that returns single value'''
-        result = self.sql(sql, args)
-        if not result:
-            if default is not _MISSING:
-                return default
-            # TODO: better exception type
-            raise ValueError("sql returned no rows", sql)
-        return result[0][0]
+    def caches_data(self, limit=20):
+        return {
+            'items': [
+                {
+                    'object': self.object_summary(obj_id),
+                    'kind': kind,
+                    'name': name,
+                    'entry_count': entry_count,
+                    'transitive_count': transitive_count,
+                    'transitive_size': transitive_size,
+                    'lru_cache_info': self.lru_cache_info(obj_id),
+                }
+                for obj_id, kind, name, entry_count, transitive_count, transitive_size
+                in self.cache_inventory(limit=limit)
+            ],
+        }
 
-    def sql_list(self, sql, args=None):
-        '''run SELECT and return [a, b, c] instead of [(a,), (b,), (c,)]'''
-        return list(sum(self.sql(sql, args), ()))
+    def pending_tasks_by_coroutine(self, limit=20):
+        '''
+        return [(coro_name, task_count, pending_count, transitive_count, transitive_size)]
+        for asyncio Tasks grouped by coroutine, most retained memory first
+        '''
+        if 'asyncio_task_group' not in self._table_names:
+            return []
+        return self.sql(
+            """
+            SELECT coro_name, task_count, pending_count, transitive_count, transitive_size
+            FROM asyncio_task_group WHERE pending_count > 0
+            ORDER BY transitive_size DESC, pending_count DESC LIMIT ?
+            """,
+            (limit,))
 
-    def summary_stats(self):
-        summary = {
-            'path': self.path,
-            'hostname': self.sql_val('SELECT hostname FROM meta'),
-            'timestamp': self.sql_val('SELECT ts FROM meta'),
-            'memory_mb': self.sql_val('SELECT memory_mb FROM meta'),
-            'visible_memory_fraction': self.visible_memory_fraction(),
-            'object_count': self.object_count(),
-            'reference_count': self.reference_count(),
+    def pending_tasks(self, coro_name, limit=20):
+        if 'asyncio_task' not in self._table_names:
+            return []
+        return self.sql_list(
+            """
+            SELECT object FROM asyncio_task WHERE coro_name = ? AND state = 'PENDING'
+            ORDER BY object LIMIT ?
+            """,
+            (coro_name, limit))
+
+    def tasks_data(self, limit=20, task_limit=5):
+        return {
+            'items': [
+                {
+                    'coro_name': coro_name,
+                    'task_count': task_count,
+                    'pending_count': pending_count,
+                    'transitive_count': transitive_count,
+                    'transitive_size': transitive_size,
+                    'tasks': [
+                        self.object_summary(obj_id)
+                        for obj_id in self.pending_tasks(coro_name, limit=task_limit)
+                    ],
+                }
+                for coro_name, task_count, pending_count, transitive_count, transitive_size
+                in self.pending_tasks_by_coroutine(limit=limit)
+            ],
         }
-        immortal_refcount = self.immortal_refcount()
-        if immortal_refcount is not None:
-            summary['immortal_refcount'] = immortal_refcount
-            summary['immortal_object_count'] = self.sql_val(
-                'SELECT immortal_object_count FROM meta',
-                default=0,
-            )
-        return summary
 
-    def object_count(self):
-        return self.sql_val('SELECT count(*) FROM object')
+    def processes(self):
+        '''
+        return [(process, pid, hostname, object_count, private_count, private_size)]
+        for an analysis db merged from several processes' dumps (see make_analysis_db),
+        private meaning found in that process only; [] for a single dump
+        '''
+        if 'process' not in self._table_names:
+            return []
+        return self.sql(
+            """
+            SELECT process.id, process.pid, process.hostname, process.object_count,
+                COUNT(private.object), COALESCE(SUM(object.size), 0)
+            FROM process
+            LEFT JOIN (
+                SELECT object, MIN(process) AS process FROM process_object
+                GROUP BY object HAVING COUNT(*) = 1
+            ) AS private ON private.process = process.id
+            LEFT JOIN object ON object.id = private.object
+            GROUP BY process.id ORDER BY process.id
+            """)
 
-    def reference_count(self):
-        return self.sql_val('SELECT count(*) FROM reference')
+    def _type_counts_by_process(self, type_ids=None):
+        '''{(type obj id, name): {process: (count, size)}}'''
+        counts = {}
+        for type_id, name, process, count, size in self.sql(
+            """
+            SELECT object.pytype, pytype.name, process_object.process, COUNT(*), SUM(object.size)
+            FROM process_object
+            JOIN object ON object.id = process_object.object
+            JOIN pytype ON pytype.object = object.pytype
+            GROUP BY object.pytype, process_object.process
+            """
+        ):
+            if type_ids is None or type_id in type_ids:
+                counts.setdefault((type_id, name), {})[process] = (count, size)
+        return counts
 
-    def visible_memory_fraction(self):
-        '''get the fraction of peak RSS that is accounted for'''
-        return self.sql_val(
-            'SELECT 1.0 * sum(size) / 1024 / 1024 / (SELECT memory_mb from meta) FROM object, meta')
+    def type_counts_by_process(self, limit=20):
+        '''
+        return [(type obj id, name, [count in process 1, count in process 2, ...])]
+        for the types with the most instances across processes
+        '''
+        if 'process' not in self._table_names:
+            return []
+        process_ids = self.sql_list("SELECT id FROM process ORDER BY id")
+        type_ids = set(self.sql_list(
+            """
+            SELECT object.pytype FROM process_object JOIN object ON object.id = process_object.object
+            GROUP BY object.pytype ORDER BY COUNT(*) DESC LIMIT ?
+            """,
+            (limit,)))
+        counts = self._type_counts_by_process(type_ids)
+        rows = [
+            (type_id, name, [by_process.get(process, (0, 0))[0] for process in process_ids])
+            for (type_id, name), by_process in counts.items()]
+        return sorted(rows, key=lambda row: (-sum(row[2]), row[1]))
+
+    def outlier_processes(self, factor=1.5, type_limit=5):
+        '''
+        return [(process, pid, private_size, median_private_size, [(type name, excess_count, excess_size)])]
+        for processes whose private objects take more than factor times the median
+        across processes, each with the types it holds the most more of than the median process
+        '''
+        processes = self.processes()
+        if len(processes) < 2:
+            return []
+        median_private_size = statistics.median([row[5] for row in processes])
+        outliers = [row for row in processes if row[5] > factor * median_private_size]
+        if not outliers:
+            return []
+        counts = self._type_counts_by_process()
+        result = []
+        for process, pid, _, _, _, private_size in outliers:
+            excess = []
+            for (_, name), by_process in counts.items():
+                count, size = by_process.get(process, (0, 0))
+                median_count = statistics.median([by_process.get(row[0], (0, 0))[0] for row in processes])
+                median_size = statistics.median([by_process.get(row[0], (0, 0))[1] for row in processes])
+                if size > median_size:
+                    excess.append((name, count - median_count, size - median_size))
+            excess.sort(key=lambda item: (-item[2], item[0]))
+            result.append((process, pid, private_size, median_private_size, excess[:type_limit]))
+        return sorted(result, key=lambda row: -row[2])
+
+    def partial_types(self, limit=20):
+        '''
+        return [(type name, [processes it was found in], object_count)]
+        for types found in some of the merged processes but not all, most objects first
+        '''
+        if 'process' not in self._table_names:
+            return []
+        process_count = self.sql_val("SELECT COUNT(*) FROM process")
+        rows = self.sql(
+            """
+            SELECT pytype.name, GROUP_CONCAT(DISTINCT process_object.process), COUNT(*)
+            FROM process_object
+            JOIN object ON object.id = process_object.object
+            JOIN pytype ON pytype.object = object.pytype
+            GROUP BY object.pytype
+            HAVING COUNT(DISTINCT process_object.process) < ?
+            ORDER BY COUNT(*) DESC, pytype.name LIMIT ?
+            """,
+            (process_count, limit))
+        return [
+            (name, sorted(int(process) for process in processes.split(',')), count)
+            for name, processes, count in rows]
 
-    def cost_by_type(self, limit=20):
-        '''get (typename, percent memory, number of instances) ordered by percent memory'''
-        if 'object_attributed_size' in self._table_names:
-            return self.sql(
-                """
-                SELECT
-                    name,
-                    count(*),
-                    100 * sum(object_attributed_size.attributed_size) / (1.0 * (SELECT sum(size) FROM object))
-                FROM object
-                JOIN pytype ON object.pytype = pytype.object
-                JOIN object_attributed_size ON object.id = object_attributed_size.object
-                GROUP BY name ORDER BY sum(object_attributed_size.attributed_size) DESC LIMIT ?
-                """,
-                (limit,),
-            )
+    def fleet_data(self, limit=20):
+        processes = self.processes()
+        return {
+            'processes': [
+                {
+                    'process': process, 'pid': pid, 'hostname': hostname, 'object_count': object_count,
+                    'private_count': private_count, 'private_size': private_size,
+                }
+                for process, pid, hostname, object_count, private_count, private_size in processes
+            ],
+            'type_counts': [
+                {'type_id': type_id, 'name': name, 'counts': counts}
+                for type_id, name, counts in self.type_counts_by_process(limit=limit)
+            ],
+            'outliers': [
+                {
+                    'process': process, 'pid': pid, 'private_size': private_size,
+                    'median_private_size': median_private_size,
+                    'types': [
+                        {'name': name, 'excess_count': excess_count, 'excess_size': excess_size}
+                        for name, excess_count, excess_size in excess
+                    ],
+                }
+                for process, pid, private_size, median_private_size, excess in self.outlier_processes()
+            ],
+            'partial_types': [
+                {'name': name, 'processes': found_in, 'object_count': count}
+                for name, found_in, count in self.partial_types(limit=limit)
+            ],
+        }
+
+    def memory_map(self, limit=20):
+        '''
+        return [(pathname, kind, region_count, rss_kb, private_dirty_kb, anonymous_kb), ...]
+        ordered by RSS, as summarized from /proc/self/smaps at dump time
+        '''
+        if 'memory_map' not in self._table_names:
+            return []
         return self.sql(
             """
-            SELECT name, count(*), 100 * sum(size) / (1.0 * (SELECT sum(size) FROM object))
-            FROM object JOIN pytype ON object.pytype = pytype.object
-            GROUP BY name ORDER BY sum(size) DESC LIMIT ?
+            SELECT pathname, kind, region_count, rss_kb, private_dirty_kb, anonymous_kb
+            FROM memory_map ORDER BY rss_kb DESC LIMIT ?
             """,
             (limit,))
 
+    def rss_breakdown(self):
+        '''
+        split resident memory at dump time into
+        [(category, MiB), ...]: python objects, pymalloc overhead, anonymous heap,
+        shared libraries, file mappings, thread stacks, other;
+        python objects and pymalloc overhead are carved out of the anonymous memory
+        they live in, so the categories add up to total RSS;
+        returns [] if the dump has no memory map (i.e. it was not taken on linux)
+        '''
+        if 'memory_map' not in self._table_names:
+            return []
+        rss_by_kind = dict(self.sql('SELECT kind, sum(rss_kb) / 1024.0 FROM memory_map GROUP BY kind'))
+        if not rss_by_kind:
+            return []
+        anonymous_mb = rss_by_kind.get('anonymous', 0) + rss_by_kind.get('heap', 0)
+        python_mb = min(anonymous_mb, self.sql_val('SELECT COALESCE(sum(size), 0) FROM object') / 1024.0 / 1024)
+        pymalloc_overhead = self.pymalloc_overhead()
+        overhead_mb = pymalloc_overhead['overhead_mb'] if pymalloc_overhead else 0.0
+        overhead_mb = max(0.0, min(anonymous_mb - python_mb, overhead_mb))
+        return [
+            ('python objects', python_mb),
+            ('pymalloc overhead', overhead_mb),
+            ('anonymous heap', anonymous_mb - python_mb - overhead_mb),
+            ('shared libraries', rss_by_kind.get('library', 0)),
+            ('file mappings', rss_by_kind.get('file', 0)),
+            ('thread stacks', rss_by_kind.get('stack', 0)),
+            ('other', rss_by_kind.get('other', 0)),
+        ]
+
+    def cost_by_type(self, limit=20, generation=_MISSING):
+        '''
+        get (typename, percent memory, number of instances) ordered by percent memory
+
+        generation restricts to objects in that gc generation
+        (0-2, 3 for the permanent generation, None for untracked objects);
+        percentages stay relative to all objects so they can be compared across generations
+        '''
+        where, args = '', ()
+        if generation is not _MISSING:
+            if 'gc_generation' not in self._object_columns:
+                return []
+            where, args = 'WHERE object.gc_generation IS ?', (generation,)
+        return self.sql(
+            """
+            SELECT name, count(*), 100 * sum({size}) / (1.0 * (SELECT sum(size) FROM object))
+            FROM object
+            JOIN pytype ON object.pytype = pytype.object
+            {join}
+            {where}
+            GROUP BY name ORDER BY sum({size}) DESC LIMIT ?
+            """.format(size=self._size_expr(), join=self._size_join(), where=where),
+            args + (limit,))
+
+    def cost_by_generation(self):
+        '''get (gc generation, number of objects, percent memory) ordered by generation'''
+        if 'gc_generation' not in self._object_columns:
+            return []
+        return self.sql(
+            """
+            SELECT gc_generation, count(*), 100 * sum({size}) / (1.0 * (SELECT sum(size) FROM object))
+            FROM object
+            {join}
+            GROUP BY gc_generation ORDER BY gc_generation IS NULL, gc_generation
+            """.format(size=self._size_expr(), join=self._size_join()))
+
+    def cost_by_type_and_generation(self, typenames):
+        '''get {typename: [(gc generation, number of instances, percent memory), ...]}'''
+        ret = {name: [] for name in typenames}
+        if not ret or 'gc_generation' not in self._object_columns:
+            return ret
+        name_clause, name_args = self._sql_in_clause(ret)
+        rows = self.sql(
+            """
+            SELECT name, gc_generation, count(*), 100 * sum({size}) / (1.0 * (SELECT sum(size) FROM object))
+            FROM object
+            JOIN pytype ON object.pytype = pytype.object
+            {join}
+            WHERE name IN {name_clause}
+            GROUP BY name, gc_generation ORDER BY name, gc_generation IS NULL, gc_generation
+            """.format(size=self._size_expr(), join=self._size_join(), name_clause=name_clause),
+            name_args)
+        for name, generation, count, memory_percent in rows:
+            ret[name].append((generation, count, memory_percent))
+        return ret
+
     def as_digraph(self):
         '''return an obj-id -> obj-id networkx DiGraph'''
         from networkx import DiGraph
@@ -354,6 +2248,8 @@ class Reader:
         return self.sql('SELECT ref, dst FROM reference WHERE src = ? LIMIT ?', (obj_id, limit))
 
     def obj_refers_to_count(self, obj_id):
+        if 'object_degree' in self._table_names:
+            return self.sql_val('SELECT out_degree FROM object_degree WHERE object = ?', (obj_id,)) or 0
         return self.sql_val('SELECT count(*) FROM reference WHERE src = ?', (obj_id,))
 
     def refers_to_obj(self, obj_id, limit=20):
@@ -361,8 +2257,16 @@ class Reader:
         return self.sql('SELECT ref, src FROM reference WHERE dst = ? LIMIT ?', (obj_id, limit))
 
     def refers_to_obj_count(self, obj_id):
+        if 'object_degree' in self._table_names:
+            return self.sql_val('SELECT in_degree FROM object_degree WHERE object = ?', (obj_id,)) or 0
         return self.sql_val('SELECT count(*) FROM reference WHERE dst = ?', (obj_id,))
 
+    def dict_key_count(self, obj_id):
+        '''how many dicts hold obj-id as a key'''
+        if 'object_degree' in self._table_names:
+            return self.sql_val('SELECT in_from_dict_keys FROM object_degree WHERE object = ?', (obj_id,)) or 0
+        return self.sql_val('SELECT count(*) FROM reference WHERE ref = ?', ('@{}'.format(obj_id),))
+
     def obj_is_type(self, obj_id):
         return self.sql_val('SELECT EXISTS(SELECT 1 FROM pytype WHERE pytype.object = ?)', (obj_id,))
 
@@ -487,8 +2391,8 @@ class Reader:
             ref = self.sql_val(
                 """
                 SELECT ref FROM reference WHERE
-                src = ? and (dst = ? or ref = '@' || ?) and NOT ref LIKE '%.f_globals%'
-                """,
+                src = ? and (dst = ? or ref = '@' || ?) and NOT ref LIKE '%.f_globals%' and {strong}
+                """.format(strong=self._strong_refs()),
                 (src_obj_id, dst_obj_id, dst_obj_id),
             )
             obj_ref_path.append((src_obj_id, ref))
@@ -500,6 +2404,18 @@ class Reader:
             raise ValueError('expected at least one value for SQL IN clause')
         return '({})'.format(', '.join(['?'] * len(values))), values
 
+    def _strong_refs(self):
+        '''SQL condition on reference that skips weak edges unless include_weak is set'''
+        if self.include_weak:
+            return '1'
+        return "reference.ref NOT LIKE '~%'"
+
+    def set_include_weak(self, include_weak):
+        '''toggle include_weak, dropping root paths cached under the old setting'''
+        self.include_weak = include_weak
+        for cache in self._root_object_path_cache.values():
+            cache.clear()
+
     def _cache_root_object_path(self, cache_name, object_path):
         for idx in range(len(object_path)):
             self._root_object_path_cache[cache_name][object_path[idx]] = list(object_path[:idx + 1])
@@ -519,15 +2435,44 @@ class Reader:
                 SELECT src, dst FROM reference
                 WHERE dst IN {dst_clause}
                 AND NOT ref LIKE '%.f_globals%'
+                AND {strong}
                 UNION ALL
                 SELECT src, CAST(substr(ref, 2) AS INTEGER) FROM reference
                 WHERE ref IN {ref_clause}
                 AND NOT ref LIKE '%.f_globals%'
-                """.format(dst_clause=dst_clause, ref_clause=ref_clause),
+                """.format(dst_clause=dst_clause, ref_clause=ref_clause, strong=self._strong_refs()),
                 dst_args + ref_args,
             ))
         return parent_rows
 
+    def _root_distance_ref_paths(self, kind, obj_id):
+        '''
+        find_path_to_module() & co from the root_distance table make_analysis_db
+        precomputed: a walk up the parent pointers, no depth limit; None if there is
+        no such table or it doesn't apply (it only follows strong references)
+        '''
+        if 'root_distance' not in self._table_names or self.include_weak:
+            return None
+        ref_path = []
+        row = self.sql('SELECT parent, ref FROM root_distance WHERE object = ? AND kind = ?', (obj_id, kind))
+        if not row:
+            return []
+        parent, ref = row[0]
+        while parent is not None:
+            ref_path.append((parent, ref))
+            parent, ref = self.sql(
+                'SELECT parent, ref FROM root_distance WHERE object = ? AND kind = ?', (parent, kind))[0]
+        ref_path.reverse()
+        return [ref_path]
+
+    def root_distance(self, obj_id, kind='module'):
+        '''references between obj-id and the nearest root of kind (module, frame or thread), None if unreachable'''
+        if 'root_distance' in self._table_names and not self.include_weak:
+            return self.sql_val(
+                'SELECT distance FROM root_distance WHERE object = ? AND kind = ?', (obj_id, kind), default=None)
+        ref_paths = getattr(self, 'find_path_to_' + kind)(obj_id)
+        return len(ref_paths[0]) if ref_paths else None
+
     def _find_root_object_path(self, root_obj_ids, dst_obj_id, cache_name, limit=20):
         cached_path = self._root_object_path_cache[cache_name].get(dst_obj_id)
         if cached_path:
@@ -614,7 +2559,8 @@ class Reader:
                 nxt_dst_fringe = set()
                 for obj_id in dst_fringe:
                     parent_ids = self.sql_list(
-                        "SELECT src FROM reference WHERE (dst = ? OR ref = '@' || ?) AND NOT ref LIKE '%.f_globals%'",
+                        "SELECT src FROM reference WHERE (dst = ? OR ref = '@' || ?) AND NOT ref LIKE '%.f_globals%'"
+                        " AND " + self._strong_refs(),
                         (obj_id, str(obj_id)))
                     for parent_id in parent_ids:
                         if parent_id in dst_child:
@@ -627,7 +2573,8 @@ class Reader:
                 nxt_src_fringe = set()
                 for obj_id in src_fringe:
                     child_ids = self.sql_list(
-                        "SELECT dst FROM reference WHERE src = ? AND NOT ref LIKE '%.f_globals%'",
+                        "SELECT dst FROM reference WHERE src = ? AND NOT ref LIKE '%.f_globals%'"
+                        " AND " + self._strong_refs(),
                         (obj_id,))  # TODO: capture ref here as well
                     for child_id in child_ids:
                         if child_id in src_parent:
@@ -661,8 +2608,8 @@ class Reader:
                 ref = self.sql_val(
                     """
                     SELECT ref FROM reference WHERE
-                    src = ? and (dst = ? or ref = '@' || ?) and NOT ref LIKE '%.f_globals%'
-                    """,
+                    src = ? and (dst = ? or ref = '@' || ?) and NOT ref LIKE '%.f_globals%' and {strong}
+                    """.format(strong=self._strong_refs()),
                     (path[i], path[i + 1], path[i + 1]))
                 obj_ref_path.append((path[i], ref))
             obj_ref_paths.append(obj_ref_path)
@@ -675,6 +2622,9 @@ class Reader:
         where the first obj-id is a module
         (obj_id itself is not included in the result)
         '''
+        ref_paths = self._root_distance_ref_paths('module', obj_id)
+        if ref_paths is not None:
+            return ref_paths
         object_path = self._find_root_object_path(self.get_modules().values(), obj_id, 'module')
         if not object_path:
             return []
@@ -686,11 +2636,29 @@ class Reader:
         return [[(obj-id, ref), (obj-id, ref), ...], ..]
         (same as find_path_to_module)
         '''
+        ref_paths = self._root_distance_ref_paths('frame', obj_id)
+        if ref_paths is not None:
+            return ref_paths
         object_path = self._find_root_object_path(self.sql_list('SELECT object FROM pyframe'), obj_id, 'frame')
         if not object_path:
             return []
         return [self._object_path_to_ref_path(object_path)]
 
+    def find_path_to_thread(self, obj_id):
+        '''
+        find how (if at all) this object is referenced from a thread's current stack,
+        the first obj-id being the innermost frame of the thread
+        (same as find_path_to_module)
+        '''
+        ref_paths = self._root_distance_ref_paths('thread', obj_id)
+        if ref_paths is not None:
+            return ref_paths
+        object_path = self._find_root_object_path(
+            self.sql_list('SELECT stack_obj_id FROM thread'), obj_id, 'thread')
+        if not object_path:
+            return []
+        return [self._object_path_to_ref_path(object_path)]
+
     def find_path(self, src_obj_id, dst_obj_id):
         '''
         similar to find_path_to_module and find_path_to_frame
@@ -704,52 +2672,52 @@ class Reader:
         '''
         return self.sql_list(
             """
-            SELECT id FROM object WHERE id NOT IN (SELECT dst FROM reference) AND NOT EXISTS (
+            SELECT id FROM object WHERE id NOT IN (SELECT dst FROM reference WHERE {strong}) AND NOT EXISTS (
                 SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) ) LIMIT ?
-            """,
+            """.format(strong=self._strong_refs()),
             (limit,))
 
     def get_orphan_count(self):
         return self.sql_val(
             """
             SELECT count(*) FROM object WHERE
-                id NOT IN (SELECT dst FROM reference)
+                id NOT IN (SELECT dst FROM reference WHERE {strong})
                 AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                 AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
-            """)
+            """.format(strong=self._strong_refs()))
 
     def get_orphan_type_count(self, limit=20):
         return self.sql(
             """
             SELECT name, count(object.id) FROM object JOIN pytype ON object.pytype = pytype.object
-            WHERE object.id NOT IN (SELECT dst FROM reference)
+            WHERE object.id NOT IN (SELECT dst FROM reference WHERE {strong})
                 AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                 AND object.id NOT IN (SELECT base_obj_id FROM pytype_bases)
             GROUP BY name ORDER BY count(object.id) DESC LIMIT ?
-            """,
+            """.format(strong=self._strong_refs()),
             (limit,))
 
     def random_orphans(self, limit=20):
         return self.sql_list(
             """
             SELECT id FROM object WHERE
-                id NOT IN (SELECT dst FROM reference)
+                id NOT IN (SELECT dst FROM reference WHERE {strong})
                 AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                 AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
             ORDER BY random() LIMIT ?
-            """,
+            """.format(strong=self._strong_refs()),
             (limit,))
 
     def random_orphans_with_typename(self, typename, limit=20):
         return self.sql_list(
             """
             SELECT object.id FROM object JOIN pytype ON object.pytype = pytype.object WHERE
-                object.id NOT IN (SELECT dst FROM reference)
+                object.id NOT IN (SELECT dst FROM reference WHERE {strong})
                 AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                 AND object.id NOT IN (SELECT base_obj_id FROM pytype_bases)
                 AND name LIKE ?
             ORDER BY random() LIMIT ?
-            """,
+            """.format(strong=self._strong_refs()),
             (typename, limit))
 
     def orphan_with_children_count(self):
@@ -759,22 +2727,22 @@ class Reader:
         return self.sql_val(
             """
             SELECT count(*) FROM object WHERE
-                id NOT IN (SELECT dst FROM reference)
+                id NOT IN (SELECT dst FROM reference WHERE {strong})
                 AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                 AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
-                AND id IN (SELECT src FROM reference)
-            """)
+                AND id IN (SELECT src FROM reference WHERE {strong})
+            """.format(strong=self._strong_refs()))
 
     def random_orphans_with_children(self, limit=20):
         return self.sql_list(
             """
             SELECT id FROM object WHERE
-                id NOT IN (SELECT dst FROM reference)
+                id NOT IN (SELECT dst FROM reference WHERE {strong})
                 AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                 AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
-                AND id IN (SELECT src FROM reference)
+                AND id IN (SELECT src FROM reference WHERE {strong})
                 ORDER BY random() LIMIT ?
-            """,
+            """.format(strong=self._strong_refs()),
             (limit,))
 
     def random_referrers_to_orphans_with_children(self, limit=20):
@@ -782,13 +2750,13 @@ class Reader:
             """
             SELECT count(*), src FROM gc_referrer WHERE dst in (
                 SELECT id FROM object WHERE
-                    id NOT IN (SELECT dst FROM reference)
+                    id NOT IN (SELECT dst FROM reference WHERE {strong})
                     AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                     AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
-                    AND id IN (SELECT src FROM reference)
+                    AND id IN (SELECT src FROM reference WHERE {strong})
                 )
                 GROUP BY src ORDER BY random() LIMIT ?
-            """,
+            """.format(strong=self._strong_refs()),
             (limit,))
 
     def random_missing_references_to_orphans_with_children(self, limit=20):
@@ -797,13 +2765,13 @@ class Reader:
             """
             SELECT src, dst FROM gc_referrer WHERE dst in (
                 SELECT id FROM object WHERE
-                    id NOT IN (SELECT dst FROM reference)
+                    id NOT IN (SELECT dst FROM reference WHERE {strong})
                     AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                     AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
-                    AND id IN (SELECT src FROM reference)
+                    AND id IN (SELECT src FROM reference WHERE {strong})
                 )
                 ORDER BY random() LIMIT ?
-            """,
+            """.format(strong=self._strong_refs()),
             (limit,))
 
     def referrers_to_orphans_with_children_type_count(self):
@@ -813,14 +2781,14 @@ class Reader:
             WHERE object.id IN (
                 SELECT src FROM gc_referrer WHERE dst in (
                     SELECT id FROM object WHERE
-                        id NOT IN (SELECT dst FROM reference)
+                        id NOT IN (SELECT dst FROM reference WHERE {strong})
                         AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                         AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
-                        AND id IN (SELECT src FROM reference)
+                        AND id IN (SELECT src FROM reference WHERE {strong})
                     )
             )
             GROUP BY name ORDER BY count(object.id) DESC
-            """)
+            """.format(strong=self._strong_refs()))
 
     def referrers_to_orphans_with_children_of_type(self, typename, limit=20):
         return self.sql_list(
@@ -829,13 +2797,13 @@ class Reader:
             WHERE object.id IN (
                 SELECT src FROM gc_referrer WHERE dst in (
                     SELECT id FROM object WHERE
-                        id NOT IN (SELECT dst FROM reference)
+                        id NOT IN (SELECT dst FROM reference WHERE {strong})
                         AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                         AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
-                        AND id IN (SELECT src FROM reference)
+                        AND id IN (SELECT src FROM reference WHERE {strong})
                     )
             ) AND pytype.name LIKE ? LIMIT ?
-            """,
+            """.format(strong=self._strong_refs()),
             (typename, limit))
 
     def orphans_of(self, obj_id):
@@ -843,10 +2811,10 @@ class Reader:
             """
             SELECT id FROM object WHERE
                 id IN (SELECT dst FROM gc_referrer WHERE src = ?)
-                AND id NOT IN (SELECT dst FROM reference)
+                AND id NOT IN (SELECT dst FROM reference WHERE {strong})
                 AND NOT EXISTS (SELECT 1 FROM reference WHERE ref = '@' || CAST(object.id AS TEXT) )
                 AND id NOT IN (SELECT base_obj_id FROM pytype_bases)
-            """,
+            """.format(strong=self._strong_refs()),
             (obj_id,))
 
     def most_common_types(self, limit=20):
@@ -871,7 +2839,11 @@ class Reader:
 
     def most_referenced_objects(self, limit=20):
         """get the most referenced objects (by entries in reference table)"""
-        return self.sql("SELECT count(*), dst FROM reference GROUP BY dst LIMIT ?", (limit,))
+        if 'object_degree' in self._table_names:
+            return self.sql(
+                "SELECT in_degree, object FROM object_degree ORDER BY in_degree DESC LIMIT ?", (limit,))
+        return self.sql(
+            "SELECT count(*), dst FROM reference GROUP BY dst ORDER BY count(*) DESC LIMIT ?", (limit,))
 
     def find_type_by_name(self, typename):  # TODO: what should the Console interface to this look like?
         """given a typename with % wildcards, find matches"""
@@ -1087,6 +3059,7 @@ class Reader:
     def object_referrers_data(self, obj_id, limit=50):
         return {
             'count': self.refers_to_obj_count(obj_id),
+            'dict_key_count': self.dict_key_count(obj_id),
             'items': [
                 {'ref': ref, 'object': self.object_summary(src)}
                 for ref, src in self.refers_to_obj(obj_id, limit=limit)
@@ -1137,7 +3110,15 @@ class Reader:
             for path in self.find_path_to_frame(obj_id)[:limit]
         ]
 
-    def top_types_data(self, limit=20):
+    def path_to_thread_data(self, obj_id, limit=20):
+        return [
+            self.object_ref_path_data(path)
+            for path in self.find_path_to_thread(obj_id)[:limit]
+        ]
+
+    def top_types_data(self, limit=20, generation=_MISSING):
+        cost = self.cost_by_type(limit=limit, generation=generation)
+        by_generation = self.cost_by_type_and_generation([name for name, _, _ in cost])
         return [
             {
                 'name': name,
@@ -1147,10 +3128,32 @@ class Reader:
                     'SELECT object FROM pytype WHERE name = ? LIMIT 1',
                     (name,),
                 ),
+                'generations': [
+                    {
+                        'generation': _GC_GENERATION_LABELS.get(gen, str(gen)),
+                        'instance_count': gen_count,
+                        'memory_percent': gen_percent,
+                    }
+                    for gen, gen_count, gen_percent in by_generation[name]
+                ],
             }
-            for name, instance_count, memory_percent in self.cost_by_type(limit=limit)
+            for name, instance_count, memory_percent in cost
         ]
 
+    def generations_data(self):
+        return {
+            'freeze_count': self.sql_val('SELECT gc_freeze_count FROM meta', default=None)
+            if 'gc_freeze_count' in self._meta_columns else None,
+            'items': [
+                {
+                    'generation': _GC_GENERATION_LABELS.get(gen, str(gen)),
+                    'object_count': object_count,
+                    'memory_percent': memory_percent,
+                }
+                for gen, object_count, memory_percent in self.cost_by_generation()
+            ],
+        }
+
     def largest_objects_data(self, limit=20):
         return [
             {
@@ -1160,6 +3163,15 @@ class Reader:
             for size, obj_id in self.largest_objects(limit=limit)
         ]
 
+    def most_referenced_objects_data(self, limit=20):
+        return [
+            {
+                'count': count,
+                'object': self.object_summary(obj_id),
+            }
+            for count, obj_id in self.most_referenced_objects(limit=limit)
+        ]
+
 
 class PathFailure(Exception): pass
 
@@ -1433,8 +3445,10 @@ class Console(Cmd):
             return res  # TODO (go to a specific one)
 
         label = self._obj_label(self.cur)
-        print("{:,} objects refer to {}:".format(self.reader.refers_to_obj_count(self.cur),
-                                                 label))
+        dict_key_count = self.reader.dict_key_count(self.cur)
+        print("{:,} objects refer to {}{}:".format(
+            self.reader.refers_to_obj_count(self.cur), label,
+            ' (and {:,} dicts hold it as a key)'.format(dict_key_count) if dict_key_count else ''))
 
         for ref, src in in_ref:
             self._print_option('go %s' % src, ' {}{}'.format(self._obj_label(src), self._ref(ref)))
@@ -1488,6 +3502,15 @@ class Console(Cmd):
                 for ref_path in frame_ref_paths[:20]:
                     self._print_option('go %s' % ref_path[0][0], self._ref_path(ref_path))
 
+        if not self.reader.obj_is_frame(self.cur):
+            thread_ref_paths = self.reader.find_path_to_thread(self.cur)
+            if thread_ref_paths:
+                print()
+                print('%s thread stacks transitively refer to %s:'
+                      % (len(thread_ref_paths), label))
+                for ref_path in thread_ref_paths[:20]:
+                    self._print_option('go %s' % ref_path[0][0], self._ref_path(ref_path))
+
         print()
         return
 
@@ -1632,6 +3655,16 @@ class Console(Cmd):
             return
         self.reader.mark_object(self.cur, args[0])
 
+    def do_weak(self, args):
+        "Show or set whether weak references count towards paths to roots: weak [on|off]"
+        if args:
+            if args[0] not in ('on', 'off'):
+                print('weak command expects on or off')
+                return
+            self.reader.set_include_weak(args[0] == 'on')
+        print('weak references are {} when finding paths to roots and orphans'.format(
+            'followed' if self.reader.include_weak else 'skipped'))
+
     def do_top(self, args):
         if not args:
             print('top command expects one or two arguments')
@@ -1648,6 +3681,15 @@ class Console(Cmd):
             result = self.reader.largest_objects(num)
         elif name == 'referenced':
             result = self.reader.most_referenced_objects(num)
+        elif name == 'pinning':
+            result = [
+                (arena_count, type_id)
+                for type_id, _, arena_count in self.reader.pinned_arena_types(limit=num)
+            ]
+            name = 'pinned arenas'
+        elif name == 'buffers':
+            result = [(nbytes, owner_id) for owner_id, nbytes, _ in self.reader.shared_buffers(num)]
+            name = 'buffer size'
         else:
             print("unrecognized option:", name)
             return
@@ -1685,6 +3727,78 @@ class Console(Cmd):
         self._print_count_lines('Top frame roots:', summary['frame_roots'])
         self._print_count_lines('Top frame path prefixes:', summary['frame_paths'])
 
+    def do_garbage(self, args):
+        "List garbage the collector could not free (gc.garbage), then other reference cycles with finalizers"
+        num = int(args[0]) if args else 20
+        summary = self.reader.uncollectable_summary()
+        for garbage, heading in (
+                (True, "{:,} objects ({:,} bytes) the collector could not free, in gc.garbage or cycles with it:".format(
+                    summary['garbage_count'], summary['garbage_size'])),
+                (False, "{:,} cycles with finalizers ({:,} bytes), most of them still reachable:".format(
+                    summary['finalizer_cycle_count'], summary['finalizer_cycle_size']))):
+            print(heading)
+            for cycle, object_count, size, garbage_count, finalizer_count in self.reader.uncollectable_cycles(
+                    num, garbage=garbage):
+                print(" {:,} objects ({:,} bytes, {:,} with finalizers):".format(object_count, size, finalizer_count))
+                for obj_id in self.reader.cycle_members(cycle, limit=5):
+                    self._print_option('go %s' % obj_id, "  {}".format(self._obj_label(obj_id)))
+        print()
+
+    def do_caches(self, args):
+        "List cache-like containers (lru_cache, module-level memo dicts, *Cache types) by transitive size"
+        num = int(args[0]) if args else 20
+        caches = self.reader.cache_inventory(num)
+        print("top {} caches by transitive size:".format(num))
+        for obj_id, kind, name, entry_count, transitive_count, transitive_size in caches:
+            info = self.reader.lru_cache_info(obj_id)
+            stats = ''
+            if info:
+                stats = ', {hits:,} hits / {misses:,} misses, maxsize {maxsize}'.format(**info)
+            self._print_option('go %s' % obj_id, " {} [{}] ({:,} entries, {:,} bytes in {:,} objects{})".format(
+                name, kind, entry_count or 0, transitive_size, transitive_count, stats))
+        print()
+
+    def do_tasks(self, args):
+        "List pending asyncio Tasks grouped by coroutine, with the memory each group keeps alive"
+        num = int(args[0]) if args else 20
+        groups = self.reader.pending_tasks_by_coroutine(num)
+        print("top {} coroutines with pending tasks by transitive size:".format(num))
+        for coro_name, task_count, pending_count, transitive_count, transitive_size in groups:
+            print(" {} ({:,} pending of {:,} tasks, {:,} bytes in {:,} objects):".format(
+                coro_name, pending_count, task_count, transitive_size, transitive_count))
+            for obj_id in self.reader.pending_tasks(coro_name, limit=5):
+                self._print_option('go %s' % obj_id, "  {}".format(self._obj_label(obj_id)))
+        print()
+
+    def do_fleet(self, args):
+        "For an analysis db merged from several processes: per-process objects, outlier processes, types only some have"
+        num = int(args[0]) if args else 10
+        processes = self.reader.processes()
+        if not processes:
+            print("this analysis db was made from a single dump")
+            return
+        print("processes (private = found in that process only):")
+        for process, pid, hostname, object_count, private_count, private_size in processes:
+            print(" #{} pid {} on {}: {:,} objects, {:,} private ({:,} bytes)".format(
+                process, pid, hostname, object_count, private_count, private_size))
+        outliers = self.reader.outlier_processes()
+        if outliers:
+            print("outlier processes:")
+            for process, pid, private_size, median_private_size, excess in outliers:
+                print(" #{} pid {}: {:,} private bytes vs a median of {:,.0f}".format(
+                    process, pid, private_size, median_private_size))
+                for name, excess_count, excess_size in excess:
+                    print("   {:+,.0f} {} ({:+,.0f} bytes)".format(excess_count, name, excess_size))
+        partial = self.reader.partial_types(num)
+        if partial:
+            print("types found in only some processes:")
+            for name, found_in, count in partial:
+                print(" {} ({:,} objects) in #{}".format(name, count, ", #".join(str(p) for p in found_in)))
+        print("top {} types by instances per process:".format(num))
+        for _, name, counts in self.reader.type_counts_by_process(num):
+            print(" {}: {}".format(name, " ".join("{:,}".format(count) for count in counts)))
+        print()
+
     def run(self):
         print("WELCOME TO OBJEX EXPLORER")
         print('Now exploring "{}" collected from {} at {}'.format(
@@ -1698,6 +3812,24 @@ class Console(Cmd):
             self.reader.visible_memory_fraction() * 100,
             self.reader.object_count(),
         ))
+        trigger = self.reader.dump_trigger()
+        if trigger:
+            print("Dump was triggered by: {}".format(trigger))
+        rss_breakdown = self.reader.rss_breakdown()
+        if rss_breakdown:
+            print("RSS at dump time: " + ", ".join(
+                "{} {:0.01f}MiB".format(label, mb) for label, mb in rss_breakdown if mb))
+        pymalloc_overhead = self.reader.pymalloc_overhead()
+        if pymalloc_overhead is not None:
+            print("pymalloc arenas hold {:0.01f}MiB; {:0.01f}MiB ({:0.01f}%) is allocator overhead".format(
+                pymalloc_overhead['arena_mb'],
+                pymalloc_overhead['overhead_mb'],
+                pymalloc_overhead['overhead_fraction'] * 100,
+            ))
+        uncollectable = self.reader.uncollectable_summary()
+        if uncollectable['garbage_count']:
+            print("{:,} objects ({:0.01f}MiB) are garbage the collector could not free; see garbage".format(
+                uncollectable['garbage_count'], uncollectable['garbage_size'] / 1024 / 1024))
         print('(Type "help" for options.)')
         print()
         self.do_list()
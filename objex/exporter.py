@@ -1,23 +1,35 @@
+import array
 import collections
+import functools
 import gc
 import inspect
+import mmap
 import os
+import random
+import re
 try:
     import resource
 except ImportError:  # windows
     resource = None
 import shutil
+import signal
 import sys
 from socket import getfqdn
 import sqlite3
+import tempfile
+import threading
 import time
+import tracemalloc
 import types
+import weakref
 
-from .schema import _SCHEMA
+from .schema import _SCHEMA, _HISTOGRAM_SCHEMA
 from .dbutils import _run_ddl
+from .collector import _parse_collector_address, _StreamConnection
 
 
 _DICT_PROXY_TYPE = type(type.__dict__)
+_LRU_CACHE_WRAPPER_TYPE = type(functools.lru_cache()(len))
 
 # MAINTENANCE NOTE: why are some python types "special" and get broken out as
 # their own table type whereas others are not?
@@ -35,6 +47,19 @@ def _get_memory_mb():
     return psutil.Process().memory_info()[0] / 1024.0 / 1024
 
 
+def _get_rss_mb():
+    '''
+    current resident set size; cheap enough to poll (one small read on linux),
+    elsewhere falls back to the peak from _get_memory_mb()
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return _get_memory_mb()
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 / 1024
+
+
 def _gc_prep():
     '''
     turn off GC, set flags so they will populate gc.garbage,
@@ -50,6 +75,239 @@ def _gc_prep():
     return num_collected
 
 
+def _get_thread_count():
+    '''OS-level thread count (includes threads started from C), where available'''
+    try:
+        return len(os.listdir('/proc/self/task'))
+    except OSError:  # not linux
+        return threading.active_count()
+
+
+def _memory_map_kind(pathname):
+    if not pathname:
+        return 'anonymous'
+    if pathname == '[heap]':
+        return 'heap'
+    if pathname.startswith('[stack'):
+        return 'stack'
+    if pathname.startswith('['):  # [vdso], [vvar], [vsyscall], [anon:...]
+        return 'other'
+    if '.so' in os.path.basename(pathname) or pathname == os.path.realpath(sys.executable):
+        return 'library'
+    return 'file'
+
+
+_SMAPS_HEADER_RE = re.compile(r'^[0-9a-f]+-[0-9a-f]+ ')
+_SMAPS_FIELDS = {'Size': 'size_kb', 'Rss': 'rss_kb', 'Private_Dirty': 'private_dirty_kb', 'Anonymous': 'anonymous_kb'}
+
+
+def _get_memory_map(smaps_path='/proc/self/smaps'):
+    '''
+    summarize /proc/self/smaps by pathname; returns
+    [(pathname, kind, region_count, size_kb, rss_kb, private_dirty_kb, anonymous_kb,
+      start_address, end_address), ...]
+    or [] where smaps is not available (i.e. not linux)
+    '''
+    try:
+        with open(smaps_path) as smaps:
+            lines = smaps.read().splitlines()
+    except OSError:
+        return []
+    regions = {}
+    bounds = {}  # map of pathname to [lowest start, highest end]
+    cur = None
+    for line in lines:
+        if _SMAPS_HEADER_RE.match(line):
+            # region header: address perms offset dev inode [pathname]
+            parts = line.split(None, 5)
+            pathname = parts[5].strip() if len(parts) > 5 else ''
+            start, end = (int(address, 16) for address in parts[0].split('-'))
+            if pathname not in regions:
+                regions[pathname] = collections.Counter()
+                bounds[pathname] = [start, end]
+            else:
+                bounds[pathname] = [min(start, bounds[pathname][0]), max(end, bounds[pathname][1])]
+            cur = regions[pathname]
+            cur['region_count'] += 1
+            continue
+        field, _, rest = line.partition(':')
+        if field in _SMAPS_FIELDS and cur is not None:
+            cur[_SMAPS_FIELDS[field]] += int(rest.split()[0])
+    return [
+        (
+            pathname,
+            _memory_map_kind(pathname),
+            counts['region_count'],
+            counts['size_kb'],
+            counts['rss_kb'],
+            counts['private_dirty_kb'],
+            counts['anonymous_kb'],
+            # [vsyscall] sits above the range of a sqlite INTEGER
+            bounds[pathname][0] if bounds[pathname][1] < 1 << 63 else None,
+            bounds[pathname][1] if bounds[pathname][1] < 1 << 63 else None,
+        )
+        for pathname, counts in regions.items()
+    ]
+
+
+_MALLOC_SIZE_CLASS_RE = re.compile(r'^\s*(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s*$')
+_MALLOC_STAT_RE = re.compile(r'^\s*(.*?)\s*=\s*([\d,]+)\s*$')
+_MALLOC_MULTIPLIED_RE = re.compile(r'^(\d+) (arenas|unused pools) \* (\d+) bytes')
+
+
+def _capture_debugmallocstats():
+    '''
+    sys._debugmallocstats() writes straight to the C-level stderr,
+    so temporarily point fd 2 at a file to capture it
+    '''
+    debugmallocstats = getattr(sys, '_debugmallocstats', None)
+    if debugmallocstats is None:
+        return ''
+    sys.stderr.flush()
+    with tempfile.TemporaryFile(mode='w+b') as capture:
+        saved_stderr = os.dup(2)
+        try:
+            os.dup2(capture.fileno(), 2)
+            debugmallocstats()
+        finally:
+            os.dup2(saved_stderr, 2)
+            os.close(saved_stderr)
+        capture.seek(0)
+        return capture.read().decode('utf-8', 'replace')
+
+
+def _parse_debugmallocstats(text):
+    '''
+    parse sys._debugmallocstats() output into
+    [(size_class, block_size, num_pools, blocks_in_use, avail_blocks), ...]
+    and [(name, value), ...]; both are empty if pymalloc is not in use
+    '''
+    size_classes, stats = [], []
+    for line in text.splitlines():
+        match = _MALLOC_SIZE_CLASS_RE.match(line)
+        if match:
+            size_classes.append(tuple(int(val) for val in match.groups()))
+            continue
+        match = _MALLOC_STAT_RE.match(line)
+        if not match:
+            continue
+        name, value = match.group(1), int(match.group(2).replace(',', ''))
+        multiplied = _MALLOC_MULTIPLIED_RE.match(name)
+        if multiplied:
+            # e.g. "97 arenas * 1048576 bytes/arena" -> bytes in arenas, arena size
+            count, kind, unit_size = multiplied.groups()
+            kind = kind.split()[-1][:-1]  # arenas -> arena, unused pools -> pool
+            stats.append(('{} size'.format(kind), int(unit_size)))
+            name = 'bytes in {}'.format(multiplied.group(2))
+        stats.append((name.lstrip('# '), value))
+    return size_classes, stats
+
+
+def _young_gc_generations():
+    '''
+    snapshot {id(obj): generation} for generations 0 and 1;
+    this has to happen before _gc_prep() since a full collection
+    promotes every survivor into the oldest generation
+    (anything else found in gc.get_objects() is in generation 2);
+    pass the result through _drop_freed_ids() once the collection is done
+    '''
+    young = {}
+    for generation in (1, 0):
+        for obj in gc.get_objects(generation=generation):
+            young[id(obj)] = generation
+    return young
+
+
+def _drop_freed_ids(young):
+    '''
+    the entries of a _young_gc_generations() snapshot whose objects survived
+    the collection; a freed object's address may be reused by a later allocation
+    '''
+    survivors = {id(obj) for obj in gc.get_objects()}
+    return {obj_id: generation for obj_id, generation in young.items() if obj_id in survivors}
+
+
+def _unfreeze_gc():
+    '''
+    ids of the objects gc.freeze() had moved to the permanent generation, which
+    gc.get_objects() leaves out; this unfreezes them, so only call it in a child
+    forked for the dump
+    '''
+    if not gc.get_freeze_count():
+        return set()
+    unfrozen_ids = {id(obj) for obj in gc.get_objects()}
+    gc.unfreeze()
+    return {id(obj) for obj in gc.get_objects() if id(obj) not in unfrozen_ids}
+
+
+_BUFFER_OWNER_TYPES = (bytes, bytearray, array.array, mmap.mmap)
+
+
+def _buffer_types():
+    '''
+    types that may expose a data buffer they did not allocate, or whose
+    buffer sys.getsizeof() does not count;
+    numpy is only included if the dumped process already imported it
+    '''
+    buffer_types = (memoryview, mmap.mmap)
+    numpy = sys.modules.get('numpy')
+    if numpy is not None:
+        buffer_types += (numpy.ndarray,)
+    return buffer_types
+
+
+def _future_types():
+    '''
+    asyncio.Future (and so Task) if the process has imported asyncio;
+    like numpy, objex does not import it just to find out
+    '''
+    asyncio = sys.modules.get('asyncio')
+    if asyncio is None:
+        return ()
+    return (asyncio.Future,)
+
+
+def _buffer_owner(obj):
+    '''
+    follow memoryview.obj and ndarray.base back to the object that allocated the buffer
+    '''
+    numpy = sys.modules.get('numpy')
+    while True:
+        if isinstance(obj, memoryview):
+            base = obj.obj
+        elif numpy is not None and isinstance(obj, numpy.ndarray):
+            base = obj.base
+        else:
+            return obj
+        if base is None:
+            return obj
+        obj = base
+
+
+def _buffer_info(obj):
+    '''
+    (owner, nbytes, owns_buffer, in_size) for an instance of _buffer_types()
+    or _BUFFER_OWNER_TYPES, or None if the buffer is no longer accessible
+    (released memoryview, closed mmap);
+    in_size is whether sys.getsizeof(obj) already counts the buffer
+    '''
+    try:
+        if isinstance(obj, memoryview):
+            return _buffer_owner(obj), obj.nbytes, False, False
+        if isinstance(obj, (bytes, bytearray)):
+            return obj, len(obj), True, True
+        if isinstance(obj, array.array):
+            return obj, len(obj) * obj.itemsize, True, True
+        if isinstance(obj, mmap.mmap):
+            return obj, len(obj), True, False
+    except ValueError:
+        return None
+    # numpy.ndarray; __sizeof__ only includes the data when the array owns it
+    if obj.flags.owndata:
+        return obj, obj.nbytes, True, True
+    return _buffer_owner(obj), obj.nbytes, False, False
+
+
 def _format_frame_trace(frame):
     frameinfo = inspect.getframeinfo(frame)
     context = ''
@@ -72,6 +330,26 @@ def _finalize_wal(conn):
     conn.commit()
 
 
+def _db_size_bytes(conn):
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def _copy_memory_db(conn, path):
+    '''
+    write the in-memory db conn to path in one sequential pass:
+    VACUUM INTO where sqlite supports it (3.27+), the backup API otherwise
+    '''
+    conn.commit()
+    if sqlite3.sqlite_version_info >= (3, 27):
+        conn.execute("VACUUM INTO ?", (path,))
+        return
+    disk_conn = sqlite3.connect(path)
+    try:
+        conn.backup(disk_conn)
+    finally:
+        disk_conn.close()
+
+
 class _Writer:
     '''
     responsible for dumping objects
@@ -86,9 +364,22 @@ class _Writer:
     _TRACKED_TYPES = (types.ModuleType, types.FrameType, types.FunctionType, types.CodeType)
     _COMMIT_INTERVAL_OBJECTS = 10000
 
-    def __init__(self, conn, use_gc=False):
+    def __init__(self, conn, use_gc=False, young_generations=None):
         self.conn = conn
         self.use_gc = use_gc
+        # {id(obj): generation} for objects that had not yet reached generation 2
+        self.young_generations = young_generations or {}
+        # ids of the permanent generation (see _unfreeze_gc), None if it was not unfrozen
+        self.frozen_ids = None
+        self.freeze_count = gc.get_freeze_count()
+        self.is_tracing = tracemalloc.is_tracing()
+        self.traceback_id_map = {}  # map of tracemalloc frame tuples to alloc_traceback rowids
+        self.buffer_types = _buffer_types()
+        self.buffer_object_ids = set()  # object rowids already in the buffer table
+        self.future_types = _future_types()
+        self.type_finalizer_map = {}  # map of type ids to whether instances have a finalizer
+        # _gc_prep() ran with gc.DEBUG_UNCOLLECTABLE so this is what it could not free
+        self.garbage_ids = {id(e) for e in gc.garbage}
         gc.collect()  # try to minimize garbage
         # track these to separate out "extra" objects that are generated as part of
         # the object walking process
@@ -107,38 +398,100 @@ class _Writer:
         # ignore ids not just to avoid analysis noise, but because these can
         # get pretty big over time, don't want to waste DB space
         ignored = list(self.__dict__.values()) + list(self.tracked_t_id_map.values())
+        if not isinstance(conn, sqlite3.Connection):  # streaming to a collector
+            ignored += [conn.__dict__] + list(conn.__dict__.values())
         self.ignore_ids = {id(e) for e in ignored}
         self.ignore_ids.add(id(self.ignore_ids))
         self.ignore_ids.add(id(self.__dict__))
         self.ignore_ids.add(id(self))
         self._objects_since_commit = 0
+        # RAM staging (see write_to_path memory_budget_mb): conn is :memory: until it
+        # outgrows memory_budget_bytes, then it is copied to spill_path and writing continues there
+        self.spill_path = None
+        self.memory_budget_bytes = None
         # commented out tracing code
         # TODO how to put it in w/out hurting perf if off?
         # (maybe optional decorators?)
         # self.times = []
 
     @classmethod
-    def write_to_path(cls, path, use_gc=False, use_wal=True):
-        '''create a new instance that will dump state to path (which shouldn't exist)'''
-        conn = sqlite3.connect(path)
-        conn.text_factory = str
+    def write_to_path(cls, path, use_gc=False, use_wal=True, thread_count=None, trigger=None,
+                      memory_budget_mb=None, forked=False):
+        '''
+        create a new instance that will dump state to path (which shouldn't exist);
+        a unix:///path or tcp://host:port path streams the dump to an objex collect receiver
+
+        thread_count overrides the recorded OS thread count; a forked child
+        only has one thread, so spawn_dump() counts them in the parent;
+        forked says this process is a child forked for the dump, whose gc state
+        may be changed to find out exactly which objects gc.freeze() had frozen
+
+        trigger is recorded in meta to say why the dump was taken
+
+        with memory_budget_mb the dump is built in an in-memory db, skipping fsync and
+        page cache costs during the walk, and written to path in one pass at the end;
+        if it grows past the budget it spills to path and finishes there
+        '''
+        staged = memory_budget_mb is not None and _parse_collector_address(path) is None
+        if staged:
+            conn = sqlite3.connect(':memory:')
+            conn.text_factory = str
+        elif _parse_collector_address(path) is None:
+            conn = sqlite3.connect(path)
+            conn.text_factory = str
+        else:
+            conn = _StreamConnection(path, getfqdn(), os.getpid())  # the receiver creates the schema
+        writer = None
         try:
-            if use_wal:
-                conn.execute("PRAGMA journal_mode = WAL")
-            _run_ddl(conn, _SCHEMA)
+            if isinstance(conn, sqlite3.Connection):
+                if use_wal and not staged:
+                    conn.execute("PRAGMA journal_mode = WAL")
+                _run_ddl(conn, _SCHEMA)
             memory = _get_memory_mb()
+            young_generations = _young_gc_generations()
             num_collected = _gc_prep()
+            young_generations = _drop_freed_ids(young_generations)
             conn.execute(
                 """
-                INSERT INTO meta (id, pid, hostname, memory_mb, gc_info, num_gcd_objects)
-                VALUES (0, ?, ?, ?, ?, ?)
+                INSERT INTO meta (
+                    id, pid, hostname, memory_mb, gc_info, num_gcd_objects, gc_freeze_count, thread_count,
+                    tracemalloc_frames, trigger)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                (os.getpid(), getfqdn(), memory, '[{},{},{}]'.format(*gc.get_count()), num_collected))
+                (
+                    0, os.getpid(), getfqdn(), memory, '[{},{},{}]'.format(*gc.get_count()),
+                    num_collected, gc.get_freeze_count(),
+                    _get_thread_count() if thread_count is None else thread_count,
+                    tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+                    trigger))
+            conn.executemany(
+                "INSERT INTO memory_map (pathname, kind, region_count, size_kb, rss_kb, private_dirty_kb, anonymous_kb,"
+                " start_address, end_address) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                _get_memory_map())
+            size_classes, malloc_stats = _parse_debugmallocstats(_capture_debugmallocstats())
+            conn.executemany(
+                "INSERT INTO pymalloc_size_class (size_class, block_size, num_pools, blocks_in_use, avail_blocks)"
+                " VALUES (?, ?, ?, ?, ?)",
+                size_classes)
+            conn.executemany("INSERT INTO pymalloc_stat (name, value) VALUES (?, ?)", malloc_stats)
+            # set after construction: a young_generations= keyword would sit in the kwargs
+            # dict type.__call__ builds, which the gc.get_objects() snapshot keeps alive and dumps
+            frozen_ids = _unfreeze_gc() if forked else None
             writer = cls(conn, use_gc=use_gc)
+            writer.young_generations = young_generations
+            writer.ignore_ids.add(id(young_generations))
+            if frozen_ids is not None:
+                writer.frozen_ids = frozen_ids
+                writer.ignore_ids.add(id(frozen_ids))
+            if staged:
+                writer.spill_path = path
+                writer.memory_budget_bytes = memory_budget_mb * 1024 * 1024
             writer.add_all()
             writer.finish()
         except Exception:
             conn.close()
+            if writer is not None and writer.conn is not conn:  # spilled
+                writer.conn.close()
             raise
 
     def execute(self, sql, params):
@@ -156,6 +509,20 @@ class _Writer:
         if self._objects_since_commit >= self._COMMIT_INTERVAL_OBJECTS:
             self.conn.commit()
             self._objects_since_commit = 0
+            if self.spill_path is not None and _db_size_bytes(self.conn) > self.memory_budget_bytes:
+                self.spill()
+
+    def spill(self):
+        '''
+        move a RAM-staged dump to spill_path; everything written so far goes out in one
+        sequential copy and the rest of the walk continues on disk with WAL
+        '''
+        _copy_memory_db(self.conn, self.spill_path)
+        self.conn.close()
+        self.conn = sqlite3.connect(self.spill_path)
+        self.conn.text_factory = str
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.spill_path = None
 
     def _ensure_db_id(self, obj, is_type=False, refs=0):
         '''
@@ -179,10 +546,24 @@ class _Writer:
         refcount = sys.getrefcount(obj) - (refs + 1)
         in_gc_objects = id(obj) in self.all_object_ids
         is_gc_tracked = in_gc_objects or gc.is_tracked(obj)
+        if in_gc_objects:
+            if self.frozen_ids is not None and id(obj) in self.frozen_ids:
+                gc_generation = 3
+            else:
+                gc_generation = self.young_generations.get(id(obj), 2)
+        elif is_gc_tracked and self.freeze_count and self.frozen_ids is None:
+            # gc.get_objects() does not include the permanent generation; without
+            # unfreezing it, objects the walk itself created are counted in too
+            gc_generation = 3
+        else:
+            gc_generation = None
+        alloc_traceback_id = self._alloc_traceback_id(obj) if self.is_tracing else None
         self.execute(
             """
-            INSERT INTO object (id, pytype, size, len, refcount, in_gc_objects, is_gc_tracked)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO object (
+                id, pytype, size, len, refcount, in_gc_objects, is_gc_tracked, gc_generation, address, alloc_traceback,
+                in_gc_garbage, has_finalizer)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 obj_id,
@@ -191,7 +572,12 @@ class _Writer:
                 length,
                 refcount,
                 in_gc_objects,
-                is_gc_tracked)
+                is_gc_tracked,
+                gc_generation,
+                id(obj),
+                alloc_traceback_id,
+                id(obj) in self.garbage_ids,
+                is_gc_tracked and self._has_finalizer(obj_type))
             )
         # all of these are pretty rare (maybe optimize?)
         if id(obj) not in self.type_id_map and (is_type or isinstance(obj, type)):
@@ -208,8 +594,94 @@ class _Writer:
         elif type(obj) in self.tracked_t_id_map:
             # ^ expected to be False > 99% of time
             self._handle_tracked_type(obj, obj_id)
+        elif isinstance(obj, self.buffer_types):
+            self._add_buffer(obj, obj_id)
         return obj_id
 
+    def _add_buffer(self, obj, obj_id):
+        '''
+        record which object owns the data buffer obj exposes, so the analysis
+        step can attribute each buffer once no matter how many views share it
+
+        plain bytes / bytearray / array.array are only recorded when they
+        back a view; on their own sys.getsizeof() already counts their data
+        '''
+        if obj_id in self.buffer_object_ids:
+            return
+        self.buffer_object_ids.add(obj_id)
+        buffer_info = _buffer_info(obj)
+        if buffer_info is None:
+            return
+        owner, nbytes, owns_buffer, in_size = buffer_info
+        del buffer_info
+        owner_id = self._ensure_db_id(owner, refs=1)
+        self.execute(
+            "INSERT INTO buffer (object, owner, nbytes, owns_buffer, in_size) VALUES (?, ?, ?, ?, ?)",
+            (obj_id, owner_id, nbytes, owns_buffer, in_size))
+        if owner is not obj and isinstance(owner, _BUFFER_OWNER_TYPES + self.buffer_types):
+            self._add_buffer(owner, owner_id)
+
+    def _add_lru_cache(self, obj, obj_id):
+        '''record functools.lru_cache hit / miss statistics'''
+        try:
+            hits, misses, maxsize, currsize = obj.cache_info()
+        except Exception:
+            return
+        self.execute(
+            "INSERT INTO lru_cache (object, hits, misses, maxsize, currsize) VALUES (?, ?, ?, ?, ?)",
+            (obj_id, hits, misses, maxsize, currsize))
+
+    def _add_suspended_frame(self, frame):
+        '''
+        frames of suspended generators and coroutines are only materialized
+        when asked for, so they are not in self.all_objects; walk them here
+        or the locals they keep alive would be missing from the graph
+        '''
+        if frame is not None:
+            self.add_obj(frame, refs=2)
+
+    def _add_asyncio_task(self, obj, obj_id, coro):
+        '''record which coroutine an asyncio Task drives and whether it is done'''
+        coro_name = getattr(coro, '__qualname__', None) or type(coro).__name__
+        self.execute(
+            "INSERT INTO asyncio_task (object, coro_obj_id, coro_name, state) VALUES (?, ?, ?, ?)",
+            (obj_id, self._ensure_db_id(coro, refs=2), coro_name, obj._state))
+
+    def _has_finalizer(self, obj_type):
+        '''
+        whether instances of obj_type run __del__ (or a C tp_finalize) when freed,
+        which delays freeing any reference cycle they are part of
+        '''
+        try:
+            return self.type_finalizer_map[id(obj_type)]
+        except KeyError:
+            pass
+        try:
+            has_finalizer = any('__del__' in type_.__dict__ for type_ in obj_type.__mro__)
+        except Exception:
+            has_finalizer = False
+        self.type_finalizer_map[id(obj_type)] = has_finalizer
+        return has_finalizer
+
+    def _alloc_traceback_id(self, obj):
+        '''
+        row id of the (deduplicated) tracemalloc traceback where obj was allocated,
+        or None if tracemalloc did not see the allocation
+        '''
+        traceback = tracemalloc.get_object_traceback(obj)
+        if traceback is None:
+            return None
+        # tracemalloc orders frames oldest to most recent
+        frames = tuple((frame.filename, frame.lineno) for frame in traceback)
+        if frames in self.traceback_id_map:
+            return self.traceback_id_map[frames]
+        traceback_id = self.traceback_id_map[frames] = len(self.traceback_id_map)
+        filename, lineno = frames[-1]
+        self.execute(
+            "INSERT INTO alloc_traceback (id, filename, lineno, trace) VALUES (?, ?, ?, ?)",
+            (traceback_id, filename, lineno, '\n'.join(traceback.format())))
+        return traceback_id
+
     def _handle_tracked_type(self, obj, obj_id):
         '''
         after creating the row in the object table, handle creating another
@@ -304,6 +776,12 @@ class _Writer:
                 extra_relationship = set
             elif isinstance(obj, frozenset):
                 extra_relationship = frozenset
+            elif isinstance(obj, weakref.ReferenceType):  # KeyedRef, WeakMethod
+                extra_relationship = weakref.ReferenceType
+            elif isinstance(obj, _LRU_CACHE_WRAPPER_TYPE):
+                extra_relationship = _LRU_CACHE_WRAPPER_TYPE
+            elif isinstance(obj, self.future_types):  # asyncio Future / Task
+                extra_relationship = _FUTURE_TYPE
         # STEP 2 - GET KEYS
         if extra_relationship is dict:
             keys = obj.keys()
@@ -365,9 +843,67 @@ class _Writer:
                     "INSERT INTO reference (src, dst, ref) VALUES (?, ?, ?)",
                     (db_id, module, ".__module__"))
             check_dict = True
+        elif extra_relationship is weakref.ReferenceType:
+            # '~()' marks a weak edge; the explorer skips these when looking for
+            # what keeps an object alive
+            # (ReferenceType.__call__ bypasses e.g. WeakMethod building a new bound method)
+            referent = weakref.ReferenceType.__call__(obj)
+            if referent is not None:
+                key_dst.append(('~()', referent))
+            del referent
+            key_dst.append(('.__callback__', obj.__callback__))
+        elif extra_relationship is _LRU_CACHE_WRAPPER_TYPE:
+            # the cache dict and the entries of a bounded cache's linked list are only
+            # visible to the gc; the wrapped function comes from __dict__['__wrapped__']
+            for referent in gc.get_referents(obj):
+                if type(referent) is dict:
+                    if referent is not object.__getattribute__(obj, '__dict__'):
+                        key_dst.append(('.<cache>', referent))
+                        self.add_obj(referent, refs=2)
+                elif not isinstance(referent, (type, types.FunctionType)) and type(referent) is not object:
+                    key_dst.append(('.<cache entry>', referent))
+            referent = None
+            self._add_lru_cache(obj, db_id)
+        elif extra_relationship is memoryview:
+            try:
+                key_dst.append(('.obj', obj.obj))
+            except ValueError:
+                pass  # released
         elif extra_relationship is types.GeneratorType:
             key_dst.append(('.gi_code', obj.gi_code))
             key_dst.append(('.gi_frame', obj.gi_frame))
+            self._add_suspended_frame(obj.gi_frame)
+        elif extra_relationship is types.CoroutineType:
+            key_dst.append(('.cr_code', obj.cr_code))
+            key_dst.append(('.cr_frame', obj.cr_frame))
+            key_dst.append(('.cr_await', obj.cr_await))
+            self._add_suspended_frame(obj.cr_frame)
+        elif extra_relationship is types.AsyncGeneratorType:
+            key_dst.append(('.ag_code', obj.ag_code))
+            key_dst.append(('.ag_frame', obj.ag_frame))
+            key_dst.append(('.ag_await', obj.ag_await))
+            self._add_suspended_frame(obj.ag_frame)
+        elif extra_relationship is _FUTURE_TYPE:
+            # the C implementation keeps these in struct fields rather than a __dict__;
+            # _callbacks builds a new list of (callback, context) on every access,
+            # so link straight to its items
+            for attr in ('_loop', '_result', '_exception', '_fut_waiter', '_coro'):
+                try:
+                    key_dst.append(('.' + attr, object.__getattribute__(obj, attr)))
+                except AttributeError:
+                    pass
+            for callback, context in obj._callbacks or ():
+                key_dst.append(('.<callback>', callback))
+                key_dst.append(('.<callback context>', context))
+            callback = context = None
+            try:
+                coro = object.__getattribute__(obj, '_coro')
+            except AttributeError:
+                pass
+            else:
+                if coro is not None:
+                    self._add_asyncio_task(obj, db_id, coro)
+                del coro
         elif extra_relationship is types.MethodType:
             key_dst += [
                 ('.__func__', obj.__func__),
@@ -456,16 +992,23 @@ class _Writer:
 
     def add_frames(self):
         '''
-        add all of the current frames
+        add all of the current frames and their locals; the stack taking the snapshot
+        starts at the frame that asked for the dump (or that the dump signal interrupted)
         '''
         cur_frames = sys._current_frames()
         ignore_cur = sys._getframe()
         for thread_id, frame in cur_frames.items():
             if frame is ignore_cur:
-                continue  # don't log the stack that is taking the snapshot
+                while frame is not None and frame.f_code.co_filename == __file__:
+                    frame = frame.f_back  # don't log objex's own frames
+                if frame is None:
+                    continue
             self.conn.execute(
                 "INSERT INTO thread (stack_obj_id, thread_id) VALUES (?, ?)",
                 (self._ensure_db_id(frame, refs=2), thread_id))
+            while frame is not None:
+                self.add_obj(frame, refs=2)
+                frame = frame.f_back
 
     def add_all(self):
         # ignore this frame to avoid a bunch of spurious data
@@ -495,33 +1038,48 @@ class _Writer:
         self.conn.execute(
             "UPDATE meta SET duration_s = ?",
             (time.time() - self.started,))
-        _finalize_wal(self.conn)
+        if self.spill_path is not None:  # still staged in memory
+            _copy_memory_db(self.conn, self.spill_path)
+        elif isinstance(self.conn, sqlite3.Connection):
+            _finalize_wal(self.conn)
         self.conn.close()
 
 
+# stand-in extra_relationship for asyncio.Future and its subclasses (see _future_types)
+_FUTURE_TYPE = object()
+
+
 # special types that have special-handling code for discovering contents
 _SPECIAL_TYPES = set([
     dict, list, tuple, set, frozenset, types.FrameType, types.FunctionType,
-    types.GeneratorType, types.MethodType,
+    types.GeneratorType, types.CoroutineType, types.AsyncGeneratorType, types.MethodType,
     _DICT_PROXY_TYPE, classmethod, staticmethod, property,
     types.BuiltinFunctionType, types.BuiltinMethodType,
-    types.ModuleType, collections.deque, collections.defaultdict])
+    types.ModuleType, collections.deque, collections.defaultdict, memoryview,
+    weakref.ReferenceType])
 
 
-def dump_graph(path, print_info=False, use_gc=False):
+def dump_graph(path, print_info=False, use_gc=False, thread_count=None, trigger=None, memory_budget_mb=None,
+               forked=False):
     '''
     dump a collection db to path;
     the collection db is designed to be small
     and write fast, so it needs post-processing
     to e.g. add indices and compute values
     before analysis
+
+    memory_budget_mb stages the dump in RAM (see _Writer.write_to_path),
+    which helps most when path is on a slow or network-attached disk;
+    forked is for spawn_dump(), whose child may have its gc state changed
     '''
     start = time.time()
-    _Writer.write_to_path(path, use_gc=use_gc)
+    _Writer.write_to_path(
+        path, use_gc=use_gc, thread_count=thread_count, trigger=trigger, memory_budget_mb=memory_budget_mb,
+        forked=forked)
     if print_info:
         duration = time.time() - start
         memory = _get_memory_mb()
-        dumpsize = os.stat(path).st_size / 1024.0 / 1024  # MiB
+        dumpsize = 0.0 if _parse_collector_address(path) else os.stat(path).st_size / 1024.0 / 1024  # MiB
         objects = len(gc.get_objects())
         print("process memory usage: {:0.3f}MiB".format(memory))
         print("total gc objects:", objects)
@@ -539,16 +1097,175 @@ def dump_graph(path, print_info=False, use_gc=False):
     return
 
 
-def spawn_dump(path, print_info=False, use_gc=False):
+def _histogram_type_name(t):
+    module = getattr(t, '__module__', None)
+    name = getattr(t, '__qualname__', None) or t.__name__
+    if module in (None, 'builtins'):
+        return name
+    return '{}.{}'.format(module, name)
+
+
+def type_histogram(path=None):
+    '''
+    count gc tracked objects and sum their sys.getsizeof() by type in one pass
+    over gc.get_objects(), with no fork and nothing else recorded;
+    returns {type name: (count, size)}
+
+    with path the snapshot is appended to the time series sqlite file there
+    (created as needed), for `python -m objex watch` and the web growth chart;
+    cheap enough to run every minute where a full dump is not
+    '''
+    start = time.time()
+    counts = collections.Counter()
+    sizes = collections.Counter()
+    for obj in gc.get_objects():
+        counts[type(obj)] += 1
+        sizes[type(obj)] += sys.getsizeof(obj, 0)
+    obj = None
+    histogram = {}
+    for t, count in counts.items():
+        name = _histogram_type_name(t)
+        prev_count, prev_size = histogram.get(name, (0, 0))  # same-named types are merged
+        histogram[name] = (prev_count + count, prev_size + sizes[t])
+    counts = sizes = None
+    if path is not None:
+        conn = sqlite3.connect(path)
+        try:
+            _run_ddl(conn, _HISTOGRAM_SCHEMA)
+            snapshot = conn.execute(
+                "INSERT INTO histogram_snapshot (ts, pid, hostname, rss_mb, object_count, total_size, duration_s)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (start, os.getpid(), getfqdn(), _get_rss_mb(),
+                 sum(count for count, _ in histogram.values()), sum(size for _, size in histogram.values()),
+                 time.time() - start)).lastrowid
+            conn.executemany(
+                "INSERT INTO type_histogram (snapshot, type_name, count, size) VALUES (?, ?, ?, ?)",
+                [(snapshot, name, count, size) for name, (count, size) in histogram.items()])
+            conn.commit()
+        finally:
+            conn.close()
+    return histogram
+
+
+# per-row costs for estimate_dump(), fitted by tests/benchmark_dump_estimate.py
+# (CPython 3.11, linux, local disk); rerun it to recalibrate on another platform,
+# they only need to get the order of magnitude right
+_EST_OBJECT_ROW_BYTES = 30
+_EST_REFERENCE_ROW_BYTES = 21
+_EST_OBJECT_ROW_S = 4.5e-6
+_EST_REFERENCE_ROW_S = 0.85e-6
+
+
+class DumpRefused(RuntimeError):
+    '''spawn_dump() declined to start because the estimate exceeded a limit'''
+    def __init__(self, reason, estimate):
+        super().__init__(reason)
+        self.reason = reason
+        self.estimate = estimate
+
+
+def _free_disk_mb(path):
+    directory = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+    return shutil.disk_usage(directory).free / 1024.0 / 1024
+
+
+def estimate_dump(path='.', use_gc=False, sample_size=1000):
+    '''
+    predict what dumping this process to path (a file or directory) will cost
+    without writing anything: returns a dict of object_count, reference_count,
+    dump_mb, duration_s and free_disk_mb
+
+    the gc tracked objects are counted exactly; untracked referents (str, int, ...)
+    and references are extrapolated from a random sample of sample_size of them
+
+    an untracked referent is one row however many objects refer to it, so each
+    sampled reference to one counts as 1 / its refcount of it; that undercounts
+    referents also held by untracked containers (e.g. tuples of strs) or C code
+    '''
+    all_objects = gc.get_objects()
+    tracked_count = len(all_objects)
+    sample = random.sample(all_objects, min(sample_size, tracked_count))
+    del all_objects
+    referent_count = 0
+    untracked_share = 0.0
+    for obj in sample:
+        referents = gc.get_referents(obj)
+        referent_count += len(referents)
+        for referent in referents:
+            if not gc.is_tracked(referent):
+                # not counting the references from referents, referent and getrefcount()'s argument
+                untracked_share += 1.0 / max(sys.getrefcount(referent) - 3, 1)
+    sample = obj = referents = referent = None
+    scale = tracked_count / float(max(sample_size, 1)) if tracked_count > sample_size else 1.0
+    object_count = int(tracked_count + untracked_share * scale)
+    reference_count = int(referent_count * scale)
+    row_count = reference_count
+    if use_gc:
+        row_count *= 3  # gc_referrer and gc_referent mirror the reference table
+    return {
+        'object_count': object_count,
+        'reference_count': reference_count,
+        'dump_mb': (object_count * _EST_OBJECT_ROW_BYTES + row_count * _EST_REFERENCE_ROW_BYTES) / 1024.0 / 1024,
+        'duration_s': object_count * _EST_OBJECT_ROW_S + row_count * _EST_REFERENCE_ROW_S,
+        'free_disk_mb': _free_disk_mb(path),
+    }
+
+
+def _dump_refusal(estimate, max_dump_mb=None, max_duration_s=None, min_free_disk_mb=None):
+    '''the reason a dump matching estimate should not start, or None'''
+    if max_dump_mb is not None and estimate['dump_mb'] > max_dump_mb:
+        return 'estimated dump size {:0.1f}MiB exceeds max_dump_mb={}'.format(estimate['dump_mb'], max_dump_mb)
+    if max_duration_s is not None and estimate['duration_s'] > max_duration_s:
+        return 'estimated dump duration {:0.1f}s exceeds max_duration_s={}'.format(
+            estimate['duration_s'], max_duration_s)
+    if min_free_disk_mb is not None and estimate['free_disk_mb'] - estimate['dump_mb'] < min_free_disk_mb:
+        return 'dump would leave {:0.1f}MiB free on disk, less than min_free_disk_mb={}'.format(
+            estimate['free_disk_mb'] - estimate['dump_mb'], min_free_disk_mb)
+    return None
+
+
+def _check_dump_limits(path, use_gc=False, max_dump_mb=None, max_duration_s=None, min_free_disk_mb=None):
+    '''raise DumpRefused if any limit is given and the estimated dump exceeds it'''
+    if (max_dump_mb, max_duration_s, min_free_disk_mb) != (None, None, None):
+        estimate = estimate_dump(path, use_gc=use_gc)
+        reason = _dump_refusal(estimate, max_dump_mb, max_duration_s, min_free_disk_mb)
+        if reason:
+            raise DumpRefused(reason, estimate)
+
+
+def spawn_dump(path, print_info=False, use_gc=False,
+               max_dump_mb=None, max_duration_s=None, min_free_disk_mb=None, trigger=None, nice=None,
+               memory_budget_mb=None):
+    '''
+    fork and dump the child's copy of the heap to path, returning the child pid
+    for wait_dump()
+
+    if any of max_dump_mb, max_duration_s or min_free_disk_mb is given the dump
+    is estimated first (see estimate_dump()) and DumpRefused raised instead of
+    forking when it would exceed them; nice is added to the child's niceness
+    so the dump competes less with the parent for CPU; memory_budget_mb is
+    passed on to dump_graph()
+
+    fork() only copies the calling thread, so that is the only thread whose stack
+    (and the locals on it) is in the dump; the other threads' frames only show up
+    if something else refers to them. install_signal_handler(), autodump() and
+    objex capture call this on the main thread for that reason
+    '''
     if not hasattr(os, 'fork'):
         raise NotImplementedError('spawn_dump() requires os.fork() support')
 
+    _check_dump_limits(path, use_gc, max_dump_mb, max_duration_s, min_free_disk_mb)
+
+    thread_count = _get_thread_count()
     pid = os.fork()
     if pid:
         return pid
 
     try:
-        dump_graph(path, print_info=print_info, use_gc=use_gc)
+        if nice:
+            os.nice(nice)
+        dump_graph(path, print_info=print_info, use_gc=use_gc, thread_count=thread_count, trigger=trigger,
+                   memory_budget_mb=memory_budget_mb, forked=True)
     except BaseException:
         os._exit(1)
     os._exit(0)
@@ -568,5 +1285,418 @@ def wait_dump(pid):
     raise RuntimeError('objex dump process {} ended unexpectedly'.format(pid))
 
 
+# per event loop [running dump count, asyncio.Condition] for dump_async()
+_ASYNC_DUMP_SLOTS = weakref.WeakKeyDictionary()
+# tasks reaping dump children killed when their dump_async() was cancelled
+_ASYNC_REAPERS = set()
+
+
+async def _wait_child_exit(loop, pid):
+    '''
+    wait for pid to exit without blocking loop: a pidfd becomes readable when the
+    child exits (linux 5.3+); elsewhere fall back to polling; returns os.wait4()
+    '''
+    import asyncio
+
+    pidfd = None
+    if hasattr(os, 'pidfd_open'):
+        try:
+            pidfd = os.pidfd_open(pid)
+        except OSError:
+            pass
+    if pidfd is None:
+        while True:
+            waited_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+            if waited_pid:
+                return waited_pid, status, rusage
+            await asyncio.sleep(0.05)
+    exited = loop.create_future()
+    loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+    return os.wait4(pid, 0)
+
+
+def _kill_child_later(loop, pid):
+    '''SIGKILL pid and reap it in the background, for callers that are being cancelled'''
+    os.kill(pid, signal.SIGKILL)
+    reaper = loop.create_task(_wait_child_exit(loop, pid))
+    _ASYNC_REAPERS.add(reaper)
+    reaper.add_done_callback(_ASYNC_REAPERS.discard)
+
+
+async def dump_async(path, timeout=None, priority=None, max_concurrent=1, use_gc=False, **spawn_kwargs):
+    '''
+    spawn_dump() and wait for it without blocking the running event loop
+
+    priority is added to the dump child's niceness (see spawn_dump()); at most
+    max_concurrent dumps started by dump_async() run at once on a loop, the
+    rest wait their turn; a child still running after timeout seconds (or when
+    the awaiting task is cancelled) is killed with SIGKILL; the estimate (if
+    max_dump_mb, max_duration_s or min_free_disk_mb is passed) runs in the loop's
+    default executor, the fork on the loop thread
+
+    returns a dict of path, pid, exit_code (None if killed by a signal),
+    signal, timed_out, truncated (the dump did not finish cleanly),
+    duration_s, size_mb and child_peak_rss_mb
+    '''
+    import asyncio
+
+    limits = {name: spawn_kwargs.pop(name, None) for name in ('max_dump_mb', 'max_duration_s', 'min_free_disk_mb')}
+    loop = asyncio.get_running_loop()
+    slots = _ASYNC_DUMP_SLOTS.get(loop)
+    if slots is None:
+        slots = _ASYNC_DUMP_SLOTS[loop] = [0, asyncio.Condition()]
+    condition = slots[1]
+    async with condition:
+        await condition.wait_for(lambda: slots[0] < max_concurrent)
+        slots[0] += 1
+    try:
+        start = time.time()
+        if any(limit is not None for limit in limits.values()):
+            await loop.run_in_executor(None, functools.partial(_check_dump_limits, path, use_gc, **limits))
+        pid = spawn_dump(path, use_gc=use_gc, nice=priority, **spawn_kwargs)
+        timed_out = False
+        try:
+            _, status, rusage = await asyncio.wait_for(_wait_child_exit(loop, pid), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            os.kill(pid, signal.SIGKILL)
+            _, status, rusage = await _wait_child_exit(loop, pid)
+        except asyncio.CancelledError:
+            _kill_child_later(loop, pid)
+            raise
+        duration_s = time.time() - start
+    finally:
+        async with condition:
+            slots[0] -= 1
+            condition.notify_all()
+    exit_code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else None
+    size = sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+    return {
+        'path': path,
+        'pid': pid,
+        'exit_code': exit_code,
+        'signal': os.WTERMSIG(status) if os.WIFSIGNALED(status) else None,
+        'timed_out': timed_out,
+        'truncated': exit_code != 0,
+        'duration_s': duration_s,
+        'size_mb': size / 1024.0 / 1024,
+        'child_peak_rss_mb': rusage.ru_maxrss / 1024.0,  # KiB on linux
+    }
+
+
+class _SignalDumper:
+    '''
+    signal handler installed by install_signal_handler() or _install_request_handler();
+    python runs it on the main thread between bytecodes
+    '''
+    def __init__(self, signum, path_template, min_interval_s, min_free_disk_mb,
+                 max_concurrent, spawn_kwargs):
+        self.signum = signum
+        self.path_template = path_template
+        self.min_interval_s = min_interval_s
+        self.min_free_disk_mb = min_free_disk_mb
+        self.max_concurrent = max_concurrent
+        self.spawn_kwargs = dict(spawn_kwargs)
+        self.spawn_kwargs.setdefault('trigger', 'signal {}'.format(signum))
+        self.hostname = getfqdn()  # may hit DNS, so not in the handler
+        self.previous_handler = None
+        self.last_started = None
+        self.active = {}  # map of running dump pids to their reaper threads
+        self.dumps = []  # (path, pid) for each dump started
+        self.skipped = []  # (timestamp, reason) for each signal that did not start a dump
+        self.results = {}  # map of pid to exit status (0 is success), or an error message
+        self.pending = None  # the request() waiting for the main thread
+        self.pending_lock = threading.Lock()
+        self.request_lock = threading.Lock()  # one request() at a time
+
+    def __call__(self, signum, frame):
+        with self.pending_lock:
+            request, self.pending = self.pending, None
+        if request is not None:
+            try:
+                request['pid'] = spawn_dump(request['path'], **request['spawn_kwargs'])
+            except Exception as e:
+                request['error'] = e
+            request['done'].set()
+            return
+        if self.path_template is None:  # only installed for request()
+            if callable(self.previous_handler):
+                self.previous_handler(signum, frame)
+            return
+        now = time.time()
+        # never raise into the interrupted code: a bad template, a missing directory
+        # (disk_usage), DumpRefused etc. are recorded as a skipped signal instead
+        try:
+            path = self.path_template.format(
+                hostname=self.hostname, pid=os.getpid(), seq=len(self.dumps),
+                timestamp=time.strftime('%Y%m%dT%H%M%S', time.localtime(now)))
+            reason = self._skip_reason(now, path)
+            if reason:
+                self.skipped.append((now, reason))
+                return
+            pid = spawn_dump(path, **self.spawn_kwargs)
+            self.last_started = now
+            self.dumps.append((path, pid))
+            reaper = threading.Thread(
+                target=self._reap, args=(pid,), name='objex-reaper-{}'.format(pid), daemon=True)
+            self.active[pid] = reaper
+            reaper.start()
+        except Exception as e:
+            self.skipped.append((now, repr(e)))
+
+    def _skip_reason(self, now, path):
+        if self.last_started is not None and now - self.last_started < self.min_interval_s:
+            return 'rate limited: last dump started {:0.1f}s ago'.format(now - self.last_started)
+        if len(self.active) >= self.max_concurrent:
+            return '{} dumps still running'.format(len(self.active))
+        if self.min_free_disk_mb is not None:
+            free_disk_mb = _free_disk_mb(path)
+            if free_disk_mb < self.min_free_disk_mb:
+                return 'only {:0.1f}MiB free on disk'.format(free_disk_mb)
+        return None
+
+    def _reap(self, pid):
+        try:
+            self.results[pid] = wait_dump(pid)
+        except RuntimeError as e:
+            self.results[pid] = str(e)
+        finally:
+            self.active.pop(pid, None)
+
+    def request(self, path, timeout=30, **spawn_kwargs):
+        '''
+        spawn_dump(path, **spawn_kwargs) on the main thread, from any thread, by
+        signalling the main thread; returns the child pid for the caller to reap,
+        raises what spawn_dump() raised, or RuntimeError if the main thread did not
+        get to run the handler within timeout (e.g. blocked in a long C call)
+        '''
+        if threading.current_thread() is threading.main_thread():
+            return spawn_dump(path, **spawn_kwargs)
+        if not threading.main_thread().is_alive():
+            raise RuntimeError('the main thread has exited')
+        request = {'path': path, 'spawn_kwargs': spawn_kwargs, 'done': threading.Event()}
+        with self.request_lock:
+            with self.pending_lock:
+                self.pending = request
+            signal.pthread_kill(threading.main_thread().ident, self.signum)
+            if not request['done'].wait(timeout):
+                with self.pending_lock:
+                    taken = self.pending is not request
+                    self.pending = None
+                if not taken:
+                    raise RuntimeError('the main thread did not handle signal {} within {}s'.format(
+                        self.signum, timeout))
+                request['done'].wait()  # the handler is already forking
+        if 'error' in request:
+            raise request['error']
+        return request['pid']
+
+    def wait(self, timeout=None):
+        '''wait for running dumps to finish; returns True if none are left'''
+        for reaper in list(self.active.values()):
+            reaper.join(timeout)
+        return not self.active
+
+    def uninstall(self):
+        signal.signal(self.signum, self.previous_handler)
+
+
+def install_signal_handler(signum=getattr(signal, 'SIGUSR1', None), path_template='objex-{hostname}-{pid}-{timestamp}.db',
+                           min_interval_s=300, min_free_disk_mb=1024, max_concurrent=1, **spawn_kwargs):
+    '''
+    spawn_dump() whenever the process receives signum (SIGUSR1 by default);
+    path_template is formatted with hostname, pid, timestamp and seq (dumps started so far)
+
+    a signal is ignored (and noted in the returned handler's skipped list) if a
+    dump started less than min_interval_s ago, if max_concurrent dumps are still
+    running or if less than min_free_disk_mb is free; spawn_kwargs (e.g. use_gc,
+    max_dump_mb) are passed on to spawn_dump()
+
+    must be called from the main thread; call .uninstall() on the result to
+    restore the previous handler
+    '''
+    if signum is None:
+        raise NotImplementedError('install_signal_handler() requires a signal number on this platform')
+    if not hasattr(os, 'fork'):
+        raise NotImplementedError('install_signal_handler() requires os.fork() support')
+    dumper = _SignalDumper(signum, path_template, min_interval_s, min_free_disk_mb, max_concurrent, spawn_kwargs)
+    dumper.previous_handler = signal.signal(signum, dumper)
+    return dumper
+
+
+# ignored by default, so a stray one is harmless once the handler is gone
+_REQUEST_SIGNAL = getattr(signal, 'SIGURG', None)
+
+
+def _install_request_handler():
+    '''
+    a _SignalDumper only serving request(), so other threads can have dumps forked
+    on the main thread; must be called from the main thread, .uninstall() when done
+    '''
+    if _REQUEST_SIGNAL is None or not hasattr(signal, 'pthread_kill'):
+        raise NotImplementedError('forking dumps on the main thread requires SIGURG and signal.pthread_kill()')
+    dumper = _SignalDumper(_REQUEST_SIGNAL, None, 0, None, 1, {})
+    dumper.previous_handler = signal.signal(_REQUEST_SIGNAL, dumper)
+    return dumper
+
+
+class _AutoDumper:
+    '''
+    background thread started by autodump(); it has main_thread (a request
+    handler) fork the dumps
+    '''
+    _SUFFIXES = ('', '-wal', '-shm')
+
+    def __init__(self, thresholds_mb, interval_s, keep, directory, path_template, max_disk_mb, spawn_kwargs):
+        self.thresholds_mb = sorted(thresholds_mb)
+        self.interval_s = interval_s
+        self.keep = keep
+        self.directory = directory
+        self.path_template = path_template
+        self.max_disk_mb = max_disk_mb
+        self.spawn_kwargs = spawn_kwargs
+        self.hostname = getfqdn()
+        self.main_thread = None  # _install_request_handler(), if not set dumps are forked from the watcher
+        self.next_threshold = 0  # index into thresholds_mb
+        self.running_pid = None
+        self.dumps = []  # (path, pid, trigger) for each dump started, oldest first
+        self.pruned = []  # paths deleted to stay within keep / max_disk_mb
+        self.results = {}  # map of pid to exit status (0 is success), or an error message
+        self.skipped = []  # (timestamp, reason) for each threshold spawn_dump() refused
+        self.errors = []  # (timestamp, error) for each poll that failed
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='objex-autodump', daemon=True)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:  # e.g. RSS unreadable or the dump path unwritable; keep watching
+                self.errors.append((time.time(), repr(e)))
+            if self.running_pid is None and self.next_threshold >= len(self.thresholds_mb):
+                return  # every threshold crossed and dumped
+            self.stop_event.wait(self.interval_s)
+
+    def _reap(self):
+        if self.running_pid is None:
+            return
+        try:
+            waited_pid, status = os.waitpid(self.running_pid, os.WNOHANG)
+        except ChildProcessError as e:  # reaped by someone else, e.g. a SIGCHLD handler
+            self.results[self.running_pid] = str(e)
+        else:
+            if not waited_pid:
+                return
+            if os.WIFEXITED(status):
+                self.results[waited_pid] = os.WEXITSTATUS(status)
+            else:
+                self.results[waited_pid] = 'terminated by signal {}'.format(os.WTERMSIG(status))
+        self.running_pid = None
+        self.prune()
+
+    def poll(self):
+        self._reap()
+        if self.running_pid is not None:
+            return  # one dump at a time
+        if self.next_threshold >= len(self.thresholds_mb):
+            return
+        rss_mb = _get_rss_mb()
+        threshold_mb = self.thresholds_mb[self.next_threshold]
+        if rss_mb < threshold_mb:
+            return
+        # one dump even if several thresholds were crossed since the last poll
+        while self.next_threshold < len(self.thresholds_mb) and self.thresholds_mb[self.next_threshold] <= rss_mb:
+            threshold_mb = self.thresholds_mb[self.next_threshold]
+            self.next_threshold += 1
+        trigger = 'rss {:0.1f}MiB >= {}MiB'.format(rss_mb, threshold_mb)
+        path = os.path.join(self.directory, self.path_template.format(
+            hostname=self.hostname, pid=os.getpid(), seq=len(self.dumps), threshold=threshold_mb,
+            timestamp=time.strftime('%Y%m%dT%H%M%S')))
+        spawn_kwargs = dict(self.spawn_kwargs)
+        if self.max_disk_mb is not None:
+            # a dump that cannot fit in max_disk_mb on its own is refused rather than pruned
+            spawn_kwargs['max_dump_mb'] = min(
+                self.max_disk_mb, spawn_kwargs.get('max_dump_mb') or self.max_disk_mb)
+        try:
+            if self.main_thread is not None:
+                pid = self.main_thread.request(path, trigger=trigger, **spawn_kwargs)
+            else:
+                pid = spawn_dump(path, trigger=trigger, **spawn_kwargs)
+        except DumpRefused as e:
+            self.skipped.append((time.time(), e.reason))
+            return
+        self.running_pid = pid
+        self.dumps.append((path, pid, trigger))
+
+    def prune(self):
+        '''
+        delete the oldest finished dumps beyond keep, or while they (with their
+        -wal and -shm files) exceed max_disk_mb; the newest dump is always kept
+        '''
+        finished = [path for path, pid, _ in self.dumps if pid != self.running_pid and os.path.exists(path)]
+
+        def disk_mb(path):
+            return sum(
+                os.path.getsize(path + suffix) for suffix in self._SUFFIXES if os.path.exists(path + suffix)
+            ) / 1024.0 / 1024
+
+        while len(finished) > 1 and (len(finished) > self.keep or (
+                self.max_disk_mb is not None and sum(disk_mb(path) for path in finished) > self.max_disk_mb)):
+            path = finished.pop(0)
+            for suffix in self._SUFFIXES:
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            self.pruned.append(path)
+
+    def stop(self, timeout=None):
+        '''
+        stop polling, waiting up to timeout for a running dump; returns True if none is left
+
+        called from the main thread, this also restores the previous SIGURG handler
+        '''
+        self.stop_event.set()
+        self.thread.join(timeout)
+        if self.main_thread is not None and threading.current_thread() is threading.main_thread():
+            self.main_thread.uninstall()
+            self.main_thread = None
+        if self.running_pid is not None:
+            deadline = None if timeout is None else time.time() + timeout
+            while self.running_pid is not None and (deadline is None or time.time() < deadline):
+                self._reap()
+                time.sleep(0.05)
+        return self.running_pid is None
+
+
+def autodump(thresholds_mb, interval_s=5, keep=3, directory='.',
+             path_template='objex-{hostname}-{pid}-{threshold}mb.db', max_disk_mb=None, **spawn_kwargs):
+    '''
+    poll RSS every interval_s seconds from a background thread and spawn_dump()
+    into directory each time it crosses the next of thresholds_mb, so the dump
+    is taken while memory is growing instead of after an OOM kill
+
+    only the newest keep dumps are kept (and older ones are also deleted while
+    the total exceeds max_disk_mb, a dump estimated to exceed it on its own is
+    refused, see spawn_dump()'s max_dump_mb); each dump's meta.trigger records the RSS and
+    threshold that caused it; path_template is formatted with hostname, pid,
+    threshold, seq and timestamp; spawn_kwargs are passed on to spawn_dump()
+
+    the watcher signals the main thread (SIGURG) to fork each dump, so must be
+    called from the main thread; errors while polling, including a main thread
+    that does not handle the signal in time, are recorded in .errors and polling
+    goes on; returns the watcher; call .stop() on it to stop polling
+    '''
+    if not hasattr(os, 'fork'):
+        raise NotImplementedError('autodump() requires os.fork() support')
+    dumper = _AutoDumper(thresholds_mb, interval_s, keep, directory, path_template, max_disk_mb, spawn_kwargs)
+    dumper.main_thread = _install_request_handler()
+    dumper.thread.start()
+    return dumper
+
+
 #f_globals INTEGER, -- object (a dict instance)  OR should this be a ref type e.g. locals["foo"], globals["bar"]
 #f_locals INTEGER, -- object (a dict instance)
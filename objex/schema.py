@@ -14,6 +14,10 @@ CREATE TABLE meta (
     memory_mb INTEGER NOT NULL,
     gc_info TEXT NOT NULL,
     num_gcd_objects INTEGER NOT NULL,
+    gc_freeze_count INTEGER, -- objects in the permanent generation (gc.freeze)
+    thread_count INTEGER, -- OS threads in the dumped process
+    tracemalloc_frames INTEGER, -- tracemalloc traceback limit, NULL if it was not tracing
+    trigger TEXT, -- why the dump was taken (autodump threshold, signal), NULL when requested directly
     duration_s REAL
 );
 
@@ -24,7 +28,12 @@ CREATE TABLE object (
     len INTEGER,
     refcount INTEGER NOT NULL,
     in_gc_objects INTEGER NOT NULL,
-    is_gc_tracked INTEGER NOT NULL
+    is_gc_tracked INTEGER NOT NULL,
+    gc_generation INTEGER, -- 0-2, 3 for the permanent generation, NULL if untracked
+    address INTEGER, -- id(obj), i.e. the memory address in CPython
+    alloc_traceback INTEGER, -- alloc_traceback id, if tracemalloc saw the allocation
+    in_gc_garbage INTEGER, -- in gc.garbage, i.e. the collector found it unreachable but could not free it
+    has_finalizer INTEGER -- gc tracked and its type defines __del__ (or tp_finalize)
 );
 
 CREATE TABLE pytype (
@@ -77,10 +86,43 @@ CREATE TABLE function (
     module_obj_id INTEGER -- object-id of module
 );
 
+CREATE TABLE alloc_traceback (  -- deduplicated tracemalloc.get_object_traceback() results
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL, -- most recent frame, i.e. the allocation site
+    lineno INTEGER NOT NULL,
+    trace TEXT NOT NULL -- full traceback, oldest frame first
+);
+
+CREATE TABLE buffer (  -- memoryviews, mmaps, numpy arrays and the objects whose buffers they expose
+    id INTEGER PRIMARY KEY,
+    object INTEGER NOT NULL,
+    owner INTEGER NOT NULL, -- object-id that allocated the buffer (may be object itself)
+    nbytes INTEGER NOT NULL, -- size of the buffer as seen through this object
+    owns_buffer INTEGER NOT NULL,
+    in_size INTEGER NOT NULL -- whether object.size (sys.getsizeof) already counts the buffer
+);
+
+CREATE TABLE lru_cache (  -- functools.lru_cache wrappers and their cache_info()
+    id INTEGER PRIMARY KEY,
+    object INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL,
+    maxsize INTEGER, -- NULL for an unbounded cache
+    currsize INTEGER NOT NULL
+);
+
+CREATE TABLE asyncio_task (  -- asyncio Tasks, empty unless the process had imported asyncio
+    id INTEGER PRIMARY KEY,
+    object INTEGER NOT NULL,
+    coro_obj_id INTEGER, -- object-id of the wrapped coroutine
+    coro_name TEXT NOT NULL, -- __qualname__ of the coroutine
+    state TEXT NOT NULL -- PENDING, CANCELLED or FINISHED
+);
+
 CREATE TABLE reference (
     src INTEGER NOT NULL, -- object
     dst INTEGER NOT NULL, -- object
-    ref TEXT NOT NULL -- keys *might* be okay
+    ref TEXT NOT NULL -- keys *might* be okay, '~()' is a weak reference (weakref.ref to its referent)
 );
 
 -- these are unlikely to be used, but an empty table
@@ -96,6 +138,38 @@ CREATE TABLE gc_referent (
     dst INTEGER NOT NULL
 );
 
+-- pymalloc state at dump time, parsed from sys._debugmallocstats()
+-- (both tables are empty when the interpreter is not using pymalloc)
+
+CREATE TABLE pymalloc_size_class (
+    size_class INTEGER PRIMARY KEY,
+    block_size INTEGER NOT NULL,
+    num_pools INTEGER NOT NULL,
+    blocks_in_use INTEGER NOT NULL,
+    avail_blocks INTEGER NOT NULL,
+    object_count INTEGER -- exported objects whose size falls in this class (filled in at analysis time)
+);
+
+CREATE TABLE pymalloc_stat (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL, -- e.g. "arenas allocated current", "bytes in allocated blocks"
+    value INTEGER NOT NULL
+);
+
+-- /proc/self/smaps summarized by pathname (linux only, empty elsewhere)
+CREATE TABLE memory_map (
+    id INTEGER PRIMARY KEY,
+    pathname TEXT NOT NULL, -- '' for anonymous mappings, [heap], [stack], ...
+    kind TEXT NOT NULL, -- anonymous, heap, stack, library, file, other
+    region_count INTEGER NOT NULL,
+    size_kb INTEGER NOT NULL,
+    rss_kb INTEGER NOT NULL,
+    private_dirty_kb INTEGER NOT NULL,
+    anonymous_kb INTEGER NOT NULL,
+    start_address INTEGER, -- lowest address of its regions
+    end_address INTEGER -- end of its highest region
+);
+
 CREATE TABLE object_mark (
     id INTEGER PRIMARY KEY,
     object INTEGER NOT NULL,
@@ -104,6 +178,31 @@ CREATE TABLE object_mark (
 '''
 
 
+# time series appended to by type_histogram(), kept in its own file apart from any dump
+_HISTOGRAM_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS histogram_snapshot (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL, -- time.time() when the snapshot was taken
+    pid INTEGER NOT NULL,
+    hostname TEXT NOT NULL,
+    rss_mb REAL NOT NULL,
+    object_count INTEGER NOT NULL, -- gc tracked objects
+    total_size INTEGER NOT NULL, -- sum of sys.getsizeof over them
+    duration_s REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS type_histogram (
+    snapshot INTEGER NOT NULL, -- histogram_snapshot id
+    type_name TEXT NOT NULL, -- module.qualname, builtins without the module
+    count INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS type_histogram_type_name ON type_histogram(type_name, snapshot);
+CREATE INDEX IF NOT EXISTS type_histogram_snapshot ON type_histogram(snapshot)
+'''
+
+
 # these indices are applied when switching from
 # "data-collection" mode to "analysis mode"
 _INDICES = '''
@@ -113,6 +212,13 @@ CREATE INDEX object_pytype ON object(pytype);
 CREATE INDEX object_size ON object(size);
 CREATE INDEX object_len ON object(len);
 CREATE INDEX object_all ON object(pytype, size, len);
+CREATE INDEX object_gc_generation ON object(gc_generation);
+CREATE INDEX object_alloc_traceback ON object(alloc_traceback);
+CREATE INDEX alloc_traceback_site ON alloc_traceback(filename, lineno);
+CREATE INDEX buffer_object ON buffer(object);
+CREATE INDEX buffer_owner ON buffer(owner);
+CREATE INDEX lru_cache_object ON lru_cache(object);
+CREATE INDEX asyncio_task_object ON asyncio_task(object);
 CREATE INDEX reference_src ON reference(src);
 CREATE INDEX reference_dst ON reference(dst);
 CREATE INDEX reference_ref ON reference(ref);
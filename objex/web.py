@@ -2,7 +2,7 @@ import json
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import parse_qs, urlparse
 
-from .explorer import PathFailure, Reader
+from .explorer import PathFailure, Reader, is_type_histogram_db, type_growth_data
 
 
 INDEX_HTML = """<!doctype html>
@@ -28,6 +28,11 @@ INDEX_HTML = """<!doctype html>
     <section id="outbound-panel" class="panel"></section>
   </main>
   <section id="discovery-panel" class="panel"></section>
+  <section id="alloc-sites-panel" class="panel"></section>
+  <section id="garbage-panel" class="panel"></section>
+  <section id="caches-panel" class="panel"></section>
+  <section id="tasks-panel" class="panel"></section>
+  <section id="fleet-panel" class="panel"></section>
   <section id="root-summary-panel" class="panel"></section>
   <section id="marks-panel" class="panel"></section>
   <section id="search-results" class="panel search-results"></section>
@@ -37,6 +42,91 @@ INDEX_HTML = """<!doctype html>
 """
 
 
+# served at / instead of INDEX_HTML when the db is a type_histogram() time series
+GROWTH_HTML = """<!doctype html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>objex type growth</title>
+  <link rel="stylesheet" href="/styles.css">
+</head>
+<body>
+  <header class="topbar">
+    <a class="brand" href="/">objex type growth</a>
+  </header>
+  <section id="summary" class="summary"></section>
+  <section id="message" class="message"></section>
+  <section id="growth-panel" class="panel"></section>
+  <script src="/growth.js"></script>
+</body>
+</html>
+"""
+
+
+GROWTH_JS = """function escapeHtml(value) {
+  return String(value ?? '').replace(/[&<>\\"]/g, ch => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '\\"': '&quot;'}[ch]));
+}
+
+function chartColor(index) {
+  const colors = ['#b76e23', '#3b5f8a', '#7d8f4e', '#8b4b72', '#c47f17', '#4d7a73', '#a6552f', '#6d6aa8'];
+  return colors[index % colors.length];
+}
+
+function renderGrowthChart(growth) {
+  const width = 800;
+  const height = 260;
+  const times = growth.snapshots.map(snapshot => snapshot.ts);
+  const start = Math.min(...times);
+  const span = Math.max(...times) - start || 1;
+  const maxSize = Math.max(1, ...growth.types.flatMap(item => item.sizes));
+  const x = ts => (ts - start) / span * width;
+  const y = size => height - size / maxSize * height;
+  const lines = growth.types.map((item, index) => {
+    const points = item.sizes.map((size, i) => `${x(times[i]).toFixed(1)},${y(size).toFixed(1)}`).join(' ');
+    return `<polyline fill="none" stroke="${chartColor(index)}" stroke-width="2" points="${points}"><title>${escapeHtml(item.type_name)}</title></polyline>`;
+  }).join('');
+  return `<svg class="growth-chart" viewBox="0 0 ${width} ${height}" width="100%" height="${height}" preserveAspectRatio="none" aria-label="type size over time">${lines}</svg>`;
+}
+
+function renderGrowth(growth) {
+  const el = document.getElementById('growth-panel');
+  if (!growth.snapshots.length) {
+    el.innerHTML = '<h2>Type Growth</h2><p>No snapshots yet.</p>';
+    return;
+  }
+  const first = growth.snapshots[0];
+  const last = growth.snapshots[growth.snapshots.length - 1];
+  document.getElementById('summary').innerHTML = `
+    <div class="summary-meta">
+      <span class="summary-chip">${growth.snapshots.length.toLocaleString()} snapshots</span>
+      <span class="summary-chip">${new Date(first.ts * 1000).toLocaleString()} to ${new Date(last.ts * 1000).toLocaleString()}</span>
+      <span class="summary-chip">RSS ${first.rss_mb.toFixed(1)} to ${last.rss_mb.toFixed(1)} MiB</span>
+    </div>
+  `;
+  el.innerHTML = `
+    <h2>Type Growth (total sys.getsizeof)</h2>
+    ${renderGrowthChart(growth)}
+    <ul class="refs">
+      ${growth.types.map((item, index) => `<li><span class="edge" style="color: ${chartColor(index)}">${item.size_delta >= 0 ? '+' : ''}${item.size_delta.toLocaleString()} bytes</span>${escapeHtml(item.type_name)} <span class="type">${item.count_delta >= 0 ? '+' : ''}${item.count_delta.toLocaleString()} objects, ${item.counts[item.counts.length - 1].toLocaleString()} now</span></li>`).join('')}
+    </ul>
+  `;
+}
+
+async function init() {
+  const response = await fetch('/api/type-growth?limit=8');
+  const payload = await response.json();
+  if (!response.ok) {
+    document.getElementById('message').textContent = payload.error;
+    return;
+  }
+  renderGrowth(payload);
+}
+
+init();
+"""
+
+
 APP_JS = """const state = { currentObjectId: null, loadingCount: 0 };
 
 function escapeHtml(value) {
@@ -116,7 +206,11 @@ function renderSummary(summary) {
       <span class="summary-chip">${escapeHtml(summary.timestamp)}</span>
       <span class="summary-chip">${summary.object_count.toLocaleString()} objects</span>
       <span class="summary-chip">${summary.memory_mb.toFixed(1)} MiB RSS</span>
+      ${summary.thread_count != null ? `<span class="summary-chip">${summary.thread_count} threads</span>` : ''}
+      ${summary.trigger ? `<span class="summary-chip">triggered by ${escapeHtml(summary.trigger)}</span>` : ''}
       <span class="summary-chip">${(summary.visible_memory_fraction * 100).toFixed(1)}% visible</span>
+      ${summary.pymalloc_overhead_fraction != null ? `<span class="summary-chip" title="${summary.pymalloc_arena_mb.toFixed(1)} MiB in pymalloc arenas">${(summary.pymalloc_overhead_fraction * 100).toFixed(1)}% pymalloc overhead</span>` : ''}
+      ${summary.gc_garbage_count ? `<span class="summary-chip">${summary.gc_garbage_count.toLocaleString()} uncollectable (${summary.gc_garbage_mb.toFixed(1)} MiB)</span>` : ''}
     </div>
   `;
 }
@@ -203,7 +297,7 @@ function renderPercentStackedBar(title, items, valueKey, labelKey = 'label') {
     const visibleText = `${item.value.toFixed(1)}% ${item.label}`;
     const estimatedWidth = Math.max(8, visibleText.length * 0.75);
     const text = width >= estimatedWidth ? `<text x="${x + 1.2}%" y="50%" text-anchor="start" dominant-baseline="middle" class="stacked-bar-text">${escapeHtml(visibleText)}</text>` : '';
-    const targetAttrs = chartTargetAttrs(item, 'label');
+    const targetAttrs = chartTargetAttrs(item, labelKey);
     const openTag = targetAttrs ? `<a class="stacked-bar-segment" ${targetAttrs}>` : '<g>';
     const closeTag = targetAttrs ? '</a>' : '</g>';
     const segment = `
@@ -282,17 +376,39 @@ function renderTopTypeMemoryBar(summary, topTypes) {
   `;
 }
 
-function renderDiscovery(summary, topTypes, largestObjects) {
+function renderGenerationSplit(generations) {
+  return (generations || []).map(item => `<span class="type">${escapeHtml(item.generation)} ${item.memory_percent.toFixed(1)}%</span>`).join('');
+}
+
+function renderPinnedArenas(pinnedArenas) {
+  const summary = pinnedArenas.summary;
+  if (!summary) {
+    return '';
+  }
+  return `
+      <div>
+        <h3>Pinned Arenas</h3>
+        <div class="subtle">${summary.pinned_arena_count.toLocaleString()} of ${summary.arena_count.toLocaleString()} arenas nearly empty, holding ${summary.pinned_mb.toFixed(1)} MiB (arenas estimated from object addresses)</div>
+        <ul class="refs">
+          ${pinnedArenas.items.length ? pinnedArenas.items.map(item => `<li>${objectLink({id: item.type_id, label: `<type ${item.name}#${item.type_id}>`})} <span class="type">${item.object_count.toLocaleString()} objects</span> <span class="edge">${item.arena_count.toLocaleString()} arenas</span></li>`).join('') : '<li class="empty">No pinned arenas</li>'}
+        </ul>
+      </div>
+  `;
+}
+
+function renderDiscovery(summary, topTypes, largestObjects, mostReferenced, generations, pinnedArenas) {
   document.getElementById('discovery-panel').innerHTML = `
     <h2>Discovery</h2>
     <div class="stacked-bars">
       ${renderTopTypeMemoryBar(summary, topTypes)}
+      ${renderPercentStackedBar('Memory By GC Generation', generations.items, 'memory_percent', 'generation')}
+      ${renderPercentStackedBar('RSS Breakdown', summary.rss_breakdown || [], 'percent')}
     </div>
     <div class="discovery-grid">
       <div>
         <h3>Top Types</h3>
         <ul class="refs">
-          ${topTypes.items.map(item => `<li>${objectLink({id: item.type_id, label: `<type ${item.name}#${item.type_id}>`})} <span class="type">${item.instance_count.toLocaleString()} instances</span> <span class="edge">${item.memory_percent.toFixed(1)}%</span></li>`).join('')}
+          ${topTypes.items.map(item => `<li>${objectLink({id: item.type_id, label: `<type ${item.name}#${item.type_id}>`})} <span class="type">${item.instance_count.toLocaleString()} instances</span> <span class="edge">${item.memory_percent.toFixed(1)}%</span>${renderGenerationSplit(item.generations)}</li>`).join('')}
         </ul>
       </div>
       <div>
@@ -301,10 +417,122 @@ function renderDiscovery(summary, topTypes, largestObjects) {
           ${largestObjects.items.map(item => `<li>${objectLink(item.object)} <span class="type">${escapeHtml(item.object.typequalname)}</span> <span class="edge">${item.size} bytes</span></li>`).join('')}
         </ul>
       </div>
+      <div>
+        <h3>Most Referenced</h3>
+        <ul class="refs">
+          ${mostReferenced.items.map(item => `<li>${objectLink(item.object)} <span class="type">${escapeHtml(item.object.typequalname)}</span> <span class="edge">${item.count.toLocaleString()} referrers</span></li>`).join('')}
+        </ul>
+      </div>
+      ${renderPinnedArenas(pinnedArenas)}
     </div>
   `;
 }
 
+function renderAllocSites(allocSites) {
+  const el = document.getElementById('alloc-sites-panel');
+  if (!allocSites.items.length) {
+    el.innerHTML = '';
+    return;
+  }
+  el.innerHTML = `
+    <h2>Top Allocation Sites</h2>
+    <div class="discovery-grid">
+      <div>
+        <h3>By Site</h3>
+        <ul class="refs">
+          ${allocSites.items.map(item => `<li><span class="edge">${item.size.toLocaleString()} bytes</span>${escapeHtml(item.site)} <span class="type">${item.object_count.toLocaleString()} objects</span></li>`).join('')}
+        </ul>
+      </div>
+      <div>
+        <h3>By Site And Type</h3>
+        <ul class="refs">
+          ${allocSites.by_type.map(item => `<li><span class="edge">${item.size.toLocaleString()} bytes</span>${escapeHtml(item.site)} <span class="type">${item.object_count.toLocaleString()} ${escapeHtml(item.name)}</span></li>`).join('')}
+        </ul>
+      </div>
+    </div>
+  `;
+}
+
+function renderGarbage(garbage) {
+  const el = document.getElementById('garbage-panel');
+  if (!garbage.items.length && !garbage.finalizer_cycles.length) {
+    el.innerHTML = '';
+    return;
+  }
+  const summary = garbage.summary;
+  const cycleList = items => `
+    <ul class="refs">
+      ${items.map(item => `<li><span class="edge">${item.size.toLocaleString()} bytes</span><span class="type">${item.object_count.toLocaleString()} objects, ${item.finalizer_count.toLocaleString()} with finalizers</span> ${item.members.map(objectLink).join(' ')}</li>`).join('')}
+    </ul>
+  `;
+  el.innerHTML = `
+    ${garbage.items.length ? `
+      <h2>Garbage The Collector Could Not Free</h2>
+      <div class="subtle">${summary.garbage_count.toLocaleString()} objects (${summary.garbage_size.toLocaleString()} bytes) in gc.garbage or cycles with it</div>
+      ${cycleList(garbage.items)}
+    ` : ''}
+    ${garbage.finalizer_cycles.length ? `
+      <h2>Cycles With Finalizers</h2>
+      <div class="subtle">${summary.finalizer_cycle_count.toLocaleString()} cycles (${summary.finalizer_cycle_size.toLocaleString()} bytes), most of them still reachable; they are freed once their finalizers have run</div>
+      ${cycleList(garbage.finalizer_cycles)}
+    ` : ''}
+  `;
+}
+
+function renderCaches(caches) {
+  const el = document.getElementById('caches-panel');
+  if (!caches.items.length) {
+    el.innerHTML = '';
+    return;
+  }
+  el.innerHTML = `
+    <h2>Caches</h2>
+    <ul class="refs">
+      ${caches.items.map(item => `<li><span class="edge">${item.transitive_size.toLocaleString()} bytes</span>${objectLink({id: item.object.id, label: item.name})} <span class="type">${escapeHtml(item.kind)}, ${(item.entry_count ?? 0).toLocaleString()} entries</span>${item.lru_cache_info ? ` <span class="type">${item.lru_cache_info.hits.toLocaleString()} hits / ${item.lru_cache_info.misses.toLocaleString()} misses, maxsize ${item.lru_cache_info.maxsize ?? 'unbounded'}</span>` : ''}</li>`).join('')}
+    </ul>
+  `;
+}
+
+function renderTasks(tasks) {
+  const el = document.getElementById('tasks-panel');
+  if (!tasks.items.length) {
+    el.innerHTML = '';
+    return;
+  }
+  el.innerHTML = `
+    <h2>Pending asyncio Tasks</h2>
+    <ul class="refs">
+      ${tasks.items.map(item => `<li><span class="edge">${item.transitive_size.toLocaleString()} bytes</span>${escapeHtml(item.coro_name)} <span class="type">${item.pending_count.toLocaleString()} pending of ${item.task_count.toLocaleString()} tasks, ${item.transitive_count.toLocaleString()} objects</span> ${item.tasks.map(objectLink).join(' ')}</li>`).join('')}
+    </ul>
+  `;
+}
+
+function renderFleet(fleet) {
+  const el = document.getElementById('fleet-panel');
+  if (!fleet.processes.length) {
+    el.innerHTML = '';
+    return;
+  }
+  el.innerHTML = `
+    <h2>Processes</h2>
+    <ul class="refs">
+      ${fleet.processes.map(item => `<li><span class="edge">${item.private_size.toLocaleString()} private bytes</span>#${item.process} pid ${item.pid} <span class="type">${escapeHtml(item.hostname)}, ${item.object_count.toLocaleString()} objects, ${item.private_count.toLocaleString()} private</span></li>`).join('')}
+    </ul>
+    ${fleet.outliers.length ? `<h3>Outlier Processes</h3>
+    <ul class="refs">
+      ${fleet.outliers.map(item => `<li><span class="edge">${item.private_size.toLocaleString()} bytes vs median ${Math.round(item.median_private_size).toLocaleString()}</span>#${item.process} pid ${item.pid} <span class="type">${item.types.map(type => `${escapeHtml(type.name)} +${Math.round(type.excess_size).toLocaleString()} bytes`).join(', ')}</span></li>`).join('')}
+    </ul>` : ''}
+    ${fleet.partial_types.length ? `<h3>Types In Only Some Processes</h3>
+    <ul class="refs">
+      ${fleet.partial_types.map(item => `<li><span class="edge">${item.object_count.toLocaleString()} objects</span>${escapeHtml(item.name)} <span class="type">in #${item.processes.join(', #')}</span></li>`).join('')}
+    </ul>` : ''}
+    <h3>Instances Per Process</h3>
+    <ul class="refs">
+      ${fleet.type_counts.map(item => `<li><span class="edge">${escapeHtml(item.name)}</span><span class="type">${item.counts.map(count => count.toLocaleString()).join(' / ')}</span></li>`).join('')}
+    </ul>
+  `;
+}
+
 function renderRootSummaryLoading(sampleSize) {
   document.getElementById('root-summary-panel').innerHTML = `
     <h2>Sampled Root Summary</h2>
@@ -407,6 +635,8 @@ function renderObjectPanel(obj) {
       <dt>Size</dt><dd>${obj.size}</dd>
       <dt>Refcount</dt><dd>${escapeHtml(obj.refcount_display ?? String(obj.refcount))}</dd>
       <dt>Len</dt><dd>${obj.len ?? ''}</dd>
+      ${obj.buffer ? `<dt>Buffer</dt><dd>${obj.buffer.nbytes} bytes, ${obj.buffer.owns_buffer ? 'owned' : `owned by <a class="object-link" href="/?id=${encodeURIComponent(obj.buffer.owner)}" data-object-id="${obj.buffer.owner}">#${obj.buffer.owner}</a>`}</dd>` : ''}
+      ${obj.alloc_traceback ? `<dt>Allocated</dt><dd><pre class="alloc-trace">${escapeHtml(obj.alloc_traceback)}</pre></dd>` : ''}
     </dl>
   `;
 }
@@ -422,13 +652,14 @@ function renderMarksPanel(marksPayload) {
 }
 
 function renderRefs(elementId, title, data, objectFirst = false, extraHtml = '') {
+  const keyNote = data.dict_key_count ? `, a key in ${data.dict_key_count} dicts` : '';
   const items = data.items.map(item => `
     <li>
       ${objectFirst ? `${objectLink(item.object)} <span class="edge">${escapeHtml(item.ref)}</span>` : `<span class="edge">${escapeHtml(item.ref)}</span> ${objectLink(item.object)}`}
     </li>
   `).join('');
   document.getElementById(elementId).innerHTML = `
-    <h2>${title} (${data.count})</h2>
+    <h2>${title} (${data.count}${keyNote})</h2>
     <ul class="refs">${items || '<li class="empty">No entries</li>'}</ul>
     ${extraHtml}
   `;
@@ -489,12 +720,13 @@ function renderPathGroup(title, items, targetObject) {
   `;
 }
 
-function renderPaths(modulePaths, framePaths, targetObject) {
+function renderPaths(modulePaths, framePaths, threadPaths, targetObject) {
   return `
     <div class="paths-section">
     <h3>Root Paths</h3>
     ${renderPathGroup('Module Paths', modulePaths.items, targetObject)}
     ${renderPathGroup('Frame Paths', framePaths.items, targetObject)}
+    ${renderPathGroup('Thread Stack Paths', threadPaths.items, targetObject)}
     </div>
   `;
 }
@@ -525,12 +757,13 @@ function setLoading(isLoading) {
 async function loadObject(id, pushState = true) {
   try {
     setMessage('');
-    const [obj, referents, referrers, modulePaths, framePaths, marks] = await Promise.all([
+    const [obj, referents, referrers, modulePaths, framePaths, threadPaths, marks] = await Promise.all([
       fetchJson(`/api/object?id=${encodeURIComponent(id)}`),
       fetchJson(`/api/referents?id=${encodeURIComponent(id)}&limit=100`),
       fetchJson(`/api/referrers?id=${encodeURIComponent(id)}&limit=100`),
       fetchJson(`/api/path-to-module?id=${encodeURIComponent(id)}&limit=10`),
       fetchJson(`/api/path-to-frame?id=${encodeURIComponent(id)}&limit=10`),
+      fetchJson(`/api/path-to-thread?id=${encodeURIComponent(id)}&limit=10`),
       fetchJson('/api/marks')
     ]);
     state.currentObjectId = obj.id;
@@ -543,7 +776,7 @@ async function loadObject(id, pushState = true) {
       'Inbound References',
       referrers,
       true,
-      renderPaths(modulePaths, framePaths, obj),
+      renderPaths(modulePaths, framePaths, threadPaths, obj),
     );
     if (pushState) {
       history.pushState({ id: obj.id }, '', `/?id=${obj.id}`);
@@ -578,13 +811,26 @@ async function loadRootSummary(sampleSize = 200, topN = 10) {
 }
 
 async function init() {
-  const [summary, topTypes, largestObjects] = await Promise.all([
+  const [summary, topTypes, largestObjects, mostReferenced, generations, pinnedArenas, allocSites, garbage, caches, tasks, fleet] = await Promise.all([
     fetchJson('/api/summary'),
     fetchJson('/api/top-types?limit=12'),
-    fetchJson('/api/largest-objects?limit=12')
+    fetchJson('/api/largest-objects?limit=12'),
+    fetchJson('/api/most-referenced?limit=12'),
+    fetchJson('/api/generations'),
+    fetchJson('/api/pinned-arenas?limit=12'),
+    fetchJson('/api/alloc-sites?limit=12'),
+    fetchJson('/api/garbage?limit=12'),
+    fetchJson('/api/caches?limit=12'),
+    fetchJson('/api/tasks?limit=12'),
+    fetchJson('/api/fleet?limit=12')
   ]);
   renderSummary(summary);
-  renderDiscovery(summary, topTypes, largestObjects);
+  renderDiscovery(summary, topTypes, largestObjects, mostReferenced, generations, pinnedArenas);
+  renderAllocSites(allocSites);
+  renderGarbage(garbage);
+  renderCaches(caches);
+  renderTasks(tasks);
+  renderFleet(fleet);
   loadRootSummary();
   showLandingPage();
 
@@ -813,6 +1059,11 @@ body.landing-mode .layout {
 }
 body.object-mode #discovery-panel,
 body.object-mode #root-summary-panel,
+body.object-mode #alloc-sites-panel,
+body.object-mode #garbage-panel,
+body.object-mode #caches-panel,
+body.object-mode #tasks-panel,
+body.object-mode #fleet-panel,
 body.object-mode #marks-panel {
   display: none;
 }
@@ -922,6 +1173,12 @@ body.landing-mode #search-results:empty {
   grid-template-columns: auto 1fr;
   gap: 0.35rem 0.75rem;
 }
+.alloc-trace {
+  margin: 0;
+  font-size: 0.8rem;
+  white-space: pre-wrap;
+  word-break: break-all;
+}
 .object-label {
   font-family: ui-monospace, monospace;
   font-weight: 700;
@@ -976,7 +1233,17 @@ def dispatch_request(db_path, path):
     parsed = urlparse(path)
     query = parse_qs(parsed.query)
     if parsed.path == '/':
+        if is_type_histogram_db(db_path):
+            return 200, 'text/html; charset=utf-8', GROWTH_HTML.encode('utf-8')
         return 200, 'text/html; charset=utf-8', INDEX_HTML.encode('utf-8')
+    if parsed.path == '/growth.js':
+        return 200, 'application/javascript; charset=utf-8', GROWTH_JS.encode('utf-8')
+    if parsed.path == '/api/type-growth':
+        try:
+            return 200, 'application/json; charset=utf-8', _json_bytes(type_growth_data(
+                db_path, limit=_int_param(query, 'limit', 10), last=_int_param(query, 'last', None)))
+        except Exception as exc:
+            return 400, 'application/json; charset=utf-8', _json_bytes({'error': str(exc)})
     if parsed.path == '/app.js':
         return 200, 'application/javascript; charset=utf-8', APP_JS.encode('utf-8')
     if parsed.path == '/styles.css':
@@ -993,9 +1260,11 @@ def dispatch_request(db_path, path):
             if parsed.path == '/api/random':
                 return 200, 'application/json; charset=utf-8', _json_bytes({'id': reader.random_object_id()})
             if parsed.path == '/api/object':
-                return 200, 'application/json; charset=utf-8', _json_bytes(
-                    reader.object_summary(_required_int(query, 'id'))
-                )
+                obj_id = _required_int(query, 'id')
+                payload = reader.object_summary(obj_id)
+                payload['alloc_traceback'] = reader.obj_alloc_traceback(obj_id)
+                payload['buffer'] = reader.obj_buffer(obj_id)
+                return 200, 'application/json; charset=utf-8', _json_bytes(payload)
             if parsed.path == '/api/mark':
                 reader.mark_object(
                     _required_int(query, 'id'),
@@ -1023,13 +1292,46 @@ def dispatch_request(db_path, path):
                     {'items': reader.type_search_data(query_text, limit=_int_param(query, 'limit', 20))}
                 )
             if parsed.path == '/api/top-types':
+                kwargs = {}
+                if query.get('generation'):
+                    kwargs['generation'] = _generation_param(query, 'generation')
+                return 200, 'application/json; charset=utf-8', _json_bytes(
+                    {'items': reader.top_types_data(limit=_int_param(query, 'limit', 20), **kwargs)}
+                )
+            if parsed.path == '/api/alloc-sites':
+                return 200, 'application/json; charset=utf-8', _json_bytes(
+                    reader.alloc_sites_data(limit=_int_param(query, 'limit', 20))
+                )
+            if parsed.path == '/api/caches':
+                return 200, 'application/json; charset=utf-8', _json_bytes(
+                    reader.caches_data(limit=_int_param(query, 'limit', 20))
+                )
+            if parsed.path == '/api/tasks':
+                return 200, 'application/json; charset=utf-8', _json_bytes(
+                    reader.tasks_data(limit=_int_param(query, 'limit', 20))
+                )
+            if parsed.path == '/api/fleet':
+                return 200, 'application/json; charset=utf-8', _json_bytes(
+                    reader.fleet_data(limit=_int_param(query, 'limit', 20))
+                )
+            if parsed.path == '/api/garbage':
+                return 200, 'application/json; charset=utf-8', _json_bytes(
+                    reader.uncollectable_data(limit=_int_param(query, 'limit', 20))
+                )
+            if parsed.path == '/api/pinned-arenas':
                 return 200, 'application/json; charset=utf-8', _json_bytes(
-                    {'items': reader.top_types_data(limit=_int_param(query, 'limit', 20))}
+                    reader.pinned_arenas_data(limit=_int_param(query, 'limit', 20))
                 )
+            if parsed.path == '/api/generations':
+                return 200, 'application/json; charset=utf-8', _json_bytes(reader.generations_data())
             if parsed.path == '/api/largest-objects':
                 return 200, 'application/json; charset=utf-8', _json_bytes(
                     {'items': reader.largest_objects_data(limit=_int_param(query, 'limit', 20))}
                 )
+            if parsed.path == '/api/most-referenced':
+                return 200, 'application/json; charset=utf-8', _json_bytes(
+                    {'items': reader.most_referenced_objects_data(limit=_int_param(query, 'limit', 20))}
+                )
             if parsed.path == '/api/root-summary':
                 return 200, 'application/json; charset=utf-8', _json_bytes(
                     reader.sampled_root_summary_data(
@@ -1051,6 +1353,13 @@ def dispatch_request(db_path, path):
                         limit=_int_param(query, 'limit', 20),
                     )}
                 )
+            if parsed.path == '/api/path-to-thread':
+                return 200, 'application/json; charset=utf-8', _json_bytes(
+                    {'items': reader.path_to_thread_data(
+                        _required_int(query, 'id'),
+                        limit=_int_param(query, 'limit', 20),
+                    )}
+                )
             if parsed.path == '/api/go':
                 try:
                     raw_query = query.get('q') or query.get('path')
@@ -1084,6 +1393,15 @@ def _int_param(query, name, default):
     return int(values[0])
 
 
+def _generation_param(query, name):
+    value = _required_param(query, name)
+    if value == 'permanent':
+        return 3
+    if value == 'untracked':
+        return None
+    return int(value.replace('gen', ''))
+
+
 def make_handler(db_path):
     class ObjexWebHandler(BaseHTTPRequestHandler):
         def log_message(self, fmt, *args):
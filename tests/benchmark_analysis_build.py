@@ -0,0 +1,194 @@
+"""
+Benchmark the per-object analysis passes of make_analysis_db on a synthetic collection DB.
+
+    python tests/benchmark_analysis_build.py --objects 10000000
+
+Each pass is timed against the correlated-subquery SQL it replaced, on separate
+copies of the same DB with the pragmas of a fast build, and the results are
+checked to be identical. The class references are now added before the indices
+are built rather than after, so that pass is timed together with the index build.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from objex.dbutils import _run_ddl  # noqa: E402
+from objex.explorer import _add_class_references, _build_attributed_size_table, _tune_for_build  # noqa: E402
+from objex.schema import _INDICES, _SCHEMA  # noqa: E402
+
+
+def _legacy_add_class_references(conn):
+    conn.execute("""
+        INSERT INTO reference (src, dst, ref)
+        SELECT id, pytype, '__class__' FROM object
+        WHERE NOT EXISTS (
+            SELECT 1 FROM REFERENCE WHERE
+            src = object.id AND
+            dst = object.pytype AND
+            ref = '__class__'
+        )
+    """)
+
+
+def _legacy_build_attributed_size_table(conn):
+    conn.execute("DROP TABLE IF EXISTS object_attributed_size")
+    conn.execute(
+        "CREATE TABLE object_attributed_size (object INTEGER PRIMARY KEY, attributed_size INTEGER NOT NULL)")
+    conn.execute(
+        """
+        INSERT INTO object_attributed_size (object, attributed_size)
+        SELECT
+            object.id,
+            object.size
+            + COALESCE((
+                SELECT SUM(dict_object.size)
+                FROM reference
+                JOIN object AS dict_object ON dict_object.id = reference.dst
+                WHERE reference.src = object.id AND reference.ref = '.__dict__'
+            ), 0)
+            - CASE WHEN EXISTS (
+                SELECT 1 FROM reference
+                WHERE reference.dst = object.id AND reference.ref = '.__dict__'
+            ) THEN object.size ELSE 0 END
+            + COALESCE(buffer_charge.nbytes, 0)
+        FROM object
+        LEFT JOIN (
+            SELECT owner, max(nbytes) AS nbytes FROM buffer
+            GROUP BY owner HAVING max(in_size) = 0
+        ) AS buffer_charge ON buffer_charge.owner = object.id
+        """
+    )
+    conn.execute(
+        "CREATE INDEX object_attributed_size_size ON object_attributed_size(attributed_size)"
+    )
+
+
+def make_synthetic_collection_db(path, object_count, seed=0):
+    '''
+    a collection DB shaped like a dump: a few hundred types, a third of the
+    instances owning a __dict__, some already carrying a __class__ reference,
+    a sprinkling of shared buffers and ~3 plain references per object
+    '''
+    rand = random.Random(seed)
+    type_count = min(500, max(object_count // 100, 2))
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = OFF")
+    _run_ddl(conn, _SCHEMA)
+    conn.execute(
+        "INSERT INTO meta (pid, hostname, memory_mb, gc_info, num_gcd_objects) VALUES (1, 'synthetic', 0, '', 0)")
+    conn.executemany(
+        "INSERT INTO object (id, pytype, size, refcount, in_gc_objects, is_gc_tracked) VALUES (?, 1, 400, 1, 1, 1)",
+        ((i,) for i in range(1, type_count + 1)))
+    conn.executemany(
+        "INSERT INTO pytype (object, name) VALUES (?, ?)",
+        ((i, 'Type{}'.format(i)) for i in range(1, type_count + 1)))
+    dict_type = 2
+
+    def objects():
+        next_id = type_count + 1
+        while next_id <= object_count:
+            size = rand.choice((32, 48, 56, 64, 104, 232))
+            yield next_id, rand.randint(3, type_count) if type_count > 2 else 1, size
+            if rand.random() < 0.33 and next_id + 1 <= object_count:
+                yield next_id + 1, dict_type, rand.choice((232, 360, 640))
+                next_id += 1
+            next_id += 1
+
+    def references():
+        cursor = conn.execute("SELECT id, pytype FROM object WHERE id > ? ORDER BY id", (type_count,))
+        previous = None
+        for object_id, pytype in cursor:
+            if pytype == dict_type and previous is not None:
+                yield previous, object_id, '.__dict__'
+            else:
+                if rand.random() < 0.1:
+                    yield object_id, pytype, '__class__'
+                for _ in range(3):
+                    yield object_id, rand.randint(1, object_count), 'attr'
+            previous = object_id
+
+    conn.executemany(
+        "INSERT INTO object (id, pytype, size, refcount, in_gc_objects, is_gc_tracked)"
+        " VALUES (?, ?, ?, 1, 1, 1)", objects())
+    conn.executemany("INSERT INTO reference (src, dst, ref) VALUES (?, ?, ?)", list(references()))
+    conn.executemany(
+        "INSERT INTO buffer (object, owner, nbytes, owns_buffer, in_size) VALUES (?, ?, ?, 1, 0)",
+        ((i, i, 4096) for i in range(type_count + 1, object_count + 1, 1000)))
+    conn.commit()
+    conn.close()
+
+
+def _timed(path, build):
+    conn = sqlite3.connect(path)
+    try:
+        _tune_for_build(conn, cache_mb=1024)
+        start = time.time()
+        build(conn)
+        conn.commit()
+        return time.time() - start
+    finally:
+        conn.close()
+
+
+def _rows(path, query):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+
+def run(object_count, directory, print_info=True):
+    '''returns {pass name: (legacy seconds, current seconds)}, asserting both give the same rows'''
+    base_path = os.path.join(directory, 'synthetic.db')
+    make_synthetic_collection_db(base_path, object_count)
+    legacy_path, current_path = os.path.join(directory, 'legacy.db'), os.path.join(directory, 'current.db')
+    shutil.copy(base_path, legacy_path)
+    shutil.copy(base_path, current_path)
+    results = {}
+
+    def legacy_indices_and_class_references(conn):
+        _run_ddl(conn, _INDICES)
+        _legacy_add_class_references(conn)
+
+    def indices_and_class_references(conn):
+        _add_class_references(conn)
+        _run_ddl(conn, _INDICES)
+
+    for name, legacy, current, query in (
+        ('indices + classes', legacy_indices_and_class_references, indices_and_class_references,
+         "SELECT src, dst FROM reference WHERE ref = '__class__' ORDER BY src, dst"),
+        ('attributed sizes', _legacy_build_attributed_size_table, _build_attributed_size_table,
+         "SELECT object, attributed_size FROM object_attributed_size ORDER BY object"),
+    ):
+        results[name] = (_timed(legacy_path, legacy), _timed(current_path, current))
+        assert _rows(legacy_path, query) == _rows(current_path, query), name
+        if print_info:
+            print('{:<18} correlated {:8.2f}s   set-based {:8.2f}s   {:5.1f}x'.format(
+                name, results[name][0], results[name][1], results[name][0] / max(results[name][1], 1e-6)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--objects', type=int, default=10 * 1000 * 1000)
+    parser.add_argument('--dir', help='where to build the DBs (default: a temp dir, removed afterwards)')
+    args = parser.parse_args(argv)
+    if args.dir:
+        run(args.objects, args.dir)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            run(args.objects, directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
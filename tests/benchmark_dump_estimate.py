@@ -0,0 +1,96 @@
+"""
+Calibrate the per-row costs estimate_dump() uses to predict dump size and duration.
+
+    python tests/benchmark_dump_estimate.py --rows 1000000
+
+Dumps this process a few times, each with an extra heap that adds mostly object rows
+(distinct floats) or mostly reference rows (a list repeating one object), and fits
+bytes and seconds per object row and per reference row to the growth of the dump
+over a baseline dump by least squares. Prints the fitted values next to the
+_EST_* constants in objex/exporter.py.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from objex import exporter  # noqa: E402
+
+
+def _dump(path):
+    '''(object rows, reference rows, bytes, seconds) of one dump of this process'''
+    start = time.time()
+    if exporter.wait_dump(exporter.spawn_dump(path)) != 0:
+        raise RuntimeError('dump to {} failed'.format(path))
+    duration_s = time.time() - start
+    conn = sqlite3.connect(path)
+    try:
+        object_rows = conn.execute("SELECT count(*) FROM object").fetchone()[0]
+        reference_rows = conn.execute("SELECT count(*) FROM reference").fetchone()[0]
+    finally:
+        conn.close()
+    size = sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+    return object_rows, reference_rows, size, duration_s
+
+
+def _fit(samples):
+    '''least squares (per object row, per reference row) for [(object rows, reference rows, cost)]'''
+    oo = sum(o * o for o, _, _ in samples)
+    rr = sum(r * r for _, r, _ in samples)
+    orr = sum(o * r for o, r, _ in samples)
+    oc = sum(o * c for o, _, c in samples)
+    rc = sum(r * c for _, r, c in samples)
+    det = oo * rr - orr * orr
+    return (oc * rr - rc * orr) / det, (rc * oo - oc * orr) / det
+
+
+def run(row_count, directory, print_info=True):
+    '''returns {'object_row_bytes', 'reference_row_bytes', 'object_row_s', 'reference_row_s'}'''
+    baseline = _dump(os.path.join(directory, 'baseline.db'))
+    samples = []
+    for scale in (1, 2):
+        for name, make_heap in (
+            ('objects', lambda n: [float(i) for i in range(n)]),
+            ('references', lambda n: [None] * n),
+        ):
+            heap = make_heap(row_count * scale)
+            dump = _dump(os.path.join(directory, '{}-{}.db'.format(name, scale)))
+            del heap
+            samples.append(tuple(value - base for value, base in zip(dump, baseline)))
+            if print_info:
+                print('{:<10} x{}  +{:>9,} objects  +{:>9,} references  +{:8.1f}MiB  +{:6.2f}s'.format(
+                    name, scale, samples[-1][0], samples[-1][1], samples[-1][2] / 1024.0 / 1024, samples[-1][3]))
+    object_row_bytes, reference_row_bytes = _fit([(o, r, size) for o, r, size, _ in samples])
+    object_row_s, reference_row_s = _fit([(o, r, seconds) for o, r, _, seconds in samples])
+    results = {
+        'object_row_bytes': object_row_bytes,
+        'reference_row_bytes': reference_row_bytes,
+        'object_row_s': object_row_s,
+        'reference_row_s': reference_row_s,
+    }
+    if print_info:
+        for name, value in results.items():
+            print('_EST_{:<20} fitted {:<10.3g} current {:.3g}'.format(
+                name.upper(), value, getattr(exporter, '_EST_' + name.upper())))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000 * 1000)
+    parser.add_argument('--dir', help='where to write the dumps (default: a temp dir, removed afterwards)')
+    args = parser.parse_args(argv)
+    if args.dir:
+        run(args.rows, args.dir)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            run(args.rows, directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
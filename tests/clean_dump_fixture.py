@@ -1,8 +1,14 @@
 import argparse
+import asyncio
 import collections
+import functools
+import gc
+import itertools
+import mmap
 import re
 import threading
 import time
+import tracemalloc
 import types
 import weakref
 
@@ -10,12 +16,73 @@ from objex import dump_graph
 
 
 GO_NESTED = None
+WEAK_CACHE = None
+WEAK_ONLY_KEEPALIVE = None
+SHARED_BUFFER_SIZE = 1 << 16
+MAPPED_BUFFER_SIZE = 1 << 17
+PENDING_TASK_COUNT = 3
+PENDING_TASK_PAYLOAD_SIZE = 1 << 15
+
+
+_MEMO_CACHE = {}
+
+
+class LookupCache(dict):
+    pass
+
+
+LOOKUPS = LookupCache(answer=42)
+
+
+@functools.lru_cache(maxsize=8)
+def cached_range(value):
+    return list(range(value))
+
+
+async def handle_request(release, payload):
+    await release.wait()
+    return len(payload)
+
+
+async def finished_request():
+    return None
+
+
+def start_pending_tasks():
+    """leave a few tasks suspended on a loop that is not running"""
+    loop = asyncio.new_event_loop()
+    release = asyncio.Event()
+    tasks = [
+        loop.create_task(handle_request(release, bytearray(PENDING_TASK_PAYLOAD_SIZE)))
+        for _ in range(PENDING_TASK_COUNT)
+    ]
+    tasks.append(loop.create_task(finished_request()))
+    loop.run_until_complete(tasks[-1])
+    return loop, release, tasks
+
+
+def finish_pending_tasks(loop, release, tasks):
+    release.set()
+    loop.run_until_complete(asyncio.gather(*tasks))
+    loop.close()
 
 
 class LegacyA:
     pass
 
 
+class WeakOnlyTarget:
+    pass
+
+
+class FinalizerNode:
+    def __init__(self):
+        self.other = None
+
+    def __del__(self):
+        pass
+
+
 class SlotsA:
     __slots__ = ('a', '__weakref__')
 
@@ -104,6 +171,26 @@ def make_sample_objects():
     weak_set = weakref.WeakSet()
     weak_set.add(slots_c)
 
+    # itertools.repeat() state is not scraped, so the only edge the dump
+    # records into weak_only_target is the weak one from WEAK_CACHE
+    global WEAK_CACHE, WEAK_ONLY_KEEPALIVE
+    weak_only_target = WeakOnlyTarget()
+    WEAK_CACHE = weakref.WeakValueDictionary(target=weak_only_target)
+    WEAK_ONLY_KEEPALIVE = itertools.repeat(weak_only_target)
+
+    finalizer_a, finalizer_b = FinalizerNode(), FinalizerNode()
+    finalizer_a.other, finalizer_b.other = finalizer_b, finalizer_a
+    gc.garbage.append(LegacyA())
+
+    for value in (10, 20, 30, 10):
+        cached_range(value)
+    _MEMO_CACHE.update((value, [value] * 10) for value in range(50))
+
+    payload = bytes(SHARED_BUFFER_SIZE)
+    payload_views = [memoryview(payload), memoryview(payload)[:SHARED_BUFFER_SIZE // 2]]
+    anonymous_map = mmap.mmap(-1, MAPPED_BUFFER_SIZE)
+    map_view = memoryview(anonymous_map)
+
     global GO_NESTED
     GO_NESTED = types.SimpleNamespace(
         level1=types.SimpleNamespace(
@@ -125,6 +212,11 @@ def make_sample_objects():
         'bound_method': bound_method,
         'generator': generator,
         'weak_set': weak_set,
+        'finalizer_cycle': finalizer_a,
+        'payload': payload,
+        'payload_views': payload_views,
+        'anonymous_map': anonymous_map,
+        'map_view': map_view,
         'go_nested': GO_NESTED,
     }
 
@@ -141,18 +233,26 @@ def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('path')
     parser.add_argument('--use-gc', action='store_true')
+    parser.add_argument('--tracemalloc', action='store_true')
     args = parser.parse_args(argv)
 
+    if args.tracemalloc:
+        tracemalloc.start(5)
+
     stop_event = threading.Event()
     started = threading.Event()
     sample_objects = make_sample_objects()
+    # a per-call cache that no module can reach
+    scratch_lookups = LookupCache(request=1)
+    pending_tasks = start_pending_tasks()
     thread = threading.Thread(target=stacker, args=(stop_event, started), daemon=True)
     thread.start()
     assert started.wait(timeout=2)
     try:
-        assert sample_objects
+        assert sample_objects and scratch_lookups
         dump_graph(args.path, use_gc=args.use_gc)
     finally:
+        finish_pending_tasks(*pending_tasks)
         stop_event.set()
         thread.join(timeout=2)
 
@@ -1,12 +1,16 @@
 import collections
+import gc
 import json
 import os
 import re
 import shutil
+import signal
+import socket
 import sqlite3
 import subprocess
 import sys
 import tempfile
+import textwrap
 import threading
 import time
 import types
@@ -19,7 +23,12 @@ from io import StringIO
 import pytest
 import objex.__main__ as objex_main
 from objex import Reader, dump_graph, make_analysis_db, spawn_dump, wait_dump, Console
-from objex.explorer import InvalidDatabaseError
+from objex import estimate_dump, DumpRefused, install_signal_handler, autodump, dump_async, compress_dump
+from objex import type_histogram
+from objex.exporter import _get_rss_mb
+from objex.collector import _StreamConnection, make_server as make_collector_server
+from objex.archive import ArchiveReader
+from objex.explorer import InvalidDatabaseError, type_growth_data
 from objex.web import dispatch_request
 
 
@@ -110,14 +119,7 @@ class ObjexTests(unittest.TestCase):
 
         cls.shared_dump_path = cls.shared_base_path / 'shared.db'
         cls.shared_analysis_path = cls.shared_base_path / 'shared-analysis.db'
-        env = dict(os.environ)
-        env['PYTHONPATH'] = str(Path(__file__).resolve().parents[1])
-        subprocess.run(
-            [sys.executable, '-m', 'tests.clean_dump_fixture', str(cls.shared_dump_path)],
-            check=True,
-            cwd=Path(__file__).resolve().parents[1],
-            env=env,
-        )
+        cls.run_python('-m', 'tests.clean_dump_fixture', cls.shared_dump_path)
         make_analysis_db(str(cls.shared_dump_path), str(cls.shared_analysis_path))
 
     @classmethod
@@ -199,6 +201,14 @@ class ObjexTests(unittest.TestCase):
         shutil.copy2(self.shared_analysis_path, path)
         return path
 
+    @staticmethod
+    def run_python(*args):
+        '''run python with args in a subprocess that imports this checkout's objex and tests'''
+        root = Path(__file__).resolve().parents[1]
+        env = dict(os.environ)
+        env['PYTHONPATH'] = str(root)
+        return subprocess.run([sys.executable] + [str(arg) for arg in args], check=True, cwd=root, env=env)
+
     @pytest.mark.slow
     def test_dump_graph_and_make_analysis_db(self):
         gc_dump_path = Path(self.temp_dir.name) / 'objex-test-gc.db'
@@ -273,6 +283,339 @@ class ObjexTests(unittest.TestCase):
             assert reader.obj_attributed_size(legacy_instance_id) > reader.obj_size(legacy_instance_id)
             assert reader.obj_attributed_size(legacy_dict_id) == 0
 
+    def test_analysis_db_breaks_down_memory_by_gc_generation(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            generations = {gen for gen, _, _ in reader.cost_by_generation()}
+            assert 2 in generations
+            assert generations <= {0, 1, 2, 3, None}
+            assert reader.sql_val('SELECT gc_freeze_count FROM meta') is not None
+
+            old_types = reader.cost_by_type(limit=5, generation=2)
+            assert old_types
+            assert old_types[0][1] <= dict(
+                (name, count) for name, count, _ in reader.cost_by_type(limit=1000)
+            )[old_types[0][0]]
+
+            top_types = reader.top_types_data(limit=3)
+            assert all('generations' in item for item in top_types)
+            assert sum(gen['instance_count'] for gen in top_types[0]['generations']) == top_types[0]['instance_count']
+
+        status_code, _, body = dispatch_request(str(self.shared_analysis_path), '/api/generations')
+        assert status_code == 200
+        assert any(item['generation'] == 'gen2' for item in json.loads(body)['items'])
+
+        status_code, _, body = dispatch_request(
+            str(self.shared_analysis_path), '/api/top-types?limit=3&generation=gen2'
+        )
+        assert status_code == 200
+        assert json.loads(body)['items']
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_dump_records_exact_gc_generations_with_frozen_objects(self):
+        base_path = Path(self.temp_dir.name)
+        script_path = base_path / 'frozen.py'
+        script_path.write_text(textwrap.dedent("""
+            import gc, sys
+            from objex import spawn_dump, wait_dump
+
+            class Frozen: pass
+            class Old: pass
+            class Young: pass
+
+            frozen = [Frozen() for _ in range(10)]
+            gc.freeze()  # like a prefork server before forking its workers
+            old = [Old() for _ in range(10)]
+            for i, obj in enumerate(old):
+                obj.value = i  # the walk materializes a __dict__ for each of these
+            gc.collect()  # survivors move to the oldest generation
+            gc.disable()  # nothing promotes the young ones before the dump
+            young = [Young() for _ in range(10)]
+            wait_dump(spawn_dump(sys.argv[1]))
+        """))
+        dump_path = str(base_path / 'frozen.db')
+        self.run_python(script_path, dump_path)
+        analysis_path = str(base_path / 'frozen-analysis.db')
+        make_analysis_db(dump_path, analysis_path)
+
+        with Reader(analysis_path) as reader:
+            def generations(typename):
+                return {gen for gen, in reader.sql(
+                    'SELECT gc_generation FROM object WHERE pytype = (SELECT object FROM pytype WHERE name = ?)',
+                    (typename,))}
+
+            assert reader.sql_val('SELECT gc_freeze_count FROM meta') > 0
+            assert generations('Frozen') == {3}
+            assert generations('Old') == {2}
+            assert generations('Young') == {0}
+            # dicts the walk built after the snapshot are in no generation, not the frozen one
+            assert {gen for gen, in reader.sql(
+                "SELECT object.gc_generation FROM reference JOIN object ON object.id = reference.dst"
+                " WHERE reference.ref = '.__dict__' AND reference.src IN ("
+                " SELECT id FROM object WHERE pytype = (SELECT object FROM pytype WHERE name = 'Old'))")} == {None}
+
+    def test_analysis_db_reports_pymalloc_overhead(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            stats = reader.pymalloc_stats()
+            if not stats:
+                self.skipTest('interpreter is not using pymalloc')
+            assert stats['arenas allocated current'] > 0
+            assert stats['bytes in arenas'] >= stats['bytes in allocated blocks']
+
+            size_classes = reader.pymalloc_size_classes()
+            assert size_classes
+            assert sum(row[5] for row in size_classes) > 0
+
+            summary = reader.summary_stats()
+            assert summary['pymalloc_overhead_mb'] >= 0
+            assert 0 <= summary['pymalloc_overhead_fraction'] < 1
+
+    @unittest.skipUnless(os.path.exists('/proc/self/smaps'), 'requires /proc/self/smaps')
+    def test_analysis_db_breaks_down_rss_from_memory_map(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            regions = reader.memory_map(limit=1000)
+            kinds = {kind for _, kind, _, _, _, _ in regions}
+            assert 'library' in kinds
+            assert 'anonymous' in kinds or 'heap' in kinds
+
+            breakdown = dict(reader.rss_breakdown())
+            assert breakdown['python objects'] > 0
+            assert breakdown['shared libraries'] > 0
+            assert all(mb >= 0 for mb in breakdown.values())
+
+            summary = reader.summary_stats()
+            assert summary['thread_count'] >= 1
+            assert abs(sum(item['percent'] for item in summary['rss_breakdown']) - 100) < 0.01
+
+    def test_analysis_db_reports_types_pinning_sparse_arenas(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            assert reader.sql_val('SELECT count(*) FROM object WHERE address IS NULL') == 0
+            arena_size = reader.arena_size()
+            assert arena_size
+
+            summary = reader.arena_occupancy_summary(max_occupancy=1.0)
+            assert summary['arena_count'] > 0
+            assert summary['pinned_arena_count'] == summary['arena_count']
+            # statically allocated objects live in the interpreter's own mappings, not in arenas
+            static_count = reader.sql_val(
+                "SELECT count(*) FROM object WHERE size <= 512 AND EXISTS ("
+                " SELECT 1 FROM memory_map WHERE kind IN ('library', 'file')"
+                " AND object.address >= start_address AND object.address < end_address)"
+            )
+            if os.path.exists('/proc/self/smaps'):
+                assert static_count > 0
+            assert reader.sql_val('SELECT sum(object_count) FROM pymalloc_arena') == reader.sql_val(
+                'SELECT count(*) FROM object WHERE size <= 512'
+            ) - static_count
+
+            pinning = reader.pinned_arena_types(max_occupancy=1.0, limit=5)
+            assert pinning
+            assert all(reader.obj_is_type(type_id) for type_id, _, _ in pinning)
+
+        status_code, _, body = dispatch_request(
+            str(self.shared_analysis_path), '/api/pinned-arenas?limit=5'
+        )
+        assert status_code == 200
+        assert 'arena_count' in json.loads(body)['summary']
+
+    def test_analysis_db_attributes_shared_buffers_once(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            payload_views = reader.sql(
+                'SELECT object, owner FROM buffer WHERE owns_buffer = 0 AND owner IN '
+                '(SELECT object FROM buffer WHERE nbytes = ? AND owns_buffer = 1)',
+                (1 << 16,),
+            )
+            assert len(payload_views) == 2
+            payload_id = payload_views[0][1]
+            assert reader.obj_typename(payload_id) == 'bytes'
+            assert reader.obj_buffer(payload_id) == {'owner': payload_id, 'nbytes': 1 << 16, 'owns_buffer': True}
+            # bytes already count their data, so the views add nothing
+            assert reader.obj_attributed_size(payload_id) == reader.obj_size(payload_id)
+            for view_id, _ in payload_views:
+                assert reader.obj_typename(view_id) == 'memoryview'
+                assert reader.obj_attributed_size(view_id) == reader.obj_size(view_id)
+
+            map_id = reader.sql_val("SELECT owner FROM buffer WHERE nbytes = ? AND owns_buffer = 1", (1 << 17,))
+            assert reader.obj_typename(map_id) == 'mmap'
+            assert reader.obj_attributed_size(map_id) == reader.obj_size(map_id) + (1 << 17)
+            assert reader.largest_objects(limit=1) == [(reader.obj_attributed_size(map_id), map_id)]
+            assert (map_id, 1 << 17, 1) in reader.shared_buffers(limit=5)
+
+            visible_bytes = reader.visible_memory_fraction() * 1024 * 1024 * reader.sql_val('SELECT memory_mb FROM meta')
+            assert visible_bytes == pytest.approx(
+                reader.sql_val('SELECT sum(size) FROM object') + (1 << 17))
+
+        status_code, _, body = dispatch_request(str(self.shared_analysis_path), '/api/object?id={}'.format(map_id))
+        assert status_code == 200
+        assert json.loads(body)['buffer']['owns_buffer'] is True
+
+    def test_analysis_db_attributes_numpy_buffers_to_their_owner(self):
+        pytest.importorskip('numpy')
+        base_path = Path(self.temp_dir.name)
+        script_path = base_path / 'arrays.py'
+        script_path.write_text(textwrap.dedent("""
+            import sys
+            import numpy
+            from objex import dump_graph
+
+            data = numpy.zeros(1 << 18, dtype=numpy.uint8)
+            window = data[1024:]  # a view keeps data alive, it does not copy it
+            window_view = memoryview(window)
+            dump_graph(sys.argv[1])
+        """))
+        dump_path = str(base_path / 'arrays.db')
+        self.run_python(script_path, dump_path)
+        analysis_path = str(base_path / 'arrays-analysis.db')
+        make_analysis_db(dump_path, analysis_path)
+
+        with Reader(analysis_path) as reader:
+            data_id = reader.sql_val("SELECT owner FROM buffer WHERE nbytes = ? AND owns_buffer = 1", (1 << 18,))
+            assert reader.obj_typename(data_id) == 'ndarray'
+            assert reader.obj_buffer(data_id) == {'owner': data_id, 'nbytes': 1 << 18, 'owns_buffer': True}
+            # an owning array's __sizeof__ already counts its data
+            assert reader.obj_size(data_id) > 1 << 18
+            assert reader.obj_attributed_size(data_id) == reader.obj_size(data_id)
+
+            views = reader.sql(
+                'SELECT object FROM buffer WHERE owns_buffer = 0 AND owner = ? AND nbytes = ?',
+                (data_id, (1 << 18) - 1024))
+            assert sorted(reader.obj_typename(view_id) for view_id, in views) == ['memoryview', 'ndarray']
+            for view_id, in views:
+                assert reader.obj_size(view_id) < 1024
+                assert reader.obj_attributed_size(view_id) == reader.obj_size(view_id)
+            assert (data_id, 1 << 18, 2) in reader.shared_buffers(limit=5)
+
+    def test_reader_skips_weak_references_unless_asked(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            target_id = reader.instances_by_typename('WeakOnlyTarget')[0][0]
+            assert [ref for ref, _ in reader.refers_to_obj(target_id)] == ['~()']
+            assert reader.find_path_to_module(target_id) == []
+            assert reader.random_orphans_with_typename('WeakOnlyTarget') == [target_id]
+
+            reader.set_include_weak(True)
+            [ref_path] = reader.find_path_to_module(target_id)
+            assert ref_path[-1][1] == '~()'
+            assert reader.random_orphans_with_typename('WeakOnlyTarget') == []
+
+    def test_analysis_db_reports_uncollectable_garbage_and_finalizer_cycles(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            cycles = {
+                cycle: (object_count, garbage_count, finalizer_count)
+                for cycle, object_count, _, garbage_count, finalizer_count in reader.uncollectable_cycles(limit=-1)
+            }
+            finalizer_cycles = {
+                cycle for cycle in cycles
+                if {reader.obj_typename(obj_id) for obj_id in reader.cycle_members(cycle)} >= {'FinalizerNode'}
+            }
+            assert len(finalizer_cycles) == 1
+            [cycle] = finalizer_cycles
+            object_count, garbage_count, finalizer_count = cycles[cycle]
+            assert garbage_count == 0
+            assert finalizer_count == 2
+            assert object_count >= 2
+
+            garbage_groups = [cycle for cycle, (_, garbage_count, _) in cycles.items() if garbage_count]
+            assert [reader.obj_typename(obj_id) for obj_id in reader.cycle_members(garbage_groups[0])] == ['LegacyA']
+            # only gc.garbage is reported as garbage; the finalizer cycle is live
+            assert [row[0] for row in reader.uncollectable_cycles(limit=-1, garbage=True)] == garbage_groups
+            assert cycle in [row[0] for row in reader.uncollectable_cycles(limit=-1, garbage=False)]
+            summary = reader.uncollectable_summary()
+            assert summary['garbage_count'] == 1
+            assert summary['finalizer_cycle_count'] >= 1
+            assert reader.summary_stats()['gc_garbage_count'] == 1
+
+        status_code, _, body = dispatch_request(str(self.shared_analysis_path), '/api/garbage?limit=5')
+        assert status_code == 200
+        payload = json.loads(body)
+        assert payload['summary']['garbage_count'] == 1
+        assert [item['garbage_count'] > 0 for item in payload['items']] == [True]
+        assert payload['finalizer_cycles'] and not any(item['garbage_count'] for item in payload['finalizer_cycles'])
+
+    def test_analysis_db_inventories_caches(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            caches = {
+                name: (obj_id, kind, entry_count, transitive_count, transitive_size)
+                for obj_id, kind, name, entry_count, transitive_count, transitive_size
+                in reader.cache_inventory(limit=1000)
+            }
+            obj_id, kind, entry_count, transitive_count, transitive_size = caches['__main__.cached_range']
+            assert kind == 'lru_cache'
+            assert entry_count == 3
+            assert reader.lru_cache_info(obj_id) == {'hits': 1, 'misses': 3, 'maxsize': 8, 'currsize': 3}
+            # the cached lists are reachable from the wrapper
+            assert transitive_size > sum(sys.getsizeof(list(range(value))) for value in (10, 20, 30))
+
+            obj_id, kind, entry_count, transitive_count, transitive_size = caches['__main__._MEMO_CACHE']
+            assert kind == 'module global'
+            assert entry_count == 50
+            assert transitive_count > 50
+            assert transitive_size > reader.obj_size(obj_id)
+
+            # the module-level instance is listed, the one only a running frame holds is not
+            lookup_ids = [obj_id for obj_id, in reader.instances_by_typename('LookupCache')]
+            assert len(lookup_ids) == 2
+            assert [kind for obj_id, kind, _, _, _ in caches.values() if obj_id in lookup_ids] == ['cache type']
+            assert caches['__main__.LOOKUPS'][2] == 1
+
+        status_code, _, body = dispatch_request(str(self.shared_analysis_path), '/api/caches?limit=50')
+        assert status_code == 200
+        items = {item['name']: item for item in json.loads(body)['items']}
+        assert items['__main__.cached_range']['lru_cache_info']['hits'] == 1
+
+    def test_analysis_db_groups_pending_asyncio_tasks(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            groups = {row[0]: row[1:] for row in reader.pending_tasks_by_coroutine(limit=100)}
+            task_count, pending_count, transitive_count, transitive_size = groups['handle_request']
+            assert (task_count, pending_count) == (3, 3)
+            # each suspended frame holds its own payload
+            assert transitive_size > 3 * (1 << 15)
+            # finished tasks retain nothing and are not listed
+            assert 'finished_request' not in groups
+
+            task_id = reader.pending_tasks('handle_request', limit=1)[0]
+            edges = dict(reader.obj_refers_to(task_id, limit=100))
+            coro_id = edges['._coro']
+            assert reader.obj_typename(coro_id) == 'coroutine'
+            coro_edges = dict(reader.obj_refers_to(coro_id, limit=100))
+            assert reader.obj_is_frame(coro_edges['.cr_frame'])
+            assert reader.obj_typename(coro_edges['.cr_await']) == 'coroutine'
+
+        status_code, _, body = dispatch_request(str(self.shared_analysis_path), '/api/tasks')
+        assert status_code == 200
+        items = {item['coro_name']: item for item in json.loads(body)['items']}
+        assert len(items['handle_request']['tasks']) == 3
+
+    def test_analysis_db_aggregates_tracemalloc_allocation_sites(self):
+        base_path = Path(self.temp_dir.name)
+        dump_path = base_path / 'traced.db'
+        analysis_path = base_path / 'traced-analysis.db'
+        self.run_python('-m', 'tests.clean_dump_fixture', dump_path, '--tracemalloc')
+        make_analysis_db(str(dump_path), str(analysis_path))
+
+        with Reader(str(analysis_path)) as reader:
+            assert reader.summary_stats()['tracemalloc_frames'] == 5
+            sites = reader.cost_by_alloc_site(limit=1000)
+            fixture_sites = [site for site in sites if site[0].endswith('clean_dump_fixture.py')]
+            assert fixture_sites
+
+            by_type = reader.cost_by_alloc_site_and_type(limit=1000)
+            assert any(
+                filename.endswith('clean_dump_fixture.py') and name == 'deque'
+                for filename, _, name, _, _ in by_type
+            )
+
+            deque_type_id = reader.find_type_by_name('deque')[0]
+            traces = [reader.obj_alloc_traceback(obj_id) for obj_id in reader.random_instances(deque_type_id, limit=50)]
+            assert any(trace and 'clean_dump_fixture.py' in trace for trace in traces)
+
+        with Reader(str(self.shared_analysis_path)) as reader:
+            assert reader.summary_stats()['tracemalloc_frames'] is None
+
+        status_code, _, body = dispatch_request(str(analysis_path), '/api/alloc-sites?limit=5')
+        assert status_code == 200
+        payload = json.loads(body)
+        assert payload['items']
+        assert payload['by_type']
+
     def test_reader_rebuilds_missing_attributed_size_table(self):
         analysis_path = self.copy_shared_analysis('legacy-analysis.db')
 
@@ -289,6 +632,73 @@ class ObjexTests(unittest.TestCase):
             assert reader.obj_attributed_size(legacy_instance_id) >= reader.obj_size(legacy_instance_id)
             assert 'object_attributed_size' in reader._table_names
 
+    def test_set_based_analysis_passes_match_correlated_queries(self):
+        from tests import benchmark_analysis_build
+
+        results = benchmark_analysis_build.run(20000, self.temp_dir.name, print_info=False)  # asserts equal rows
+        assert set(results) == {'indices + classes', 'attributed sizes'}
+
+    def test_analysis_db_materializes_object_degrees(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            assert 'object_degree' in reader._table_names
+            assert reader.sql_val('SELECT count(*) FROM object_degree') == reader.sql_val('SELECT count(*) FROM object')
+            top = reader.most_referenced_objects(10)
+            counts = [count for count, _ in top]
+            assert counts == sorted(counts, reverse=True)
+            assert counts[0] == reader.sql_val(
+                'SELECT count(*) FROM reference GROUP BY dst ORDER BY count(*) DESC LIMIT 1')
+            for _, obj_id in top[:3]:
+                assert reader.refers_to_obj_count(obj_id) == reader.sql_val(
+                    'SELECT count(*) FROM reference WHERE dst = ?', (obj_id,))
+                assert reader.obj_refers_to_count(obj_id) == reader.sql_val(
+                    'SELECT count(*) FROM reference WHERE src = ?', (obj_id,))
+            key_id, key_count = reader.sql(
+                "SELECT object, in_from_dict_keys FROM object_degree ORDER BY in_from_dict_keys DESC LIMIT 1")[0]
+            assert key_count > 0
+            assert reader.dict_key_count(key_id) == key_count == reader.sql_val(
+                'SELECT count(*) FROM reference WHERE ref = ?', ('@{}'.format(key_id),))
+
+            console = Console(reader)
+            output = StringIO()
+            with redirect_stdout(output):
+                console.onecmd('top 3 referenced')
+            assert 'top 3 objects by referenced:' in output.getvalue()
+            assert '({:,})'.format(counts[0]) in output.getvalue()
+
+        status, _, body = dispatch_request(str(self.shared_analysis_path), '/api/most-referenced?limit=3')
+        assert status == 200
+        items = json.loads(body)['items']
+        assert [item['count'] for item in items] == counts[:3]
+        assert items[0]['object']['id'] == top[0][1]
+
+    def test_analysis_db_precomputes_root_distances(self):
+        with Reader(str(self.shared_analysis_path)) as reader:
+            assert {kind for kind, in reader.sql('SELECT DISTINCT kind FROM root_distance')} == {
+                'module', 'frame', 'thread'}
+            thread_roots = set(reader.sql_list('SELECT stack_obj_id FROM thread'))
+            obj_id, distance = reader.sql(
+                "SELECT object, distance FROM root_distance WHERE kind = 'thread' AND distance > 1 LIMIT 1")[0]
+            [ref_path] = reader.find_path_to_thread(obj_id)
+            assert len(ref_path) == distance == reader.root_distance(obj_id, 'thread')
+            assert ref_path[0][0] in thread_roots
+            for (src, ref), dst in zip(ref_path, [step[0] for step in ref_path[1:]] + [obj_id]):
+                assert reader.sql_val(
+                    "SELECT count(*) FROM reference WHERE src = ? AND ref = ? AND (dst = ? OR ref = '@' || ?)",
+                    (src, ref, dst, dst))
+
+            deep_id = reader.sql_val(
+                "SELECT object FROM root_distance WHERE kind = 'module' AND distance = 3 ORDER BY object LIMIT 1")
+            [module_path] = reader.find_path_to_module(deep_id)
+            assert reader.obj_is_module(module_path[0][0])
+            with patch.object(reader, '_table_names', reader._table_names - {'root_distance'}):
+                [searched_path] = reader.find_path_to_module(deep_id)  # the search finds no shorter path
+                assert len(searched_path) >= len(module_path) == reader.root_distance(deep_id) == 3
+
+        status, _, body = dispatch_request(
+            str(self.shared_analysis_path), '/api/path-to-thread?id={}'.format(obj_id))
+        assert status == 200
+        assert len(json.loads(body)['items']) == 1
+
     @pytest.mark.slow
     def test_dump_graph_reconciles_wal_into_main_db(self):
         dump_path = Path(self.temp_dir.name) / 'portable.db'
@@ -350,6 +760,554 @@ class ObjexTests(unittest.TestCase):
         with Reader(str(dump_path)) as reader:
             assert reader.object_count() > 0
 
+    def test_estimate_dump_and_spawn_dump_limits(self):
+        estimate = estimate_dump(self.temp_dir.name)
+        assert estimate['object_count'] >= len(gc.get_objects()) // 2
+        assert estimate['reference_count'] > 0
+        assert estimate['dump_mb'] > 0
+        assert estimate['duration_s'] > 0
+        assert 0 < estimate['free_disk_mb'] < float('inf')
+
+        # 400k lists sharing 20k strs: the strs are 20k rows, not one per sampled reference
+        # (~800k); both estimates are sampled, hence the slack
+        shared = [str(i) for i in range(20000)]
+        heap = [[shared[i % len(shared)]] for i in range(400000)]
+        heap_object_count = estimate_dump(self.temp_dir.name)['object_count'] - estimate['object_count']
+        del heap, shared
+        assert 300000 < heap_object_count < 600000
+
+        dump_path = Path(self.temp_dir.name) / 'refused.db'
+        with pytest.raises(DumpRefused) as exc_info:
+            spawn_dump(str(dump_path), max_dump_mb=estimate['dump_mb'] / 1000)
+        assert 'max_dump_mb' in exc_info.value.reason
+        assert exc_info.value.estimate['object_count'] > 0
+        with pytest.raises(DumpRefused):
+            spawn_dump(str(dump_path), min_free_disk_mb=estimate['free_disk_mb'] * 2)
+        assert not dump_path.exists()
+
+    def test_estimate_dump_costs_match_a_calibration_run(self):
+        from objex import exporter
+        from tests import benchmark_dump_estimate
+
+        results = benchmark_dump_estimate.run(50000, self.temp_dir.name, print_info=False)
+        # timings are too noisy on a shared machine to check, sizes are not
+        for name in ('object_row_bytes', 'reference_row_bytes'):
+            constant = getattr(exporter, '_EST_' + name.upper())
+            assert constant / 2 < results[name] < constant * 2, (name, results[name])
+
+    @unittest.skipUnless(hasattr(os, 'fork') and hasattr(signal, 'SIGUSR2'), 'requires os.fork and SIGUSR2')
+    def test_signal_handler_spawns_rate_limited_dumps(self):
+        path_template = os.path.join(self.temp_dir.name, 'sig-{pid}-{seq}.db')
+        dumper = install_signal_handler(
+            signal.SIGUSR2, path_template, min_interval_s=60, min_free_disk_mb=1)
+        try:
+            os.kill(os.getpid(), signal.SIGUSR2)
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert dumper.wait(timeout=120)
+        finally:
+            dumper.uninstall()
+        assert signal.getsignal(signal.SIGUSR2) is not dumper
+
+        assert len(dumper.dumps) == 1
+        path, pid = dumper.dumps[0]
+        assert path == path_template.format(pid=os.getpid(), seq=0)
+        assert dumper.results[pid] == 0
+        assert len(dumper.skipped) == 1
+        assert 'rate limited' in dumper.skipped[0][1]
+        conn = sqlite3.connect(path)
+        try:
+            assert conn.execute('SELECT count(*) FROM object').fetchone()[0] > 0
+        finally:
+            conn.close()
+
+        # a template that can't be formatted or a directory that doesn't exist are recorded, not raised
+        for path_template in ('/nonexistent/dir/x-{pid}.db', os.path.join(self.temp_dir.name, 'x-{nope}.db')):
+            dumper = install_signal_handler(signal.SIGUSR2, path_template)
+            try:
+                os.kill(os.getpid(), signal.SIGUSR2)
+            finally:
+                dumper.uninstall()
+            assert not dumper.dumps and len(dumper.skipped) == 1
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_autodump_dumps_on_rss_thresholds_and_prunes(self):
+        second_threshold = int(_get_rss_mb()) + 64
+        dumper = autodump(
+            [1, second_threshold], interval_s=0.05, keep=1, directory=self.temp_dir.name,
+            path_template='auto-{threshold}.db')
+        try:
+            deadline = time.time() + 120
+            while not dumper.results and time.time() < deadline:
+                time.sleep(0.05)
+            ballast = b'x' * (96 << 20)
+            while len(dumper.results) < 2 and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            assert dumper.stop(timeout=120)
+        del ballast
+
+        assert [dump[0] for dump in dumper.dumps] == [
+            os.path.join(self.temp_dir.name, 'auto-1.db'),
+            os.path.join(self.temp_dir.name, 'auto-{}.db'.format(second_threshold)),
+        ]
+        assert set(dumper.results.values()) == {0}
+        assert dumper.pruned == [dumper.dumps[0][0]]
+        assert not os.path.exists(dumper.dumps[0][0])
+        conn = sqlite3.connect(dumper.dumps[1][0])
+        try:
+            trigger = conn.execute('SELECT trigger FROM meta').fetchone()[0]
+            # forked on the main thread, so this test's frame is on the dumped stack
+            traces = [row[0] for row in conn.execute('SELECT trace FROM pyframe')]
+        finally:
+            conn.close()
+        assert trigger.endswith('>= {}MiB'.format(second_threshold))
+        assert any('in test_autodump_dumps_on_rss_thresholds_and_prunes' in trace for trace in traces)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_autodump_keeps_polling_after_errors(self):
+        with patch('objex.exporter._get_rss_mb', side_effect=OSError('statm unreadable')):
+            dumper = autodump([1], interval_s=0.01, directory=self.temp_dir.name)
+            try:
+                deadline = time.time() + 30
+                while len(dumper.errors) < 3 and time.time() < deadline:
+                    time.sleep(0.01)
+                assert dumper.thread.is_alive()
+            finally:
+                assert dumper.stop(timeout=30)
+        assert len(dumper.errors) >= 3 and 'statm unreadable' in dumper.errors[0][1]
+        assert not dumper.dumps
+
+    def test_autodump_never_prunes_the_newest_dump(self):
+        from objex.exporter import _AutoDumper
+
+        base_path = Path(self.temp_dir.name)
+        dumper = _AutoDumper([1], 1, 3, str(base_path), 'unused.db', 1, {})
+        for i, pid in enumerate((101, 102)):
+            path = str(base_path / 'big-{}.db'.format(i))
+            Path(path).write_bytes(b'x' * (3 << 19))
+            Path(path + '-wal').write_bytes(b'x' * (1 << 20))
+            dumper.dumps.append((path, pid, 'test'))
+        dumper.prune()
+        # 5MiB against a 1MiB budget: the older dump goes, the newest stays even alone over budget
+        assert dumper.pruned == [str(base_path / 'big-0.db')]
+        assert not (base_path / 'big-0.db-wal').exists()
+        assert (base_path / 'big-1.db').exists()
+
+        # each wal is counted, 1.5MiB in all is over budget
+        small = str(base_path / 'small.db')
+        Path(small).write_bytes(b'x' * (1 << 19))
+        Path(small + '-wal').write_bytes(b'x' * (1 << 19))
+        dumper.dumps = [(small, 103, 'test'), (str(base_path / 'tiny.db'), 104, 'test')]
+        Path(str(base_path / 'tiny.db')).write_bytes(b'x' * (1 << 19))
+        dumper.prune()
+        assert dumper.pruned[-1] == small
+
+        # dumps estimated to be bigger than the whole budget are refused before forking
+        with patch('objex.exporter._get_rss_mb', return_value=2), \
+                patch('objex.exporter.spawn_dump', side_effect=DumpRefused('too big', {})) as spawn:
+            dumper.poll()
+        assert spawn.call_args[1]['max_dump_mb'] == 1
+        assert dumper.skipped[-1][1] == 'too big'
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_dump_async_reports_results_and_kills_on_timeout(self):
+        import asyncio
+
+        base_path = Path(self.temp_dir.name)
+
+        async def dump_both():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker_task = asyncio.ensure_future(ticker())
+            try:
+                return await asyncio.gather(
+                    dump_async(str(base_path / 'async.db'), timeout=120, priority=5),
+                    dump_async(str(base_path / 'killed.db'), timeout=0.01),
+                ), ticks
+            finally:
+                ticker_task.cancel()
+
+        (finished, killed), ticks = asyncio.run(dump_both())
+        # the loop kept running while the dump was written
+        assert ticks > 10
+
+        assert finished['exit_code'] == 0
+        assert not finished['timed_out'] and not finished['truncated']
+        assert finished['size_mb'] > 0
+        assert finished['child_peak_rss_mb'] > 0
+        assert finished['duration_s'] > 0
+
+        assert killed['timed_out'] and killed['truncated']
+        assert killed['signal'] == signal.SIGKILL
+        assert killed['exit_code'] is None
+
+    def test_dump_async_cancellation_kills_and_reaps_child(self):
+        import asyncio
+        from objex import exporter
+
+        base_path = Path(self.temp_dir.name)
+        pids = []
+
+        def recording_spawn_dump(*args, **kwargs):
+            pids.append(real_spawn_dump(*args, **kwargs))
+            return pids[-1]
+
+        async def cancel_dumps():
+            # cancelled while the heap is estimated in the executor (no fork), then while the child is dumping
+            for i, (delay, limits) in enumerate(((0, {'max_dump_mb': 1e9}), (0.3, {}))):
+                task = asyncio.ensure_future(
+                    dump_async(str(base_path / 'cancelled-{}.db'.format(i)), timeout=120, **limits))
+                await asyncio.sleep(delay)
+                task.cancel()
+                started = time.time()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                else:
+                    assert False, 'expected the dump to be cancelled'
+                assert time.time() - started < 1
+            while len(pids) < 1 or exporter._ASYNC_REAPERS:
+                await asyncio.sleep(0.05)
+
+        real_spawn_dump = exporter.spawn_dump
+        with patch('objex.exporter.spawn_dump', side_effect=recording_spawn_dump):
+            asyncio.run(asyncio.wait_for(cancel_dumps(), 30))
+        assert len(pids) == 1
+        for pid in pids:
+            try:
+                os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                pass
+            else:
+                assert False, 'dump child {} was not reaped'.format(pid)
+
+    def test_memory_budget_stages_dump_in_ram_and_spills(self):
+        base_path = Path(self.temp_dir.name)
+        counts = []
+        # a budget far above this process's dump stays in memory until the end, a tiny one spills early
+        for name, budget in (('staged.db', 4096), ('spilled.db', 0.25)):
+            path = base_path / name
+            assert wait_dump(spawn_dump(str(path), memory_budget_mb=budget)) == 0
+            assert not Path(str(path) + '-wal').exists()
+            conn = sqlite3.connect(str(path))
+            try:
+                assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+                assert conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+                assert conn.execute("SELECT pid FROM meta").fetchone()[0] != os.getpid()
+                assert conn.execute("SELECT duration_s FROM meta").fetchone()[0] is not None
+                counts.append(conn.execute("SELECT count(*) FROM object").fetchone()[0])
+            finally:
+                conn.close()
+        assert counts[0] > 10000
+        assert abs(counts[0] - counts[1]) < counts[0] * 0.1
+
+    def test_compressed_dump_ingests_without_temp_copy(self):
+        base_path = Path(self.temp_dir.name)
+        shutil.copy(str(self.shared_dump_path), str(base_path / 'shared.db'))
+        archive_path = compress_dump(str(base_path / 'shared.db'), remove=True)
+        assert archive_path == str(base_path / 'shared.db.objexz')
+        assert os.path.getsize(archive_path) * 2 < os.path.getsize(str(self.shared_dump_path))
+
+        with ArchiveReader(archive_path) as archive:
+            with open(str(self.shared_dump_path), 'rb') as f:
+                f.seek(archive.frame_size - 50)
+                assert archive.read(archive.frame_size - 50, 100) == f.read(100)  # spans two frames
+            size = archive.size
+            archive.size += archive.frame_size * 2  # as read from a corrupt footer
+            for offset in (size - 10, size + archive.frame_size):
+                with pytest.raises(ValueError, match='truncated or corrupt'):
+                    archive.read(offset, 100)
+
+        with pytest.raises(InvalidDatabaseError, match='compressed objex dump'):
+            Reader(archive_path)
+
+        analysis_path = base_path / 'from-archive-analysis.db'
+        make_analysis_db(archive_path, str(analysis_path))
+        assert sorted(os.listdir(str(base_path))) == ['from-archive-analysis.db', 'shared.db.objexz']
+        with Reader(str(analysis_path)) as reader, Reader(str(self.shared_analysis_path)) as expected:
+            assert reader.find_type_by_name('LegacyA')
+            assert reader.sql_val('SELECT count(*) FROM object') == expected.sql_val('SELECT count(*) FROM object')
+
+    def test_fast_analysis_build_matches_durable_build(self):
+        durable_path = Path(self.temp_dir.name) / 'durable-analysis.db'
+        output = StringIO()
+        with redirect_stdout(output):
+            make_analysis_db(str(self.shared_dump_path), str(durable_path), print_info=True, fast=False)
+        assert re.search(r'^\[1/\d+\] copy', output.getvalue(), re.M)
+        assert 'ETA' in output.getvalue()
+
+        def contents(path):
+            conn = sqlite3.connect(str(path))
+            try:
+                tables = {}
+                for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                    columns = [row[1] for row in conn.execute('PRAGMA table_info({})'.format(name))]
+                    columns = [column for column in columns if column != 'analysis_timings']
+                    tables[name] = sorted(
+                        map(repr, conn.execute('SELECT {} FROM {}'.format(', '.join(columns), name))))
+                schema = sorted(conn.execute("SELECT type, name, sql FROM sqlite_master").fetchall())
+                page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+                timings = json.loads(conn.execute('SELECT analysis_timings FROM meta').fetchone()[0])
+                return tables, schema, page_size, timings
+            finally:
+                conn.close()
+
+        fast_tables, fast_schema, fast_page_size, fast_timings = contents(self.shared_analysis_path)
+        durable_tables, durable_schema, durable_page_size, durable_timings = contents(durable_path)
+        assert fast_tables == durable_tables
+        assert fast_schema == durable_schema
+        assert fast_page_size == 65536 and durable_page_size < fast_page_size
+        assert set(fast_timings) == set(durable_timings) >= {'copy', 'indices', 'attributed sizes'}
+
+    def test_in_place_analysis_build_resumes_after_interruption(self):
+        from objex import explorer
+        base_path = Path(self.temp_dir.name)
+        dump_path = base_path / 'moved.db'
+        analysis_path = base_path / 'moved-analysis.db'
+        shutil.copy(str(self.shared_dump_path), str(dump_path))
+
+        def interrupted(conn):
+            conn.execute("CREATE TABLE gc_cycle (half_built INTEGER)")
+            raise KeyboardInterrupt
+
+        with patch.object(explorer, '_build_gc_cycle_table', interrupted):
+            with pytest.raises(KeyboardInterrupt):
+                make_analysis_db(str(dump_path), str(analysis_path), in_place=True)
+        assert not dump_path.exists()  # moved, not copied
+        conn = sqlite3.connect(str(analysis_path))
+        try:
+            assert conn.execute("SELECT analysis_stage FROM meta").fetchone()[0] == 'arenas'
+            assert not conn.execute("SELECT name FROM sqlite_master WHERE name = 'gc_cycle'").fetchone()
+        finally:
+            conn.close()
+        with pytest.raises(InvalidDatabaseError, match='interrupted analysis build'):
+            Reader(str(analysis_path))
+
+        output = StringIO()
+        with redirect_stdout(output):
+            assert objex_main.main(['make-analysis-db', '--in-place', str(analysis_path), str(analysis_path)]) == 0
+        assert 'resuming interrupted build after arenas' in output.getvalue()
+        assert '[1/4] gc cycles' in output.getvalue()
+        with pytest.raises(EnvironmentError, match='already exists'):
+            make_analysis_db(str(analysis_path), str(analysis_path), in_place=True)
+
+        with Reader(str(analysis_path)) as reader, Reader(str(self.shared_analysis_path)) as expected:
+            for table in ('object', 'reference', 'object_attributed_size', 'gc_cycle', 'cache'):
+                query = 'SELECT count(*) FROM {}'.format(table)
+                assert reader.sql_val(query) == expected.sql_val(query)
+            expected_gc_cycles = expected.sql_val('SELECT count(*) FROM gc_cycle')
+            timings = json.loads(reader.sql_val('SELECT analysis_timings FROM meta'))
+            assert 'copy' not in timings and {'indices', 'gc cycles', 'immortals'} <= set(timings)
+
+        # stopped after the dump was moved but before a stage finished: starts over on the moved dump
+        early_path = base_path / 'early-analysis.db'
+        shutil.copy(str(self.shared_dump_path), str(early_path))
+        make_analysis_db(str(dump_path), str(early_path), in_place=True)
+        with Reader(str(early_path)) as reader:
+            assert reader.sql_val('SELECT count(*) FROM gc_cycle') == expected_gc_cycles
+
+    def test_type_histogram_time_series_reports_growth(self):
+        base_path = Path(self.temp_dir.name)
+        path = str(base_path / 'types.db')
+
+        class GrowingType:
+            pass
+
+        first = type_histogram(path)
+        assert first['dict'][0] > 0
+        growing = [GrowingType() for _ in range(5000)]
+        second = type_histogram(path)
+        name = '{}.{}'.format(GrowingType.__module__, GrowingType.__qualname__)
+        assert second[name][0] == 5000
+
+        growth = type_growth_data(path, limit=50)
+        assert len(growth['snapshots']) == 2
+        item = {item['type_name']: item for item in growth['types']}[name]
+        assert item['count_delta'] == 5000
+        assert item['counts'] == [0, 5000]
+        assert growing
+
+        status_code, _, body = dispatch_request(path, '/')
+        assert status_code == 200 and b'/growth.js' in body
+        status_code, _, body = dispatch_request(path, '/api/type-growth?limit=50')
+        assert status_code == 200 and name in {item['type_name'] for item in json.loads(body)['types']}
+
+        script_path = base_path / 'grow.py'
+        script_path.write_text('import time\nclass Leak: pass\nleaks = [Leak() for _ in range(3000)]\ntime.sleep(0.3)\n')
+        result = subprocess.run(
+            [sys.executable, '-m', 'objex', 'watch', '--interval', '0.1', str(base_path / 'watched.db'),
+             str(script_path)],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parents[1])
+        assert '+3,000 objects  __main__.Leak' in result.stdout
+        assert len(type_growth_data(str(base_path / 'watched.db'))['snapshots']) >= 2
+
+    def test_analysis_db_merges_prefork_worker_dumps(self):
+        base_path = Path(self.temp_dir.name)
+        script_path = base_path / 'prefork.py'
+        script_path.write_text(textwrap.dedent("""
+            import os, sys
+            from objex import dump_graph
+
+            class Shared: pass
+            class WorkerItem: pass
+            class Bloat: pass
+            class OnlyInThree: pass
+
+            shared = [Shared() for _ in range(100)]
+            pids = []
+            for i in (1, 2, 3):
+                pid = os.fork()
+                if not pid:
+                    # allocated after the fork at the same addresses in every worker
+                    items = [WorkerItem() for _ in range(10 * i)]
+                    for item in items:
+                        item.payload = [None] * i
+                    if i == 3:
+                        bloat = [Bloat() for _ in range(20000)]
+                        only = OnlyInThree()
+                        lookup = {only: bloat}
+                    dump_graph(os.path.join(sys.argv[1], 'worker{}.db'.format(i)))
+                    os._exit(0)
+                pids.append(pid)
+            for pid in pids:
+                assert os.waitpid(pid, 0)[1] == 0
+        """))
+        self.run_python(script_path, base_path)
+        paths = [str(base_path / 'worker{}.db'.format(i)) for i in (1, 2, 3)]
+        analysis_path = str(base_path / 'fleet-analysis.db')
+        make_analysis_db(paths, analysis_path)
+
+        with Reader(analysis_path) as reader:
+            processes = reader.processes()
+            assert [row[0] for row in processes] == [1, 2, 3]
+            assert len({row[1] for row in processes}) == 3
+            # objects inherited from the parent are merged, not tripled
+            total = sum(row[3] for row in processes)
+            assert reader.object_count() < total * 0.6
+            shared_type = reader.find_type_by_name('Shared')[0]
+            assert reader.sql_val("SELECT COUNT(*) FROM object WHERE pytype = ?", (shared_type,)) == 100
+
+            counts = {name: counts for _, name, counts in reader.type_counts_by_process(limit=200)}
+            assert counts['WorkerItem'] == [10, 20, 30]
+            # each worker's items are its own objects, with only their own references
+            assert reader.sql_val(
+                "SELECT COUNT(*) FROM object JOIN pytype ON pytype.object = object.pytype"
+                " WHERE pytype.name = 'WorkerItem'") == 60
+            assert reader.sql_val(
+                "SELECT COUNT(*) FROM object JOIN pytype ON pytype.object = object.pytype"
+                " WHERE pytype.name = 'WorkerItem'"
+                " AND (SELECT COUNT(*) FROM reference WHERE src = object.id AND ref = '.payload') != 1") == 0
+            # the dict-key edge of a worker-private dict leads to its key in the merged ids
+            assert reader.sql_val(
+                "SELECT COUNT(*) FROM reference"
+                " JOIN object AS key ON key.id = CAST(substr(reference.ref, 2) AS INTEGER)"
+                " JOIN pytype ON pytype.object = key.pytype"
+                " WHERE reference.ref >= '@' AND reference.ref < 'A' AND pytype.name = 'OnlyInThree'") == 1
+            partial = {name: found_in for name, found_in, _ in reader.partial_types(limit=200)}
+            assert partial['OnlyInThree'] == [3] and partial['Bloat'] == [3]
+            assert 'Shared' not in partial
+            outliers = reader.outlier_processes()
+            assert [row[0] for row in outliers] == [3]
+            assert 'Bloat' in [name for name, _, _ in outliers[0][4]]
+
+        status_code, _, body = dispatch_request(analysis_path, '/api/fleet')
+        assert status_code == 200
+        assert [item['process'] for item in json.loads(body)['outliers']] == [3]
+
+    def test_collector_receives_streamed_dump_and_resumes(self):
+        base_path = Path(self.temp_dir.name)
+        done = []
+        server = make_collector_server(
+            'unix://{}'.format(base_path / 'collect.sock'), directory=str(base_path), on_done=done.append)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        try:
+            self.run_python('-m', 'tests.clean_dump_fixture', 'unix://{}'.format(base_path / 'collect.sock'))
+            deadline = time.time() + 30
+            while not done and time.time() < deadline:
+                time.sleep(0.05)  # on_done runs after the sender has been told the stream is done
+            assert len(done) == 1
+            make_analysis_db(done[0], str(base_path / 'streamed-analysis.db'))
+            with Reader(str(base_path / 'streamed-analysis.db')) as reader:
+                assert reader.find_type_by_name('LegacyA')
+                assert reader.sql_val('SELECT pid FROM meta') != os.getpid()
+
+            # drop the connection between batches; the sender reconnects and
+            # the receiver applies every batch exactly once
+            stream = _StreamConnection(
+                'unix://{}'.format(base_path / 'collect.sock'), 'resumed', 1, window=2, batch_rows=10)
+            stream.execute(
+                "INSERT INTO meta (id, pid, hostname, memory_mb, gc_info, num_gcd_objects) VALUES (?, ?, ?, ?, ?, ?)",
+                (0, 1, 'resumed', 0, '[]', 0))
+            for i in range(100):
+                stream.execute("INSERT INTO pymalloc_stat (name, value) VALUES (?, ?)", ('stat', i))
+                if i in (25, 60):
+                    stream.sock.shutdown(socket.SHUT_RDWR)
+            assert stream.close()['type'] == 'done'
+            while len(done) < 2 and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert len(done) == 2
+        assert server.RequestHandlerClass.stream_locks == {}  # finished streams are forgotten
+        conn = sqlite3.connect(done[1])
+        try:
+            assert conn.execute("SELECT count(*), sum(value) FROM pymalloc_stat").fetchone() == (100, sum(range(100)))
+            assert 'stream_state' not in {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        finally:
+            conn.close()
+        assert not (base_path / 'collect.sock').exists()
+
+    def test_collector_rejects_statements_outside_the_schema(self):
+        from objex.collector import _recv_frame, _send_frame
+
+        base_path = Path(self.temp_dir.name)
+        server = make_collector_server('unix://{}'.format(base_path / 'collect.sock'), directory=str(base_path))
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        try:
+            for i, batch in enumerate([
+                {'type': 'batch', 'seq': 0, 'statements': [['insert', 'sqlite_master', ['name'], [['x']]]]},
+                {'type': 'batch', 'seq': 0, 'statements': [['insert', 'meta', ['pid) SELECT 1; --'], [[1]]]]},
+                {'type': 'batch', 'seq': 0, 'statements': [['update', 'object', ['size'], [[1]]]]},
+                {'type': 'batch', 'seq': 0, 'statements': [['insert', 'meta', ['pid', 'pid'], [[1, 2]]]]},
+                {'type': 'batch', 'statements': []},
+                {'type': 'batch', 'seq': 0, 'statements': [['insert', 'meta', ['pid'], [[1, 2]]]]},
+                {'type': 'batch', 'seq': 0},
+                ['not', 'a', 'frame'],
+            ]):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.connect(str(base_path / 'collect.sock'))
+                    _send_frame(sock, {'type': 'hello', 'stream': 'bad{}'.format(i), 'hostname': 'h', 'pid': 1})
+                    assert _recv_frame(sock)['type'] == 'welcome'
+                    _send_frame(sock, batch)
+                    assert _recv_frame(sock)['type'] == 'error', batch
+                finally:
+                    sock.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        for path in base_path.glob('objex-h-1-bad*.db'):
+            conn = sqlite3.connect(str(path))
+            try:
+                assert conn.execute("SELECT count(*) FROM meta").fetchone()[0] == 0
+            finally:
+                conn.close()
+
+    def test_stream_connection_reports_socket_errors(self):
+        with patch('objex.collector.socket.socket', side_effect=OSError('no sockets left')):
+            with pytest.raises(OSError, match='no sockets left'):
+                _StreamConnection('unix:///nonexistent.sock', 'host', 1, reconnect_timeout_s=0)
+
     def test_module_help_does_not_start_console(self):
         result = subprocess.run(
             [sys.executable, '-m', 'objex', '--help'],
@@ -384,6 +1342,62 @@ class ObjexTests(unittest.TestCase):
         )
         assert 'analysis_db' in result.stdout
 
+    def test_capture_command_runs_script_and_dumps(self):
+        base_path = Path(self.temp_dir.name)
+        script_path = base_path / 'leaky.py'
+        (base_path / 'leaky_helper.py').write_text('SIZE = 1024\n')  # importable as it would be for python leaky.py
+        script_path.write_text(
+            'import sys, time\n'
+            'from leaky_helper import SIZE\n'
+            'HELD = [bytearray(SIZE) for _ in range(100)]\n'
+            'time.sleep(float(sys.argv[1]))\n'
+            'raise SystemExit(int(sys.argv[2]))\n'
+        )
+        dump_path = base_path / 'captured.db'
+        result = subprocess.run(
+            [sys.executable, '-m', 'objex', 'capture', '--path', str(dump_path), '--delay', '0.1',
+             '--count', '2', '--analyze', '--analyze-cache-mb', '16', '--', str(script_path), '3', '7'],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parents[1],
+        )
+        assert result.returncode == 7, result.stderr
+
+        for i in (1, 2):
+            with Reader(str(base_path / 'captured-{}-analysis.db'.format(i))) as reader:
+                assert reader.dump_trigger() == 'objex capture leaky.py ({} of 2)'.format(i)
+                assert reader.find_type_by_name('bytearray')
+
+    def test_capture_dump_includes_the_scripts_main_frame(self):
+        base_path = Path(self.temp_dir.name)
+        script_path = base_path / 'held.py'
+        script_path.write_text(
+            'import time\n'
+            'def main():\n'
+            '    held = [bytearray(16) for _ in range(3)]\n'
+            '    time.sleep(3)\n'
+            '    return len(held)\n'
+            'main()\n'
+        )
+        dump_path = base_path / 'held.db'
+        result = subprocess.run(
+            [sys.executable, '-m', 'objex', 'capture', '--path', str(dump_path), '--delay', '0.5',
+             '--', str(script_path)],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parents[1],
+        )
+        assert result.returncode == 0, result.stderr
+
+        conn = sqlite3.connect(str(dump_path))
+        try:
+            # the forking thread is the script's, so main() is on a stack and its locals are referenced
+            assert conn.execute(
+                "SELECT count(*) FROM reference JOIN pyframe ON pyframe.object = reference.src"
+                " WHERE reference.ref = ?", (".locals['held']",)).fetchone()[0] == 1
+        finally:
+            conn.close()
+
     def test_main_supports_existing_path_legacy_explore_form(self):
         with patch('objex.__main__.explorer.Console.run', return_value=None):
             assert objex_main.main([str(self.shared_analysis_path)]) == 0
@@ -591,7 +1605,16 @@ class ObjexTests(unittest.TestCase):
         assert 'Top frame roots:' in text
 
     def test_reader_root_path_cache_reuses_suffixes(self):
-        with Reader(str(self.shared_analysis_path)) as reader:
+        # the in-process cache backs the search on analysis dbs without precomputed root distances
+        analysis_path = self.copy_shared_analysis('no-root-distance-analysis.db')
+        conn = sqlite3.connect(str(analysis_path))
+        try:
+            conn.execute('DROP TABLE root_distance')
+            conn.commit()
+        finally:
+            conn.close()
+
+        with Reader(str(analysis_path)) as reader:
             obj_id = None
             path = []
             for candidate_obj_id in reader.random_objects(limit=100):